@@ -0,0 +1,77 @@
+'''
+分批清理过期数据
+按主键顺序分段删除，每批一个短事务；可限定耗时，中断后从上次的位置继续
+'''
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+class CleanupTarget:
+    '''
+    一类待清理的数据
+    get_queryset 返回待删除数据的 QuerySet，每次清理开始时调用一次
+    raw 为 True 时直接以一条 DELETE 删除每批数据，不发送信号、不处理级联，
+    仅用于没有其他数据引用的数据；信号中的缓存失效改由 invalidate 按批完成，参数为该批的主键
+    '''
+
+    KEY_PREFIX = 'oneid:cleanup:'
+    # 断点保留时间（秒）
+    CURSOR_TIMEOUT = 7 * 24 * 3600
+
+    def __init__(self, name, get_queryset, raw=False, invalidate=None):
+        self.name = name
+        self.get_queryset = get_queryset
+        self.raw = raw
+        self.invalidate = invalidate
+        self.cursor_key = self.KEY_PREFIX + name + ':cursor'
+
+    def run(self, batch_size, deadline=None, resume=True):
+        '''
+        删除至完成或超时
+        :rtype: (删除数量, 是否完成)
+        '''
+        queryset = self.get_queryset().order_by('pk')
+        label = queryset.model._meta.label    # pylint: disable=protected-access
+        cursor = cache.get(self.cursor_key) if resume else None
+        deleted = 0
+        while True:
+            if deadline is not None and time.monotonic() >= deadline:
+                cache.set(self.cursor_key, cursor, self.CURSOR_TIMEOUT)
+                return deleted, False
+            batch = queryset if cursor is None else queryset.filter(pk__gt=cursor)
+            pks = list(batch.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                cache.delete(self.cursor_key)
+                return deleted, True
+            deleted += self.delete(batch.filter(pk__lte=pks[-1]), pks, label)
+            cursor = pks[-1]
+
+    def delete(self, queryset, pks, label):
+        '''
+        在一个事务中删除一批数据
+        :return: 删除数量
+        '''
+        with transaction.atomic(using=queryset.db):
+            if self.raw:
+                deleted = queryset._raw_delete(queryset.db)    # pylint: disable=protected-access
+            else:
+                _, counts = queryset.delete()
+                deleted = counts.get(label, 0)
+            if self.invalidate is not None:
+                self.invalidate(pks)
+        return deleted
+
+
+def run_cleanup(targets, batch_size=1000, time_budget=None, resume=True):
+    '''
+    依次清理各类数据，time_budget 为总耗时上限（秒）
+    :rtype: list of (name, 删除数量, 是否完成)
+    '''
+    deadline = time.monotonic() + time_budget if time_budget else None
+    results = []
+    for target in targets:
+        deleted, finished = target.run(batch_size, deadline=deadline, resume=resume)
+        results.append((target.name, deleted, finished))
+    return results
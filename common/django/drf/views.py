@@ -1,8 +1,9 @@
-
 import functools
 
 from json.decoder import JSONDecodeError
+from django.core.cache import cache
 from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
 
 
 def catch_json_load_error(func):
@@ -16,3 +17,28 @@ def catch_json_load_error(func):
         except JSONDecodeError:
             raise ParseError
     return wraper
+
+
+def cache_response(*generations, identity=None, timeout=60 * 60):
+    '''
+    缓存接口结果，仅缓存200
+    缓存键由接口、请求路径、身份及各版本号组成，版本号递增后旧缓存自然失效
+    :param generations: common.django.generation.CacheGeneration
+    :param identity: func(request) -> str，结果因人而异时提供
+    :param timeout: 缓存时长（秒）
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            versions = ':'.join(str(generation.get()) for generation in generations)
+            who = identity(request) if identity else ''
+            key = f'oneid:response:{self.__class__.__name__}:{who}:{request.get_full_path()}:{versions}'
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+            response = func(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,141 @@
+'''
+基于缓存的数据版本号
+'''
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+class CacheGeneration:
+    '''
+    记录某类数据的版本号，数据变更时递增
+    可用于派生缓存键、ETag 等
+
+    版本号以微秒时间戳为初值，缓存丢失后重新初始化也不会与已发出的旧值重复
+    '''
+
+    KEY_PREFIX = 'oneid:generation:'
+    # peek 两次读取缓存的最小间隔（秒）
+    PEEK_INTERVAL = 1
+
+    def __init__(self, name):
+        self.name = name
+        self.key = self.KEY_PREFIX + name
+        self.modified_key = self.key + ':modified'
+        self._peeked = None
+
+    def _init(self):
+        '''
+        初始化版本号，已存在则不覆盖
+        '''
+        now = time.time()
+        cache.add(self.key, int(now * 1000000), timeout=None)
+        cache.add(self.modified_key, now, timeout=None)
+        return cache.get(self.key)
+
+    def get(self):
+        '''
+        当前版本号
+        '''
+        value = cache.get(self.key)
+        if value is None:
+            value = self._init()
+        return value
+
+    def peek(self):
+        '''
+        当前版本号，进程内最多每 PEEK_INTERVAL 秒读取一次缓存
+        本进程递增版本号后立即可见，其他进程的变更至多延迟 PEEK_INTERVAL 秒
+        '''
+        now = time.monotonic()
+        peeked = self._peeked
+        if peeked is None or now - peeked[1] >= self.PEEK_INTERVAL:
+            peeked = (self.get(), now)
+            self._peeked = peeked
+        return peeked[0]
+
+    @property
+    def last_modified(self):
+        '''
+        最近一次变更的时间戳
+        '''
+        value = cache.get(self.modified_key)
+        if value is None:
+            self._init()
+            value = cache.get(self.modified_key, time.time())
+        return value
+
+    def _incr(self):
+        try:
+            value = cache.incr(self.key)
+        except ValueError:
+            value = self._init()
+        cache.set(self.modified_key, time.time(), timeout=None)
+        self._peeked = None
+        return value
+
+    def bump(self):
+        '''
+        递增版本号
+        处于事务中时，提交后再递增一次，避免事务期间其他进程以新版本号缓存旧数据
+        '''
+        value = self._incr()
+        connection = transaction.get_connection()
+        if connection.in_atomic_block:
+            if not any(func == self._incr for _, func in connection.run_on_commit):    # pylint: disable=comparison-with-callable
+                transaction.on_commit(self._incr)
+        return value
+
+
+class GenerationCache:
+    '''
+    进程内缓存，版本号变化后失效
+    事务中不读写缓存，避免缓存未提交或将被回滚的数据
+    指定 maxsize 时按最近最少使用淘汰
+    读写加锁以支持多线程，loader 在锁外执行
+    '''
+    def __init__(self, generation, maxsize=None):
+        self.generation = generation
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        '''
+        取缓存，未命中或已失效时调用 loader 加载
+        '''
+        if transaction.get_connection().in_atomic_block:
+            return loader()
+
+        version = self.generation.peek()
+        with self._lock:
+            cached = self._data.get(key)
+            if cached is not None and cached[0] == version:
+                if self.maxsize:
+                    self._data.move_to_end(key)
+                return cached[1]
+        value = loader()
+        with self._lock:
+            self._data[key] = (version, value)
+            if self.maxsize:
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return value
+
+    def pop(self, key):
+        '''
+        移除本进程中的某项缓存
+        '''
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        '''
+        清空本进程缓存
+        '''
+        with self._lock:
+            self._data.clear()
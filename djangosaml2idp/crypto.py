@@ -0,0 +1,90 @@
+'''
+进程内的 XML 签名后端，基于 python-xmlsec
+签名密钥加载一次后缓存，签名时不再启动 xmlsec1 子进程、不再读写临时文件
+验签、加解密仍由 xmlsec1 完成，保留其对引用 URI 的限制
+'''
+import os
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from saml2 import SamlBase
+from saml2.sigver import CryptoBackendXmlSec1, SignatureError
+
+try:
+    import xmlsec
+    from lxml import etree
+except ImportError:
+    xmlsec = None    # pylint: disable=invalid-name
+    etree = None    # pylint: disable=invalid-name
+
+BACKEND_XMLSEC1 = 'xmlsec1'
+BACKEND_PYTHON_XMLSEC = 'python-xmlsec'
+
+
+class CryptoBackendPythonXmlSec(CryptoBackendXmlSec1):
+    '''
+    以 python-xmlsec 在进程内签名
+    '''
+    def __init__(self, xmlsec_binary, **kwargs):
+        if xmlsec is None:
+            raise ImproperlyConfigured('SAML_CRYPTO_BACKEND "{}" requires python-xmlsec'.format(BACKEND_PYTHON_XMLSEC))
+        super().__init__(xmlsec_binary, **kwargs)
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def version(self):
+        return 'python-xmlsec {}'.format(getattr(xmlsec, '__version__', ''))
+
+    def load_key(self, key_file):
+        '''
+        已解析的私钥，文件修改后重新加载
+        '''
+        cache_key = (key_file, os.stat(key_file).st_mtime_ns)
+        key = self._keys.get(cache_key)
+        if key is None:
+            with self._lock:
+                key = xmlsec.Key.from_file(key_file, xmlsec.constants.KeyDataFormatPem)
+                self._keys = {cache_key: key}
+        return key
+
+    def sign_statement(self, statement, node_name, key_file, node_id, id_attr):
+        '''
+        对 statement 中 node_name、node_id 所指节点内的签名模板签名
+        node_name 形如 urn:oasis:names:tc:SAML:2.0:assertion:Assertion
+        '''
+        if isinstance(statement, SamlBase):
+            statement = str(statement)
+        if isinstance(statement, str):
+            statement = statement.encode('utf-8')
+
+        root = etree.fromstring(statement)
+        xmlsec.tree.add_ids(root, [id_attr])
+        namespace, tag = node_name.rsplit(':', 1)
+        for node in root.iter('{%s}%s' % (namespace, tag)):
+            if not node_id or node.get(id_attr) == node_id:
+                break
+        else:
+            raise SignatureError('node {} {} not found'.format(node_name, node_id))
+
+        signature = xmlsec.tree.find_child(node, xmlsec.constants.NodeSignature, xmlsec.constants.DSigNs)
+        if signature is None:
+            raise SignatureError('signature template of {} {} not found'.format(node_name, node_id))
+
+        ctx = xmlsec.SignatureContext()
+        ctx.key = self.load_key(key_file)
+        try:
+            ctx.sign(signature)
+        except xmlsec.Error as exc:
+            raise SignatureError(str(exc))
+        return etree.tostring(root, xml_declaration=False, encoding='UTF-8').decode('utf-8')
+
+
+def install_crypto_backend(server, backend):
+    '''
+    为 IdP Server 设置签名后端
+    '''
+    if backend == BACKEND_XMLSEC1:
+        return
+    if backend != BACKEND_PYTHON_XMLSEC:
+        raise ImproperlyConfigured('Unknown SAML_CRYPTO_BACKEND "{}"'.format(backend))
+    server.sec.crypto = CryptoBackendPythonXmlSec(server.config.xmlsec_binary)
@@ -0,0 +1,151 @@
+'''
+进程内缓存的 IdP Server
+构建 Server 需解析全部 SP 元数据并加载证书，代价较高
+仅在元数据文件、证书或 SAMLAPP 变更后重建
+'''
+import copy
+import os
+import threading
+
+from django.conf import settings
+from saml2 import BINDING_HTTP_POST, BINDING_HTTP_REDIRECT
+from saml2.config import IdPConfig
+from saml2.md import entity_descriptor_from_string
+from saml2.saml import NAMEID_FORMAT_EMAILADDRESS, NAMEID_FORMAT_UNSPECIFIED
+from saml2.server import Server
+from saml2.sigver import get_xmlsec_binary
+
+from common.django.generation import GenerationCache
+from djangosaml2idp.crypto import install_crypto_backend
+from oneid_meta.generation import SAML_APP_GENERATION
+from oneid_meta.models import SAMLAPP
+
+BASEDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METADATA_DIR = os.path.join(BASEDIR, 'djangosaml2idp', 'saml2_config')
+KEY_FILE = os.path.join(BASEDIR, 'djangosaml2idp', 'certificates', 'mykey.pem')
+CERT_FILE = os.path.join(BASEDIR, 'djangosaml2idp', 'certificates', 'mycert.pem')
+
+
+def list_metadata_files():
+    '''
+    SP 及 IdP 元数据文件
+    '''
+    return sorted(os.path.join(METADATA_DIR, f) for f in os.listdir(METADATA_DIR) if f.split('.')[-1] == 'xml')
+
+
+def build_config(metadata_files):
+    '''
+    IdP Server 配置
+    '''
+    return {
+        'debug': settings.DEBUG,
+        'xmlsec_binary': get_xmlsec_binary(['/opt/local/bin', '/usr/bin/xmlsec1']),
+        'entityid': '%s/saml/metadata/' % settings.BASE_URL,
+        'description': 'longguikeji IdP setup',
+        'service': {
+            'idp': {
+                'name': 'Django localhost IdP',
+                'endpoints': {
+                    'single_sign_on_service': [
+                        ('%s/saml/sso/post/' % settings.BASE_URL, BINDING_HTTP_POST),
+                        ('%s/saml/sso/redirect/' % settings.BASE_URL, BINDING_HTTP_REDIRECT),
+                    ],
+                },
+                'name_id_format': [NAMEID_FORMAT_EMAILADDRESS, NAMEID_FORMAT_UNSPECIFIED],
+                'sign_response': True,
+                'sign_assertion': True,
+            },
+        },
+        'metadata': {
+            'local': metadata_files,
+        },
+        # Signing
+        'key_file': KEY_FILE,
+        'cert_file': CERT_FILE,
+        # Encryption
+        'encryption_keypairs': [{
+            'key_file': KEY_FILE,
+            'cert_file': CERT_FILE,
+        }],
+        'valid_for': 365 * 24,
+    }
+
+
+def file_signature(path):
+    '''
+    文件的修改时间与大小，文件不存在时为 None
+    '''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class IdPServerCache:
+    '''
+    进程内的 IdP Server
+    以 SAMLAPP 版本号及元数据、证书文件的修改时间判断是否需要重建
+    '''
+    def __init__(self):
+        self._cached = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(metadata_files):
+        '''
+        决定 Server 内容的全部输入
+        '''
+        return (
+            SAML_APP_GENERATION.peek(),
+            tuple((path, file_signature(path)) for path in metadata_files + [KEY_FILE, CERT_FILE]),
+        )
+
+    def get(self):
+        '''
+        当前的 IdP Server，输入变化后重建
+        '''
+        metadata_files = list_metadata_files()
+        fingerprint = self.fingerprint(metadata_files)
+        cached = self._cached
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        with self._lock:
+            cached = self._cached
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+            conf = IdPConfig()
+            conf.load(copy.copy(build_config(metadata_files)))
+            server = Server(config=conf)
+            install_crypto_backend(server, settings.SAML_CRYPTO_BACKEND)
+            self._cached = (fingerprint, server)
+            return server
+
+    def clear(self):
+        '''
+        清空本进程缓存
+        '''
+        self._cached = None
+
+
+idp_server_cache = IdPServerCache()    # pylint: disable=invalid-name
+
+# entity_id -> (sign_response, sign_assertion)，随 SAML_APP_GENERATION 失效
+_sp_sign_options_cache = GenerationCache(SAML_APP_GENERATION)    # pylint: disable=invalid-name
+
+
+def get_sp_sign_options(entity_id):
+    '''
+    SP 元数据中要求签名的部分
+    SP 不存在时抛出 SAMLAPP.DoesNotExist
+    :rtype: (sign_response, sign_assertion)
+    '''
+    def load():
+        app = SAMLAPP.valid_objects.get(entity_id=entity_id)
+        spsso_descriptor = entity_descriptor_from_string(app.xmldata).spsso_descriptor.pop()    # pylint: disable=no-member
+        return (
+            getattr(spsso_descriptor, 'want_response_signed', '') == 'true',
+            getattr(spsso_descriptor, 'want_assertions_signed', '') == 'true',
+        )
+
+    return _sp_sign_options_cache.get_or_load(entity_id, load)
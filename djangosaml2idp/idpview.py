@@ -3,7 +3,6 @@ django SAML views
 '''
 import os
 import logging
-import copy
 from socket import gethostname
 from OpenSSL import crypto
 
@@ -26,23 +25,20 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from six import text_type
-from saml2.saml import NAMEID_FORMAT_EMAILADDRESS, NAMEID_FORMAT_UNSPECIFIED
-from saml2.sigver import get_xmlsec_binary
+from saml2.saml import NAMEID_FORMAT_UNSPECIFIED
 from saml2 import BINDING_HTTP_POST, BINDING_HTTP_REDIRECT, saml
 from saml2.authn_context import PASSWORD, AuthnBroker, authn_context_class_ref
 from saml2.config import IdPConfig
 from saml2.ident import NameID
 from saml2.metadata import entity_descriptor
 from saml2.s_utils import UnknownPrincipal, UnsupportedBinding
-from saml2.server import Server
-from saml2.md import entity_descriptor_from_string
 
 from djangosaml2idp.serializers.aliyun import AliyunSSORoleSerializer
-from djangosaml2idp.processors import BaseProcessor
+from djangosaml2idp.processors import BaseProcessor, get_spauthn_token
 from djangosaml2idp import idpsettings
+from djangosaml2idp.idpserver import idp_server_cache, get_sp_sign_options
 from oneid.permissions import IsAdminUser, IsUserManager
-from oneid_meta.models import SAMLAPP, AliyunSSORole
-from drf_expiring_authtoken.models import ExpiringToken
+from oneid_meta.models import AliyunSSORole
 
 logger = logging.getLogger(__name__)    # pylint: disable=invalid-name
 
@@ -147,13 +143,12 @@ class LoginRequiredMixin(AccessMixin):
         '''检查用户cookies是否登录
         '''
         try:
-            spauthn = request.COOKIES['spauthn']
-            token = ExpiringToken.objects.get(key=spauthn)
-            exp = token.expired()
-            if not exp:
+            token = get_spauthn_token(request)
+            if token is not None and not token.expired():
                 return super().dispatch(request, *args, **kwargs)
         except Exception:    # pylint: disable=broad-except
-            return self.handle_no_permission(request.session['SAMLRequest'])
+            pass
+        return self.handle_no_permission(request.session['SAMLRequest'])
 
 
 class IdPHandlerViewMixin:
@@ -167,50 +162,10 @@ class IdPHandlerViewMixin:
 
     def dispatch(self, request, *args, **kwargs):
         """
-        Construct IDP server with config from settings dict
+        Get the process-wide IDP server, rebuilt when its config changes
         """
-        conf = IdPConfig()
         try:
-            SAML_IDP_CONFIG = {  # pylint: disable=invalid-name
-                'debug': settings.DEBUG,
-                'xmlsec_binary': get_xmlsec_binary(['/opt/local/bin', '/usr/bin/xmlsec1']),
-                'entityid': '%s/saml/metadata/' % settings.BASE_URL,
-                'description': 'longguikeji IdP setup',
-
-                'service': {
-                    'idp': {
-                        'name': 'Django localhost IdP',
-                        'endpoints': {
-                            'single_sign_on_service': [
-                                ('%s/saml/sso/post/' % settings.BASE_URL, BINDING_HTTP_POST),
-                                ('%s/saml/sso/redirect/' % settings.BASE_URL, BINDING_HTTP_REDIRECT),
-                            ],
-                        },
-                        'name_id_format': [NAMEID_FORMAT_EMAILADDRESS, NAMEID_FORMAT_UNSPECIFIED],
-                        'sign_response': True,
-                        'sign_assertion': True,
-                    },
-                },
-
-                'metadata': {
-                    'local': [os.path.join(os.path.join(os.path.join(BASEDIR, 'djangosaml2idp'), \
-                                                        'saml2_config'), f) for f in
-                              os.listdir(BASEDIR + '/djangosaml2idp/saml2_config/') \
-                              if f.split('.')[-1] == 'xml'],
-                },
-                # Signing
-                'key_file': BASEDIR + '/djangosaml2idp/certificates/mykey.pem',
-                'cert_file': BASEDIR + '/djangosaml2idp/certificates/mycert.pem',
-                # Encryption
-                'encryption_keypairs': [{
-                    'key_file': BASEDIR + '/djangosaml2idp/certificates/mykey.pem',
-                    'cert_file': BASEDIR + '/djangosaml2idp/certificates/mycert.pem',
-                }],
-                'valid_for': 365 * 24,
-            }
-
-            conf.load(copy.copy(SAML_IDP_CONFIG))
-            self.IDP = Server(config=conf)    # pylint: disable=invalid-name
+            self.IDP = idp_server_cache.get()    # pylint: disable=invalid-name
         except Exception as e:    # pylint: disable=invalid-name, broad-except
             return self.handle_error(request, exception=e)
         return super(IdPHandlerViewMixin, self).dispatch(request, *args, **kwargs)
@@ -247,12 +202,10 @@ class LoginProcessView(LoginRequiredMixin, IdPHandlerViewMixin, View):
     def cookie_user(self, request):    # pylint: disable=no-self-use
         '''返回cookie对应的用户
         '''
-        try:
-            spauthn = request.COOKIES['spauthn']
-            token = ExpiringToken.objects.get(key=spauthn)
-            return token.user
-        except Exception:    # pylint: disable=broad-except
+        token = get_spauthn_token(request)
+        if token is None:
             return request.user
+        return token.user
 
     def get(self, request, *args, **kwargs):    # pylint: disable=missing-function-docstring, unused-argument, too-many-locals
         binding = request.session.get('Binding', BINDING_HTTP_POST)
@@ -315,8 +268,7 @@ class LoginProcessView(LoginRequiredMixin, IdPHandlerViewMixin, View):
         user_id = processor.get_user_id(cookie_user)
         # Construct SamlResponse message
         try:
-            app = SAMLAPP.valid_objects.get(entity_id=resp_args['sp_entity_id'])
-            _spsso_descriptor = entity_descriptor_from_string(app.xmldata).spsso_descriptor.pop()    # pylint: disable=no-member
+            sign_response, sign_assertion = get_sp_sign_options(resp_args['sp_entity_id'])
             authn_resp = self.IDP.create_authn_response(
                 identity=identity,
                 userid=user_id,
@@ -327,8 +279,8 @@ class LoginProcessView(LoginRequiredMixin, IdPHandlerViewMixin, View):
                                sp_name_qualifier=resp_args['sp_entity_id'],
                                text=user_id),
                 authn=AUTHN_BROKER.get_authn_by_accr(req_authn_context),
-                sign_response=getattr(_spsso_descriptor, 'want_response_signed', '') == 'true',
-                sign_assertion=getattr(_spsso_descriptor, 'want_assertions_signed', '') == 'true',
+                sign_response=sign_response,
+                sign_assertion=sign_assertion,
                 **resp_args)
         except Exception as excp:    # pylint: disable=broad-except
             return self.handle_error(request, exception=excp, status=500)
@@ -501,13 +453,12 @@ class AliyunRoleSSOAccessMixin(AccessMixin):
     def dispatch(self, request, *args, **kwargs):
         """检查用户cookies是否登录"""
         try:
-            spauthn = request.COOKIES['spauthn']
-            token = ExpiringToken.objects.get(key=spauthn)
-            exp = token.expired()
-            if not exp:
+            token = get_spauthn_token(request)
+            if token is not None and not token.expired():
                 return super().dispatch(request, *args, **kwargs)
         except Exception:    # pylint: disable=broad-except
-            return self.handle_no_permission()
+            pass
+        return self.handle_no_permission()
 
     def handle_no_permission(self, request_data=None):
         """未登录用户跳转登录页面"""
@@ -535,12 +486,10 @@ class AliyunSSORoleView(AliyunRoleSSOAccessMixin, IdPHandlerViewMixin, View):
         """
         返回cookie对应的用户
         """
-        try:
-            spauthn = request.COOKIES['spauthn']
-            token = ExpiringToken.objects.get(key=spauthn)
-            return token.user
-        except Exception:    # pylint: disable=broad-except
+        token = get_spauthn_token(request)
+        if token is None:
             return request.user
+        return token.user
 
     def get(self, request, *args, **kwargs):    # pylint: disable=missing-function-docstring, unused-argument, too-many-locals
         resp_args = {
@@ -577,18 +526,15 @@ class AliyunSSORoleView(AliyunRoleSSOAccessMixin, IdPHandlerViewMixin, View):
         user_id = processor.get_user_id(cookie_user)
         # Construct SamlResponse message
         try:
-            app = SAMLAPP.valid_objects.get(entity_id=resp_args['sp_entity_id'])
-            _spsso_descriptor = entity_descriptor_from_string(app.xmldata).spsso_descriptor.pop()    # pylint: disable=no-member
+            sign_response, sign_assertion = get_sp_sign_options(resp_args['sp_entity_id'])
             authn_resp = self.IDP.create_authn_response(identity=identity,
                                                         userid=user_id,
                                                         name_id=NameID(format=resp_args['name_id_policy'],
                                                                        sp_name_qualifier=resp_args['sp_entity_id'],
                                                                        text=user_id),
                                                         authn=AUTHN_BROKER.get_authn_by_accr(PASSWORD),
-                                                        sign_response=getattr(_spsso_descriptor, 'want_response_signed',
-                                                                              '') == 'true',
-                                                        sign_assertion=getattr(_spsso_descriptor,
-                                                                               'want_assertions_signed', '') == 'true',
+                                                        sign_response=sign_response,
+                                                        sign_assertion=sign_assertion,
                                                         **resp_args)
         except Exception as excp:    # pylint: disable=broad-except
             return self.handle_error(request, exception=excp, status=500)
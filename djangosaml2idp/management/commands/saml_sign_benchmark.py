@@ -0,0 +1,63 @@
+'''
+比较 SAML 签名后端的耗时
+'''
+import os
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from saml2 import saml
+from saml2.s_utils import sid
+from saml2.sigver import CryptoBackendXmlSec1, class_name, get_xmlsec_binary, pre_signature_part
+
+from djangosaml2idp.crypto import CryptoBackendPythonXmlSec, BACKEND_XMLSEC1, BACKEND_PYTHON_XMLSEC
+from djangosaml2idp.idpserver import KEY_FILE, CERT_FILE
+
+
+def build_assertion():
+    '''
+    带签名模板的断言
+    '''
+    assertion_id = sid()
+    with open(CERT_FILE) as f:
+        cert = ''.join(line for line in f.read().splitlines() if not line.startswith('-----'))
+    assertion = saml.Assertion(
+        id=assertion_id,
+        version='2.0',
+        issue_instant=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        issuer=saml.Issuer(text='http://localhost/saml/metadata/'),
+        subject=saml.Subject(name_id=saml.NameID(format=saml.NAMEID_FORMAT_UNSPECIFIED, text='admin')),
+    )
+    assertion.signature = pre_signature_part(assertion_id, cert, 1)
+    return assertion_id, str(assertion)
+
+
+class Command(BaseCommand):
+    help = 'Compare the time spent signing a SAML assertion with each crypto backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Signatures per backend.')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(KEY_FILE) or not os.path.exists(CERT_FILE):
+            raise CommandError('IdP key or certificate not found, run djangosaml2idp.scripts.idpinit first')
+
+        xmlsec_binary = get_xmlsec_binary(['/opt/local/bin', '/usr/bin/xmlsec1'])
+        backends = [(BACKEND_XMLSEC1, CryptoBackendXmlSec1(xmlsec_binary))]
+        try:
+            backends.append((BACKEND_PYTHON_XMLSEC, CryptoBackendPythonXmlSec(xmlsec_binary)))
+        except ImproperlyConfigured as exc:
+            self.stderr.write('{}: skipped, {}'.format(BACKEND_PYTHON_XMLSEC, exc))
+
+        iterations = options['iterations']
+        assertion_id, statement = build_assertion()
+        node_name = class_name(saml.Assertion())
+        for name, backend in backends:
+            # 首次签名包含密钥加载，不计入
+            backend.sign_statement(statement, node_name, KEY_FILE, assertion_id, 'ID')
+            start = time.perf_counter()
+            for _ in range(iterations):
+                backend.sign_statement(statement, node_name, KEY_FILE, assertion_id, 'ID')
+            elapsed = time.perf_counter() - start
+            self.stdout.write('{}: {:.2f} ms/signature, {:.0f} signatures/s'.format(
+                name, elapsed * 1000 / iterations, iterations / elapsed))
@@ -2,33 +2,63 @@
 检查是否有权限等
 '''
 from django.conf import settings
-from oneid_meta.models import SAMLAPP, Perm, UserPerm
-from drf_expiring_authtoken.models import ExpiringToken
+from common.django.generation import GenerationCache
+from oneid_meta.generation import PERM_GENERATION
+from oneid_meta.models import SAMLAPP, Perm
+from drf_expiring_authtoken.authentication import ExpiringTokenAuthentication
+
+
+def get_spauthn_token(request):
+    '''
+    cookie 中 spauthn 对应的 token，每个请求只解析一次
+    token.user 由 token 缓存中的用户快照重建
+    :rtype: ExpiringToken，token 不存在时为 None
+    '''
+    if not hasattr(request, '_spauthn_token'):
+        key = request.COOKIES.get('spauthn')
+        token = None
+        if key:
+            token, _ = ExpiringTokenAuthentication().get_token(key)
+        request._spauthn_token = token    # pylint: disable=protected-access
+    return request._spauthn_token    # pylint: disable=protected-access
 
 
 class BaseProcessor:
     """ Processor class is used to determine if a user has access to a client service of this IDP
         and to construct the identity dictionary which is sent to the SP
     """
+    # entity_id -> 应用访问权限 id，进程内缓存，随 PERM_GENERATION 失效
+    _access_perm_cache = GenerationCache(PERM_GENERATION)
+
     def __init__(self, entity_id):
         self._entity_id = entity_id
 
-    def has_access(self, request):    # pylint: disable=no-self-use
+    @classmethod
+    def get_access_perm_id(cls, entity_id):
+        '''
+        SP 所属应用的访问权限 id，不存在时为 None
+        '''
+        def load():
+            samlapp = SAMLAPP.valid_objects.filter(entity_id=entity_id).select_related('app').first()
+            if samlapp is None or samlapp.app is None:
+                return None
+            return Perm.valid_objects.filter(scope=samlapp.app.uid, action='access',
+                                             subject='app').values_list('id', flat=True).first()
+
+        return cls._access_perm_cache.get_or_load(entity_id, load)
+
+    def has_access(self, request):
         """
         Check if this user is allowed to use this IDP
         """
-        spauthn = request.COOKIES['spauthn']
-        token_object = ExpiringToken.objects.get(key=spauthn)
-        user = token_object.user
+        token = get_spauthn_token(request)
+        if token is None:
+            return False
+        user = token.user
         if user.is_admin:
             return True
-        samlapp = SAMLAPP.objects.filter(entity_id=self._entity_id, is_del=False).first()
-        app = samlapp.app
-        perm = Perm.valid_objects.filter(scope=app.uid, action='access', subject='app').first()
-        userperm = UserPerm.valid_objects.filter(owner=user, perm=perm, value=True)
-        if userperm:
-            return True
-        return False
+        perm_id = self.get_access_perm_id(self._entity_id)
+        return perm_id is not None and perm_id in user.perm_ids
 
     def enable_multifactor(self, user):    # pylint: disable=unused-argument, no-self-use
         """ Check if this user should use a second authentication system
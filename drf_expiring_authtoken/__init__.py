@@ -3,3 +3,5 @@
 __all__ = ['authentication', 'models', 'views']
 
 __version__ = '0.1.4'
+
+default_app_config = 'drf_expiring_authtoken.apps.ExpiringAuthtokenConfig'
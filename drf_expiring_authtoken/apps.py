@@ -0,0 +1,19 @@
+"""App config for drf_expiring_authtoken."""
+from django.apps import AppConfig
+from django.db.models.signals import post_save, post_delete
+
+
+class ExpiringAuthtokenConfig(AppConfig):
+    """Connects the signals that keep the token cache coherent."""
+
+    name = 'drf_expiring_authtoken'
+
+    def ready(self):
+        from drf_expiring_authtoken.cache import invalidate_token, invalidate_user_tokens    # pylint: disable=import-outside-toplevel
+        from drf_expiring_authtoken.models import ExpiringToken    # pylint: disable=import-outside-toplevel
+        user_model = ExpiringToken.user.field.related_model
+
+        post_save.connect(invalidate_token, sender=ExpiringToken, dispatch_uid='auth_token_cache:token:save')
+        post_delete.connect(invalidate_token, sender=ExpiringToken, dispatch_uid='auth_token_cache:token:delete')
+        post_save.connect(invalidate_user_tokens, sender=user_model, dispatch_uid='auth_token_cache:user:save')
+        post_delete.connect(invalidate_user_tokens, sender=user_model, dispatch_uid='auth_token_cache:user:delete')
@@ -3,9 +3,12 @@
 Classes:
     ExpiringTokenAuthentication: Authentication using extended authtoken model.
 """
+from django.db import router
 from rest_framework import exceptions
 from rest_framework.authentication import TokenAuthentication
+from drf_expiring_authtoken.cache import token_cache
 from drf_expiring_authtoken.models import ExpiringToken
+from drf_expiring_authtoken.settings import token_settings
 
 
 class ExpiringTokenAuthentication(TokenAuthentication):
@@ -19,13 +22,53 @@ class ExpiringTokenAuthentication(TokenAuthentication):
 
     def authenticate_credentials(self, key):
         """Attempt token authentication using the provided key."""
-        try:
-            token = self.model.objects.select_related('user').get(key=key)
-        except self.model.DoesNotExist:
+        token, is_active = self.get_token(key)
+        if token is None:
             raise exceptions.AuthenticationFailed('Invalid token')
-        if not token.user.is_active:
+        if not is_active:
             raise exceptions.AuthenticationFailed('User inactive or deleted')
 
         if token.expired():
             raise exceptions.AuthenticationFailed('Token has expired')
+
         return (token.user, token)
+
+    def get_token(self, key):
+        """
+        Return (token, is_active of its user) from the token cache, (None, False) if missing.
+
+        token.user is rebuilt from the cached snapshot; uncached fields are
+        deferred and loaded from the database on first access.
+        """
+        entry = token_cache.get_or_load(key, lambda: self.load_token_entry(key))
+        if entry is None:
+            return None, False
+        user = self.user_from_snapshot(entry['user'])
+        token = self.model(key=key, user=user, created=entry['created'])
+        token._state.adding = False    # pylint: disable=protected-access
+        return token, user.is_active
+
+    def load_token_entry(self, key):
+        """Load the cache entry of a token from the database, None if missing."""
+        token = self.model.objects.filter(key=key).select_related('user').first()
+        if token is None:
+            return None
+        return {'created': token.created, 'user': self.user_snapshot(token.user)}
+
+    @staticmethod
+    def snapshot_fields(user_model):
+        """Return the concrete user fields kept in the cache, in model order."""
+        uncached = set(token_settings.EXPIRING_TOKEN_USER_UNCACHED_FIELDS)
+        uncached.update(token_settings.EXPIRING_TOKEN_USER_IGNORED_FIELDS)
+        fields = user_model._meta.concrete_fields    # pylint: disable=protected-access
+        return [field for field in fields if field.name not in uncached]
+
+    def user_snapshot(self, user):
+        """Return the cached field values of a user, without sensitive or ignored fields."""
+        return {field.attname: getattr(user, field.attname) for field in self.snapshot_fields(type(user))}
+
+    def user_from_snapshot(self, snapshot):
+        """Rebuild a user from its cached field values, deferring the others."""
+        user_model = self.model._meta.get_field('user').related_model    # pylint: disable=no-member, protected-access
+        fields = [field.attname for field in self.snapshot_fields(user_model) if field.attname in snapshot]
+        return user_model.from_db(router.db_for_read(user_model), fields, [snapshot[name] for name in fields])
@@ -0,0 +1,109 @@
+"""Token cache.
+
+Token validation is the first step of every request, so the
+key -> (created, user snapshot) mapping is cached in two layers:
+
+- a bounded in-process LRU whose entries live for a few seconds; other
+  processes therefore see a revoked token or a deactivated user at most
+  EXPIRING_TOKEN_LOCAL_CACHE_TIMEOUT seconds late
+- the shared django cache (redis), dropped when the token is deleted or
+  its user is saved or deleted
+
+The user snapshot leaves out EXPIRING_TOKEN_USER_UNCACHED_FIELDS, e.g. the
+password hash, and EXPIRING_TOKEN_USER_IGNORED_FIELDS, whose changes do not
+invalidate entries; both are loaded from the database on first access.
+Entries are cleared again when the current transaction commits,
+so a concurrent request cannot cache data from before the commit.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from drf_expiring_authtoken.settings import token_settings
+
+
+class TokenCache:
+    """Cache of token entries, keyed by token key."""
+
+    KEY_PREFIX = 'oneid:auth_token:'
+
+    def __init__(self):
+        self._local = OrderedDict()    # key -> (expires_at, entry)
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        """
+        Return the entry of a token, calling loader on miss.
+
+        loader returns an entry dict or None; None is not cached.
+        The returned entry is a copy and safe to modify.
+        """
+        if transaction.get_connection().in_atomic_block:
+            entry = self._get_shared_or_load(key, loader)
+            return dict(entry) if entry is not None else None
+
+        now = time.monotonic()
+        with self._lock:
+            cached = self._local.get(key)
+            if cached is not None and cached[0] > now:
+                self._local.move_to_end(key)
+                return dict(cached[1])
+
+        entry = self._get_shared_or_load(key, loader)
+        with self._lock:
+            if entry is None:
+                self._local.pop(key, None)
+                return None
+            self._local[key] = (now + token_settings.EXPIRING_TOKEN_LOCAL_CACHE_TIMEOUT, entry)
+            self._local.move_to_end(key)
+            while len(self._local) > token_settings.EXPIRING_TOKEN_LOCAL_CACHE_SIZE:
+                self._local.popitem(last=False)
+        return dict(entry)
+
+    def _get_shared_or_load(self, key, loader):
+        """Return the entry from the shared cache, calling loader on miss."""
+        entry = cache.get(self.KEY_PREFIX + key)
+        if entry is None:
+            entry = loader()
+            if entry is not None and not transaction.get_connection().in_atomic_block:
+                cache.set(self.KEY_PREFIX + key, entry, timeout=token_settings.EXPIRING_TOKEN_CACHE_TIMEOUT)
+        return entry
+
+    def invalidate(self, *keys):
+        """Drop the entries of the given token keys, again on commit."""
+        if not keys:
+            return
+
+        def _invalidate():
+            cache.delete_many([self.KEY_PREFIX + key for key in keys])
+            with self._lock:
+                for key in keys:
+                    self._local.pop(key, None)
+
+        _invalidate()
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(_invalidate)
+
+    def clear_local(self):
+        """Drop all entries cached in this process."""
+        with self._lock:
+            self._local.clear()
+
+
+token_cache = TokenCache()
+
+
+def invalidate_token(sender, instance, **kwargs):    # pylint: disable=unused-argument
+    """Token saved or deleted."""
+    token_cache.invalidate(instance.key)
+
+
+def invalidate_user_tokens(sender, instance, update_fields=None, **kwargs):    # pylint: disable=unused-argument
+    """User saved or deleted, e.g. deactivated or soft-deleted."""
+    from drf_expiring_authtoken.models import ExpiringToken    # pylint: disable=import-outside-toplevel
+    if update_fields and set(update_fields) <= set(token_settings.EXPIRING_TOKEN_USER_IGNORED_FIELDS):
+        return
+    token_cache.invalidate(*ExpiringToken.objects.filter(user_id=instance.id).values_list('key', flat=True))
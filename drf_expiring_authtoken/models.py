@@ -35,6 +35,11 @@ class ExpiringToken(models.Model):
     def generate_key(self):
         return binascii.hexlify(os.urandom(20)).decode()
 
+    @classmethod
+    def get_expired(cls):
+        """Return the tokens older than EXPIRING_TOKEN_LIFESPAN."""
+        return cls.objects.filter(created__lt=timezone.now() - token_settings.EXPIRING_TOKEN_LIFESPAN)
+
     def expired(self):
         """Return boolean indicating token expiration."""
         now = timezone.now()
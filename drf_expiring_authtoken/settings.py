@@ -25,5 +25,50 @@ class TokenSettings:
 
         return val
 
+    @property
+    def EXPIRING_TOKEN_CACHE_TIMEOUT(self):
+        """
+        Return the timeout in seconds of token entries in the shared cache.
+
+        Defaults to 5 minutes.
+        """
+        return getattr(settings, 'EXPIRING_TOKEN_CACHE_TIMEOUT', 60 * 5)
+
+    @property
+    def EXPIRING_TOKEN_LOCAL_CACHE_SIZE(self):
+        """
+        Return the max number of token entries cached in each process.
+
+        Defaults to 1024.
+        """
+        return getattr(settings, 'EXPIRING_TOKEN_LOCAL_CACHE_SIZE', 1024)
+
+    @property
+    def EXPIRING_TOKEN_LOCAL_CACHE_TIMEOUT(self):
+        """
+        Return the timeout in seconds of token entries cached in each process.
+
+        Bounds how late other processes see an invalidation. Defaults to 5 seconds.
+        """
+        return getattr(settings, 'EXPIRING_TOKEN_LOCAL_CACHE_TIMEOUT', 5)
+
+    @property
+    def EXPIRING_TOKEN_USER_IGNORED_FIELDS(self):
+        """
+        Return the user fields whose changes do not invalidate cached tokens.
+
+        e.g. activity timestamps. Defaults to none.
+        """
+        return getattr(settings, 'EXPIRING_TOKEN_USER_IGNORED_FIELDS', ())
+
+    @property
+    def EXPIRING_TOKEN_USER_UNCACHED_FIELDS(self):
+        """
+        Return the user fields never stored in the token cache.
+
+        They are loaded from the database on first access. Defaults to the password.
+        """
+        return getattr(settings, 'EXPIRING_TOKEN_USER_UNCACHED_FIELDS', ('password', ))
+
 
 token_settings = TokenSettings()
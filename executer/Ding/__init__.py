@@ -12,6 +12,18 @@ from thirdparty_data_sdk.dingding.dingsdk.role_manager import RoleManager
 from oneid_meta.models import User, DeptMember, Dept, Group, DingConfig
 
 DEFAULT_DEPT = '1'
+# 钉钉批量设置角色接口单次的角色、员工数上限
+MAX_ROLES_PER_CALL = 20
+MAX_USERS_PER_CALL = 100
+
+
+def role_batches(role_ids, user_ids):
+    """
+    按接口上限切分角色、员工，生成 (roleIds, userIds)
+    """
+    for i in range(0, len(role_ids), MAX_ROLES_PER_CALL):
+        for j in range(0, len(user_ids), MAX_USERS_PER_CALL):
+            yield ','.join(role_ids[i:i + MAX_ROLES_PER_CALL]), ','.join(user_ids[j:j + MAX_USERS_PER_CALL])
 
 
 class DingExecuter(Executer):
@@ -283,6 +295,42 @@ class DingExecuter(Executer):
 
             self.role_manager.delete_users_roles(str(group.ding_group.uid), user_ids[:-1])
 
+    def add_users_to_nodes(self, users, nodes):
+        """
+        将一批用户加入一批部门、角色
+        角色一次调用批量添加，部门按用户各更新一次
+        """
+        ding_user_uids = [user.ding_user.uid for user in users if user.ding_user]
+        role_ids = [str(node.ding_group.uid) for node in nodes if not isinstance(node, Dept) and node.ding_group]
+        dept_ids = [node.ding_dept.uid for node in nodes if isinstance(node, Dept) and node.ding_dept]
+
+        for batch_role_ids, batch_user_ids in role_batches(role_ids, ding_user_uids):
+            self.role_manager.add_users_roles(batch_role_ids, batch_user_ids)
+        if dept_ids:
+            for ding_user_uid in ding_user_uids:
+                join_depts = self.user_manager.get_user_detail(ding_user_uid)['department']
+                add_depts = [dept_id for dept_id in dept_ids if dept_id not in join_depts]
+                if add_depts:
+                    self.user_manager.update_user(ding_user_uid, department=join_depts + add_depts)
+
+    def delete_users_from_nodes(self, users, nodes):
+        """
+        将一批用户从一批部门、角色中移除
+        角色一次调用批量删除，部门按用户各更新一次
+        """
+        ding_user_uids = [user.ding_user.uid for user in users if user.ding_user]
+        role_ids = [str(node.ding_group.uid) for node in nodes if not isinstance(node, Dept) and node.ding_group]
+        dept_ids = [node.ding_dept.uid for node in nodes if isinstance(node, Dept) and node.ding_dept]
+
+        for batch_role_ids, batch_user_ids in role_batches(role_ids, ding_user_uids):
+            self.role_manager.delete_users_roles(batch_role_ids, batch_user_ids)
+        if dept_ids:
+            for ding_user_uid in ding_user_uids:
+                join_depts = self.user_manager.get_user_detail(ding_user_uid)['department']
+                left_depts = [dept_id for dept_id in join_depts if dept_id not in dept_ids]
+                if len(left_depts) != len(join_depts):
+                    self.user_manager.update_user(ding_user_uid, department=left_depts)
+
     def add_group_to_group(self, group, parent_group):
         """
         创建组时已经做了加入
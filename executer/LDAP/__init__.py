@@ -51,14 +51,18 @@ LDAP数据操作
   May contain attributes: businessCategory, seeAlso, owner, ou, o, description
   OidInfo: ('2.5.6.9', 'OBJECT_CLASS', 'groupOfNames', 'RFC4519')
 '''
-from ldap3 import Server, MODIFY_ADD, MODIFY_DELETE
+import functools
+import threading
+
+from ldap3 import MODIFY_ADD, MODIFY_DELETE
 from ldap3.core.exceptions import LDAPNoSuchObjectResult, LDAPNotAllowedOnNotLeafResult
 from django.conf import settings
 
 from executer.utils.operation import list_diff
 from executer.utils.password import encrypt_password
-from executer.LDAP.client import Connection
-from executer.core import Executer
+from executer.LDAP.perm_digest import forget_digests
+from executer.LDAP.pool import get_pool
+from executer.core import Executer, FUNC_NAMES
 
 
 class LDAPExecuter(Executer):
@@ -75,18 +79,24 @@ class LDAPExecuter(Executer):
         self.dept_base = 'ou=dept,{}'.format(self.base)
         self.group_base = 'ou=group,{}'.format(self.base)
         self.people_base = 'ou=people,{}'.format(self.base)
-        self.server = Server(server if server else settings.LDAP_SERVER)
-        self.conn = Connection(
-            self.server,
-            user=user if user else settings.LDAP_USER,
-            password=password if password else settings.LDAP_PASSWORD,
-            auto_bind=True,
-            raise_exceptions=True,
-        )
+        self.pool = get_pool(server, user, password)
+        # 仅在操作执行期间持有从连接池借出的连接，各线程分别借用
+        self._local = threading.local()
 
         self.group_placeholder = ''
         self.dept_placeholder = ''
 
+    @property
+    def conn(self):
+        '''
+        当前线程借出的连接，不在操作执行期间时为 None
+        '''
+        return getattr(self._local, 'conn', None)
+
+    @conn.setter
+    def conn(self, conn):
+        self._local.conn = conn
+
     def create_user(self, user_info):
         '''
         创建用户
@@ -116,6 +126,7 @@ class LDAPExecuter(Executer):
             self.user_object_class,
             attributes,
         )
+        forget_digests(attributes['uid'])
         return dn
 
     def update_user(self, user, user_info):
@@ -141,12 +152,24 @@ class LDAPExecuter(Executer):
         self.conn.patch(dn, attributes)
         return dn
 
-    def set_user_password(self, user, plaintext):
+    @classmethod
+    def outbox_params(cls, func_name, args, kwargs):
+        '''
+        密码以加密后的形式写入 outbox
+        '''
+        if func_name == 'set_user_password':
+            user, plaintext = args
+            return (user, encrypt_password(plaintext, settings.PASSWORD_ENCRYPTION)), {'encrypted': True}
+        return args, kwargs
+
+    def set_user_password(self, user, plaintext, encrypted=False):    # pylint: disable=arguments-differ
         '''
         更新用户密码
+        :param bool encrypted: plaintext 已加密
         '''
         dn = user.dn
-        self.conn.patch(dn, {'userPassword': encrypt_password(plaintext, settings.PASSWORD_ENCRYPTION)})
+        password = plaintext if encrypted else encrypt_password(plaintext, settings.PASSWORD_ENCRYPTION)
+        self.conn.patch(dn, {'userPassword': password})
 
     def delete_users(self, users):
         '''
@@ -161,6 +184,7 @@ class LDAPExecuter(Executer):
                 self.conn.delete_member(group_dn, [user_dn])
 
             self.conn.delete(user_dn)
+            forget_digests(user.username)
 
     def create_dept(self, dept_info):
         '''
@@ -407,3 +431,47 @@ class LDAPExecuter(Executer):
         调整一批人在组中的排序
         LDAP中无需维护
         '''
+
+    def add_users_to_nodes(self, users, nodes):
+        '''
+        将一批用户加入一批部门、组，每个节点读写各一次
+        '''
+        user_dns = {user.dn for user in users}
+        for node in nodes:
+            node_dn = node.dn
+            entry = self.conn.get_entry_by_dn(node_dn, raise_exception=True, attributes='member')
+            members = set(entry.entry_attributes_as_dict.get('member', []))
+            self.conn.modify_diff(node_dn, 'member', user_dns - members, set())
+
+    def delete_users_from_nodes(self, users, nodes):
+        '''
+        将一批用户从一批部门、组中移除，每个节点读写各一次
+        '''
+        user_dns = {user.dn for user in users}
+        for node in nodes:
+            node_dn = node.dn
+            entry = self.conn.get_entry_by_dn(node_dn, raise_exception=True, attributes='member')
+            members = set(entry.entry_attributes_as_dict.get('member', []))
+            self.conn.modify_diff(node_dn, 'member', set(), user_dns & members)
+
+
+def with_connection(func):
+    '''
+    执行期间从连接池借出 self.conn，同一线程内的嵌套调用沿用同一连接
+    '''
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if self.conn is not None:
+            return func(self, *args, **kwargs)
+        with self.pool.connection() as conn:
+            self.conn = conn
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                self.conn = None
+
+    return wrapper
+
+
+for executer_func in FUNC_NAMES:
+    setattr(LDAPExecuter, executer_func, with_connection(getattr(LDAPExecuter, executer_func)))
@@ -83,6 +83,22 @@ class Connection(LDAPConnection):
         if vals:
             return self.modify(dn, {attribute: [(MODIFY_DELETE, vals)]})
 
+    def modify_diff(self, dn, attribute, add_vals, delete_vals):
+        '''
+        在一次请求中为指定属性增加、删除一批值
+        :param str dn:
+        :param str attribute:
+        :param list add_vals:
+        :param list delete_vals:
+        '''
+        changes = []
+        if add_vals:
+            changes.append((MODIFY_ADD, list(add_vals)))
+        if delete_vals:
+            changes.append((MODIFY_DELETE, list(delete_vals)))
+        if changes:
+            return self.modify(dn, {attribute: changes})
+
     def modify_override(self, dn, attribute, vals):
         '''
         为指定属性重写一批值
@@ -0,0 +1,48 @@
+'''
+LDAP 中用户权限（inetOrgPerson.ou）的写入记录
+记录每个用户上次写入的权限摘要，供 scripts.ldap_user_perm 跳过未变化的用户
+记录在 DIGEST_TIMEOUT 后过期，此后该用户的权限重新写入一次，以纠正 LDAP 中被直接修改的数据
+'''
+import hashlib
+
+from django.core.cache import cache
+
+KEY_PREFIX = 'oneid:ldap_user_perm:'
+# 摘要保留时间（秒）
+DIGEST_TIMEOUT = 24 * 3600
+
+
+def _key(username):    # pylint: disable=missing-function-docstring
+    return KEY_PREFIX + username
+
+
+def get_digest(perm_uids):
+    '''
+    权限集合的摘要
+    '''
+    return hashlib.md5('\n'.join(sorted(perm_uids)).encode('utf-8')).hexdigest()
+
+
+def load_digests(usernames):
+    '''
+    上次写入的摘要
+    :rtype: dict {username: digest}，未记录的用户不在其中
+    '''
+    digests = cache.get_many([_key(username) for username in usernames])
+    return {key[len(KEY_PREFIX):]: digest for key, digest in digests.items()}
+
+
+def save_digests(digests):
+    '''
+    记录写入的摘要
+    :param dict digests: {username: digest}
+    '''
+    cache.set_many({_key(username): digest for username, digest in digests.items()}, timeout=DIGEST_TIMEOUT)
+
+
+def forget_digests(*usernames):
+    '''
+    忘记写入记录，下次刷新时重新写入
+    LDAP 中的用户被创建、删除时调用
+    '''
+    cache.delete_many([_key(username) for username in usernames])
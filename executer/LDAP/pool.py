@@ -0,0 +1,201 @@
+'''
+LDAP 连接池
+每个进程按 (server, user, password) 维护一组已绑定的连接，避免每次写入都重新建连、绑定
+借出时检查连接状态，闲置过久的连接先探活，失效的连接重新绑定
+'''
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from ldap3 import Server, BASE
+from ldap3.core.exceptions import LDAPException, LDAPOperationResult, LDAPCommunicationError
+
+from executer.LDAP.client import Connection, FILTER_ALL
+
+
+class LDAPPoolTimeout(Exception):
+    '''
+    等待空闲连接超时
+    '''
+
+
+def connect(server, user, password):
+    '''
+    新建并绑定连接
+    '''
+    return Connection(
+        Server(server),
+        user=user,
+        password=password,
+        auto_bind=True,
+        raise_exceptions=True,
+    )
+
+
+def is_alive(conn):
+    '''
+    查询 root DSE 探活，服务端有应答即视为可用
+    '''
+    try:
+        conn.search('', FILTER_ALL, search_scope=BASE, attributes=['1.1'])
+    except LDAPOperationResult:
+        return True
+    except LDAPException:
+        return False
+    return True
+
+
+class ConnectionPool:
+    '''
+    有界的连接池，线程安全
+    连接数达到 size 后，借出需等待其他线程归还，超过 timeout 秒抛出 LDAPPoolTimeout
+    '''
+    def __init__(self, connect_func, size, timeout, check_interval):
+        '''
+        :param callable connect_func: 返回已绑定的新连接
+        :param int check_interval: 闲置超过该秒数的连接借出前先探活
+        '''
+        self.connect_func = connect_func
+        self.size = size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self._cond = threading.Condition()
+        self._idle = []    # [(conn, 归还时间)]
+        self._created = 0
+        self._pid = os.getpid()
+
+    def _check_pid(self):
+        '''
+        fork 出的子进程不能沿用父进程的 socket，丢弃继承来的连接
+        '''
+        if self._pid != os.getpid():
+            self._idle = []
+            self._created = 0
+            self._pid = os.getpid()
+
+    def _is_usable(self, conn, idle_for):
+        '''
+        连接仍处于绑定状态，闲置过久的需探活
+        '''
+        if conn.closed or not conn.bound:
+            return False
+        if idle_for >= self.check_interval:
+            return is_alive(conn)
+        return True
+
+    @staticmethod
+    def _close(conn):
+        '''
+        关闭连接，忽略已断开时的错误
+        '''
+        try:
+            conn.unbind()
+        except LDAPException:
+            pass
+
+    def acquire(self):
+        '''
+        借出一个可用连接，用毕须 release
+        '''
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._check_pid()
+            while not self._idle and self._created >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LDAPPoolTimeout('no idle LDAP connection in {}s'.format(self.timeout))
+                self._cond.wait(remaining)
+            if self._idle:
+                conn, released_at = self._idle.pop()
+            else:
+                conn, released_at = None, None
+                self._created += 1
+
+        try:
+            if conn is None:
+                conn = self.connect_func()
+            elif not self._is_usable(conn, time.monotonic() - released_at):
+                self._close(conn)
+                conn = self.connect_func()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, discard=False):
+        '''
+        归还连接
+        :param bool discard: 连接已不可用，关闭而不放回
+        '''
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            if discard:
+                self._created -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self):
+        '''
+        借出连接，通信出错时丢弃该连接
+        '''
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except LDAPCommunicationError:
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def clear(self):
+        '''
+        关闭全部空闲连接
+        '''
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+
+_pools = {}    # pylint: disable=invalid-name
+_pools_lock = threading.Lock()    # pylint: disable=invalid-name
+
+
+def get_pool(server='', user='', password='', name='default', size=None):
+    '''
+    本进程内共享的连接池，参数为空时取 settings 中的管理员配置
+    :param name: 不同 name 的连接池互不借用连接，供需同时持有多个连接的调用方独立使用
+    :param size: 连接数上限，默认为 settings.LDAP_POOL_SIZE，仅在首次创建该连接池时生效
+    '''
+    params = (
+        server if server else settings.LDAP_SERVER,
+        user if user else settings.LDAP_USER,
+        password if password else settings.LDAP_PASSWORD,
+    )
+    key = params + (name, )
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(
+                    functools.partial(connect, *params),
+                    size=size if size else settings.LDAP_POOL_SIZE,
+                    timeout=settings.LDAP_POOL_TIMEOUT,
+                    check_interval=settings.LDAP_POOL_CHECK_INTERVAL,
+                )
+                _pools[key] = pool
+    return pool
@@ -8,6 +8,7 @@ from rest_framework.exceptions import ValidationError
 from django.conf import settings
 from executer.core import Executer
 from executer.utils.password import encrypt_password
+from oneid_meta.generation import ORG_GENERATION, PERM_GENERATION
 from oneid_meta.models import (
     Dept,
     DeptMember,
@@ -331,3 +332,71 @@ class RDBExecuter(Executer):    # pylint: disable=abstract-method
         group.order_no = Group.get_max_order_no(parent=parent_group) + 1
         group.parent = parent_group
         group.save(update_fields=['order_no', 'parent'])
+
+    def create_users(self, users_info):
+        '''
+        批量创建用户，全部用户的权限记录一次写入
+        校验失败时抛出 ValidationError({序号: 错误})
+        '''
+        users = []
+        for index, user_info in enumerate(users_info):
+            serializer = UserSerializer(data=user_info)
+            try:
+                if not serializer.is_valid():
+                    raise ValidationError(serializer.errors)
+                serializer.save()    # User.save 亦可能抛出 ValidationError
+            except ValidationError as exc:
+                raise ValidationError({index: exc.detail})
+            users.append(serializer.instance)
+
+        perms = list(Perm.valid_objects.all())
+        if users and perms:
+            UserPerm.objects.bulk_create([UserPerm(owner=user, perm=perm) for user in users for perm in perms])
+            PERM_GENERATION.bump()
+        return users
+
+    def update_users(self, updates):
+        '''
+        批量更新用户
+        校验失败时抛出 ValidationError({序号: 错误})
+        '''
+        users = []
+        for index, (user, user_info) in enumerate(updates):
+            serializer = UserSerializer(user, data=user_info, partial=True)
+            try:
+                if not serializer.is_valid():
+                    raise ValidationError(serializer.errors)
+                serializer.save()
+            except ValidationError as exc:
+                raise ValidationError({index: exc.detail})
+            users.append(serializer.instance)
+        return users
+
+    def add_users_to_nodes(self, users, nodes):
+        '''
+        将一批用户加入一批部门、组，每个节点一次写入
+        '''
+        created = False
+        for node in nodes:
+            member_cls = node.member_cls
+            exist_ids = set(member_cls.valid_objects.filter(owner=node, user__in=users).values_list('user_id',
+                                                                                                   flat=True))
+            order_no = member_cls.get_max_order_no(owner=node)
+            members = []
+            for user in users:
+                if user.id not in exist_ids:
+                    exist_ids.add(user.id)
+                    order_no += 1
+                    members.append(member_cls(user=user, owner=node, order_no=order_no))
+            if members:
+                member_cls.objects.bulk_create(members)
+                created = True
+        if created:
+            ORG_GENERATION.bump()
+
+    def delete_users_from_nodes(self, users, nodes):
+        '''
+        将一批用户从一批部门、组中移除，每个节点一次删除
+        '''
+        for node in nodes:
+            node.member_cls.valid_objects.filter(owner=node, user__in=users).delete()
@@ -162,6 +162,26 @@ class CacheExecuter(Executer):
         '''
         self._move_node_to_node(dept, parent_dept)
 
+    def create_users(self, users_info):
+        '''
+        目前不影响缓存
+        '''
+    def update_users(self, updates):
+        '''
+        目前不影响缓存
+        '''
+    def add_users_to_nodes(self, users, nodes):
+        '''
+        更新用户缓存
+        '''
+        update_users_cache.delay([user.username for user in users])
+
+    def delete_users_from_nodes(self, users, nodes):
+        '''
+        更新用户缓存
+        '''
+        update_users_cache.delay([user.username for user in users])
+
     @staticmethod
     def _move_node_to_node(node, parent_node):    # pylint: disable=unused-argument
         '''
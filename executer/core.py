@@ -6,12 +6,24 @@ from django.utils.module_loading import import_string
 from django.conf import settings
 
 from common.django.middleware import CrequestMiddleware
+from executer.outbox import OutboxExecuter, is_write_behind
+from oneid_meta.models import Dept
 
 
 class Executer():
     '''
     各模块的操作数据
     '''
+    @classmethod
+    def outbox_params(cls, func_name, args, kwargs):
+        '''
+        延后执行时写入 outbox 的参数 (args, kwargs)，为 None 时不写入
+        默认不保存明文密码，set_user_password 不延后执行
+        '''
+        if func_name == 'set_user_password':
+            return None
+        return args, kwargs
+
     def create_user(self, user_info):
         '''
         :param dict data:
@@ -228,6 +240,50 @@ class Executer():
         '''
         raise NotImplementedError
 
+    def create_users(self, users_info):
+        '''
+        批量创建用户
+        默认逐个调用 create_user
+        :param list users_info:
+        :return: 与 users_info 一一对应的结果
+        '''
+        return [self.create_user(user_info) for user_info in users_info]
+
+    def update_users(self, updates):
+        '''
+        批量更新用户
+        默认逐个调用 update_user
+        :param list updates: [(user, user_info)]
+        :return: 与 updates 一一对应的结果
+        '''
+        return [self.update_user(user, user_info) for user, user_info in updates]
+
+    def add_users_to_nodes(self, users, nodes):
+        '''
+        将一批用户加入一批部门、组
+        默认按节点调用 add_users_to_dept、add_users_to_group
+        :param list users:
+        :param list nodes: oneid_meta.models.Dept 或 oneid_meta.models.Group
+        '''
+        for node in nodes:
+            if isinstance(node, Dept):
+                self.add_users_to_dept(users, node)
+            else:
+                self.add_users_to_group(users, node)
+
+    def delete_users_from_nodes(self, users, nodes):
+        '''
+        将一批用户从一批部门、组中移除
+        默认按节点调用 delete_users_from_dept、delete_users_from_group
+        :param list users:
+        :param list nodes: oneid_meta.models.Dept 或 oneid_meta.models.Group
+        '''
+        for node in nodes:
+            if isinstance(node, Dept):
+                self.delete_users_from_dept(users, node)
+            else:
+                self.delete_users_from_group(users, node)
+
 
 FUNC_NAMES = [
     'create_user',
@@ -256,6 +312,10 @@ FUNC_NAMES = [
     'add_group_to_group',
     'move_group_to_group',
     'sort_groups_in_group',
+    'create_users',
+    'update_users',
+    'add_users_to_nodes',
+    'delete_users_from_nodes',
 ]
 
 # 注册时，只有操作完成后才知道操作者身份
@@ -347,7 +407,10 @@ def cli_factory(executer_clses):
         super(CLI_CLASS, self).__init__(*args, **kwargs)
         self.executers = []
         for executer_cls in self.executer_clses:
-            executer = executer_cls()
+            if is_write_behind(executer_cls):
+                executer = OutboxExecuter(executer_cls)
+            else:
+                executer = executer_cls()
             executer.cli = self
             self.executers.append(executer)
 
@@ -1,8 +1,10 @@
 '''
 数据操作日志写入RDB
 '''
+from django.conf import settings
 from django.urls import resolve
 
+from oneid.activity import activity_tracker
 from executer.core import Executer, single_cli_factory
 from oneid_meta.models import Log, RequestAccessLog, RequestDataClientLog
 
@@ -98,6 +100,26 @@ class RDBLogExecuter(Executer):
         summary = f'{self.cli.user.log_name}批量删除用户[{user_names}]'
         return self.log(subject, summary)
 
+    def create_users(self, users_info):
+        '''
+        批量创建用户，记一条日志
+        :param list users_info:
+        '''
+        subject = 'user_create'
+        user_names = ','.join([user.log_name for user in self.cli.res])
+        summary = f'{self.cli.user.log_name}批量创建用户[{user_names}]'
+        return self.log(subject, summary)
+
+    def update_users(self, updates):
+        '''
+        批量编辑用户，记一条日志
+        :param list updates: [(user, user_info)]
+        '''
+        subject = 'user_update'
+        user_names = ','.join([user.log_name for user, _ in updates])
+        summary = f'{self.cli.user.log_name}批量编辑用户[{user_names}]信息'
+        return self.log(subject, summary)
+
     def create_dept(self, dept_info):
         '''
         :param dict dept_info:
@@ -400,6 +422,9 @@ class RDBLogExecuter(Executer):
         '''
         subject = 'ucenter_login'
         summary = f'{self.cli.user.log_name}登录'
+        if not settings.TESTING:
+            method = resolve(self.cli.request.path_info).url_name if self.cli.request else None
+            activity_tracker.track_login(method or 'unknown')
         return self.log(subject, summary)
 
     def user_reset_password(self):
@@ -416,6 +441,8 @@ class RDBLogExecuter(Executer):
         '''
         subject = 'ucenter_register'
         summary = f'{self.cli.user.log_name}注册成功'
+        if not settings.TESTING:
+            activity_tracker.track_register(self.cli.user)
         return self.log(subject, summary)
 
     def user_activate(self):
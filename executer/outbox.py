@@ -0,0 +1,309 @@
+'''
+executer 的延后执行（write-behind）
+settings.EXECUTER_WRITE_BEHIND 中的 executer 不在请求内执行，操作与数据修改在同一事务中写入 ExecuterOutbox，
+提交后由 celery 任务按写入顺序取出批量执行：
+- 同一对象上连续的更新类操作合并为一次
+- 失败后按指数退避重试，期间该 executer 的后续操作等待，以保证顺序
+- 超过重试次数的操作标记为 dead，记录日志后跳过；直接引用的实例已被删除的操作无需重试，同样标记为 dead
+'''
+import json
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from oneid_meta.models import ExecuterOutbox
+
+logger = logging.getLogger(__name__)    # pylint: disable=invalid-name
+
+REF_KEY = '$model'
+LOCK_PREFIX = 'oneid:executer_outbox:lock:'
+
+
+def merge_info(prev_args, args):
+    '''
+    (obj, info) 形式的参数，info 按先后合并
+    '''
+    return [args[0], {**prev_args[1], **args[1]}]
+
+
+def keep_last(prev_args, args):    # pylint: disable=unused-argument
+    '''
+    只需执行最后一次
+    '''
+    return args
+
+
+# 可合并的操作: (操作对象在参数中的位置, 合并方法)
+MERGEABLE = {
+    'update_user': (0, merge_info),
+    'update_dept': (0, merge_info),
+    'update_group': (0, merge_info),
+    'set_user_password': (0, keep_last),
+}
+
+
+def is_write_behind(executer_cls):
+    '''
+    该 executer 是否延后执行
+    '''
+    return f'{executer_cls.__module__}.{executer_cls.__name__}' in settings.EXECUTER_WRITE_BEHIND
+
+
+def encode(value):
+    '''
+    模型实例记为 {REF_KEY: label, 'pk': pk}，执行时重新读取
+    '''
+    if isinstance(value, models.Model):
+        if value.pk is None:
+            raise ValueError(f'unsaved {value._meta.label} can not be written to outbox')    # pylint: disable=protected-access
+        return {REF_KEY: value._meta.label, 'pk': value.pk}    # pylint: disable=protected-access
+    if isinstance(value, dict):
+        return {key: encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set, models.QuerySet)):
+        return [encode(item) for item in value]
+    return value
+
+
+def collect_refs(value, refs):
+    '''
+    收集参数中引用的模型实例 {label: set(pk)}
+    '''
+    if isinstance(value, dict):
+        if REF_KEY in value:
+            refs.setdefault(value[REF_KEY], set()).add(value['pk'])
+        else:
+            for item in value.values():
+                collect_refs(item, refs)
+    elif isinstance(value, list):
+        for item in value:
+            collect_refs(item, refs)
+
+
+def load_refs(refs):
+    '''
+    按模型批量读取，已软删除的实例同样可取到
+    :rtype: dict {(label, pk): instance}
+    '''
+    instances = {}
+    for label, pks in refs.items():
+        model = apps.get_model(label)
+        for key, instance in model._base_manager.in_bulk(list(pks)).items():    # pylint: disable=protected-access
+            instances[(label, key)] = instance
+    return instances
+
+
+class MissingReference(Exception):
+    '''
+    操作直接引用的实例已不存在，重试也无法执行
+    '''
+
+
+def decode(value, instances):
+    '''
+    还原模型实例，已不存在的实例为 None，列表中的则略去
+    '''
+    if isinstance(value, dict):
+        if REF_KEY in value:
+            return instances.get((value[REF_KEY], value['pk']))
+        return {key: decode(item, instances) for key, item in value.items()}
+    if isinstance(value, list):
+        return [item for item in (decode(item, instances) for item in value) if item is not None]
+    return value
+
+
+def decode_params(args, kwargs, instances):
+    '''
+    还原操作参数，直接作为参数的实例已不存在时抛出 MissingReference
+    :rtype: (args, kwargs)
+    '''
+    def decode_param(value):
+        item = decode(value, instances)
+        if item is None and isinstance(value, dict) and REF_KEY in value:
+            raise MissingReference(f"{value[REF_KEY]} {value['pk']} does not exist")
+        return item
+
+    return [decode_param(arg) for arg in args], {key: decode_param(arg) for key, arg in kwargs.items()}
+
+
+def get_subject(func_name, args):
+    '''
+    可合并操作的对象标识，其余为空
+    '''
+    if func_name not in MERGEABLE:
+        return ''
+    index, _ = MERGEABLE[func_name]
+    if index >= len(args):
+        return ''
+    ref = args[index]
+    if isinstance(ref, dict) and REF_KEY in ref:
+        return f"{ref[REF_KEY]}:{ref['pk']}"
+    return ''
+
+
+def enqueue(executer_cls, func_name, args, kwargs):
+    '''
+    写入 outbox，事务提交后触发执行
+    '''
+    params = executer_cls.outbox_params(func_name, args, kwargs)
+    if params is None:
+        return
+    args, kwargs = encode(params[0]), encode(params[1])
+    ExecuterOutbox.objects.create(
+        executer=f'{executer_cls.__module__}.{executer_cls.__name__}',
+        func_name=func_name,
+        subject=get_subject(func_name, args),
+        params=json.dumps({'args': args, 'kwargs': kwargs}, cls=DjangoJSONEncoder),
+    )
+    transaction.on_commit(trigger_drain)
+
+
+def trigger_drain():
+    '''
+    异步执行 outbox
+    '''
+    from tasksapp.tasks import drain_executer_outbox    # pylint: disable=import-outside-toplevel
+    drain_executer_outbox.delay()
+
+
+class OutboxExecuter():
+    '''
+    代替延后执行的 executer，操作只写入 outbox
+    '''
+    cli = None
+
+    def __init__(self, executer_cls):
+        self.executer_cls = executer_cls
+
+    def __getattr__(self, func_name):
+        from executer.core import FUNC_NAMES    # pylint: disable=import-outside-toplevel
+        if func_name not in FUNC_NAMES:
+            raise AttributeError(func_name)
+
+        def func(*args, **kwargs):
+            enqueue(self.executer_cls, func_name, args, kwargs)
+
+        return func
+
+
+def merge_entries(entries):
+    '''
+    合并同一对象上连续的同类操作
+    :rtype: list of (func_name, args, kwargs, [entry])
+    '''
+    calls = []
+    for entry in entries:
+        params = json.loads(entry.params)
+        args, kwargs = params['args'], params['kwargs']
+        if calls and entry.subject:
+            func_name, prev_args, prev_kwargs, merged = calls[-1]
+            if func_name == entry.func_name and merged[-1].subject == entry.subject and prev_kwargs == kwargs:
+                calls[-1] = (func_name, MERGEABLE[func_name][1](prev_args, args), kwargs, merged + [entry])
+                continue
+        calls.append((entry.func_name, args, kwargs, [entry]))
+    return calls
+
+
+def retry_delay(attempts):
+    '''
+    第 attempts 次失败后的等待时间
+    '''
+    return timedelta(seconds=min(settings.EXECUTER_OUTBOX_RETRY_DELAY * 2**(attempts - 1),
+                                 settings.EXECUTER_OUTBOX_MAX_RETRY_DELAY))
+
+
+def mark_failed(entries, exc, retriable=True):
+    '''
+    记录失败，超过重试次数或无法重试的标记为 dead
+    :return: 是否仍需重试
+    '''
+    now = timezone.now()
+    attempts = max(entry.attempts for entry in entries) + 1
+    dead = not retriable or attempts >= settings.EXECUTER_OUTBOX_MAX_ATTEMPTS
+    for entry in entries:
+        entry.attempts = attempts
+        entry.last_error = repr(exc)
+        entry.next_attempt_at = None if dead else now + retry_delay(attempts)
+        entry.status = ExecuterOutbox.STATUS_DEAD if dead else ExecuterOutbox.STATUS_PENDING
+    ExecuterOutbox.objects.bulk_update(entries, ['attempts', 'last_error', 'next_attempt_at', 'status'])
+    if dead:
+        logger.error('executer outbox %s gave up after %s attempts: %r', [entry.id for entry in entries], attempts,
+                     exc)
+    return not dead
+
+
+def drain_executer(path, batch_size, deadline):    # pylint: disable=too-many-locals
+    '''
+    按写入顺序执行该 executer 的待执行操作，直到队列为空、遇到需等待重试的操作或超时
+    :return: 执行成功的 outbox 条数
+    '''
+    executer = None
+    done = 0
+    while time.monotonic() < deadline:
+        entries = list(
+            ExecuterOutbox.objects.filter(executer=path,
+                                          status=ExecuterOutbox.STATUS_PENDING).order_by('id')[:batch_size])
+        if not entries or (entries[0].next_attempt_at and entries[0].next_attempt_at > timezone.now()):
+            return done
+
+        calls = merge_entries(entries)
+        refs = {}
+        for _, args, kwargs, _ in calls:
+            collect_refs([args, kwargs], refs)
+        instances = load_refs(refs)
+
+        if executer is None:
+            executer = import_string(path)()
+            executer.cli = None
+        succeeded = []
+        blocked = False
+        for func_name, args, kwargs, merged in calls:
+            try:
+                call_args, call_kwargs = decode_params(args, kwargs, instances)
+                getattr(executer, func_name)(*call_args, **call_kwargs)
+            except (NotImplementedError, MissingReference) as exc:
+                mark_failed(merged, exc, retriable=False)
+            except Exception as exc:    # pylint: disable=broad-except
+                if mark_failed(merged, exc):
+                    blocked = True
+                    break
+            else:
+                succeeded.extend(entry.id for entry in merged)
+
+        ExecuterOutbox.objects.filter(id__in=succeeded).delete()
+        done += len(succeeded)
+        if blocked:
+            return done
+    return done
+
+
+def drain(batch_size=None):
+    '''
+    执行全部延后执行的 executer 的待执行操作
+    同一 executer 同时只由一个进程执行，锁中记录持有者的 token，释放时只删除自己持有的锁
+    :rtype: dict {executer: 执行成功的 outbox 条数}
+    '''
+    batch_size = batch_size or settings.EXECUTER_OUTBOX_BATCH_SIZE
+    lock_timeout = settings.EXECUTER_OUTBOX_LOCK_TIMEOUT
+    results = {}
+    for path in settings.EXECUTER_WRITE_BEHIND:
+        lock_key = LOCK_PREFIX + path
+        token = uuid.uuid4().hex
+        if not cache.add(lock_key, token, timeout=lock_timeout):
+            continue
+        try:
+            # 在锁过期前停止，余下的由下次执行
+            results[path] = drain_executer(path, batch_size, time.monotonic() + lock_timeout / 2)
+        finally:
+            # 锁已过期并被其他进程取得时不能删除
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+    return results
@@ -9,6 +9,7 @@ from unittest import mock
 from unittest.mock import call
 from unittest.mock import patch
 from executer.Ding import DingExecuter, DEFAULT_DEPT
+from oneid_meta.models import Dept
 
 USER_INFO = {
     'username': 'test1',
@@ -310,3 +311,63 @@ class TestDingExecuter(TestCase):
         ding_executer = DingExecuter()
         ding_executer.delete_users_from_group([mock_user_1, mock_user_2], mock_group)
         mock_group_instance.delete_users_roles.assert_called_with('2', '1,2')
+
+    @patch('executer.Ding.UserManager')
+    @patch('executer.Ding.RoleManager')
+    def test_add_users_to_nodes(self, mock_group_manager, mock_user_manager):
+        mock_group_instance = mock_group_manager.return_value
+        mock_user_instance = mock_user_manager.return_value
+        mock_user_instance.get_user_detail.return_value = {'department': [1]}
+
+        users = []
+        for uid in range(150):
+            user = mock.Mock()
+            user.ding_user.uid = str(uid)
+            users.append(user)
+        groups = []
+        for uid in range(25):
+            group = mock.Mock()
+            group.ding_group.uid = uid
+            groups.append(group)
+        depts = []
+        for uid in (1, 2):
+            dept = mock.Mock(spec=Dept)
+            dept.ding_dept.uid = uid
+            depts.append(dept)
+
+        ding_executer = DingExecuter()
+        ding_executer.add_users_to_nodes(users[:2], groups[:2] + depts)
+        mock_group_instance.add_users_roles.assert_called_once_with('0,1', '0,1')
+        mock_user_instance.update_user.assert_has_calls([
+            call('0', department=[1, 2]),
+            call('1', department=[1, 2]),
+        ])
+
+        # 每次调用至多 20 个角色、100 个员工
+        mock_group_instance.add_users_roles.reset_mock()
+        ding_executer.add_users_to_nodes(users, groups)
+        self.assertEqual(mock_group_instance.add_users_roles.call_count, 4)
+        for role_ids, user_ids in (args for args, _ in mock_group_instance.add_users_roles.call_args_list):
+            self.assertLessEqual(len(role_ids.split(',')), 20)
+            self.assertLessEqual(len(user_ids.split(',')), 100)
+
+    @patch('executer.Ding.UserManager')
+    @patch('executer.Ding.RoleManager')
+    def test_delete_users_from_nodes(self, mock_group_manager, mock_user_manager):
+        mock_group_instance = mock_group_manager.return_value
+        mock_user_instance = mock_user_manager.return_value
+        mock_user_instance.get_user_detail.side_effect = [{'department': [1, 2]}, {'department': [3]}]
+
+        mock_user_1 = mock.Mock()
+        mock_user_2 = mock.Mock()
+        mock_user_1.ding_user.uid = '1'
+        mock_user_2.ding_user.uid = '2'
+        mock_group = mock.Mock()
+        mock_group.ding_group.uid = 2
+        mock_dept = mock.Mock(spec=Dept)
+        mock_dept.ding_dept.uid = 2
+
+        ding_executer = DingExecuter()
+        ding_executer.delete_users_from_nodes([mock_user_1, mock_user_2], [mock_group, mock_dept])
+        mock_group_instance.delete_users_roles.assert_called_once_with('2', '1,2')
+        mock_user_instance.update_user.assert_called_once_with('1', department=[1])
@@ -0,0 +1,62 @@
+'''
+tests for LDAPExecuter bulk operations
+'''
+# pylint: disable=missing-docstring
+
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase
+from ldap3 import Server, MOCK_SYNC
+
+from executer.LDAP import LDAPExecuter
+from executer.LDAP.client import Connection
+from oneid_meta.models import Dept, Group, User
+
+
+class LDAPExecuterBulkTestCase(TestCase):
+    '''
+    以 ldap3 的 MOCK_SYNC 连接检查批量成员操作的请求数
+    '''
+    def setUp(self):
+        self.dept = Dept.valid_objects.create(uid='bulk_dept', name='bulk_dept', parent=Dept.get_root())
+        self.group = Group.valid_objects.create(uid='bulk_group', name='bulk_group', parent=Group.get_root())
+        self.users = [User.valid_objects.create(username=f'bulk_{index}', name=f'bulk_{index}') for index in range(3)]
+
+        self.conn = Connection(Server('mock'),
+                               user=settings.LDAP_USER,
+                               password=settings.LDAP_PASSWORD,
+                               client_strategy=MOCK_SYNC,
+                               raise_exceptions=True)
+        self.conn.strategy.add_entry(settings.LDAP_USER, {'userPassword': settings.LDAP_PASSWORD, 'sn': 'admin'})
+        self.conn.bind()
+        for node in (self.dept, self.group):
+            self.conn.strategy.add_entry(node.dn, {
+                'objectClass': ['groupOfNames'],
+                'cn': node.uid,
+                'member': [self.users[0].dn],
+            })
+        self.ldap_executer = LDAPExecuter(base=settings.LDAP_BASE)
+        self.ldap_executer.conn = self.conn
+
+    def test_users_to_nodes(self):
+        nodes = [self.dept, self.group]
+        user_dns = sorted(user.dn for user in self.users)
+        with mock.patch.object(self.conn, 'modify', wraps=self.conn.modify) as modify:
+            self.ldap_executer.add_users_to_nodes(self.users, nodes)
+            self.assertEqual(modify.call_count, 2)
+            for node in nodes:
+                self.assertEqual(sorted(self.conn.get_members(node.dn)), user_dns)
+
+            modify.reset_mock()
+            self.ldap_executer.add_users_to_nodes(self.users, nodes)
+            modify.assert_not_called()
+
+            self.ldap_executer.delete_users_from_nodes(self.users[1:], nodes)
+            self.assertEqual(modify.call_count, 2)
+            for node in nodes:
+                self.assertEqual(self.conn.get_members(node.dn), [self.users[0].dn])
+
+            modify.reset_mock()
+            self.ldap_executer.delete_users_from_nodes(self.users[1:], nodes)
+            modify.assert_not_called()
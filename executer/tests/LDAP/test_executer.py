@@ -6,7 +6,7 @@ tests for basic LDAP operators
 - add users to dept
 - add users to group
 '''
-# pylint: disable=missing-docstring
+# pylint: disable=missing-docstring, too-many-lines
 
 from django.test import TestCase
 from django.conf import settings
@@ -380,6 +380,22 @@ class LDAPExecuterDeptTestCase(LDAPBaseTestCase):
         self.cli.delete_users([self.user])
         self.assertNotIn(self.user.dn, self.conn.get_members(self.dept_2.dn))
 
+    def test_users_to_nodes(self):
+        user_2 = self.cli.create_user({**USER_DATA, 'username': 'employee_2'})
+        nodes = [self.dept_1, self.dept_2]
+
+        self.cli.add_users_to_nodes([self.user, user_2], nodes)
+        for node in nodes:
+            self.assertEqual(sorted(self.conn.get_members(node.dn)), sorted([self.user.dn, user_2.dn]))
+        self.cli.add_users_to_nodes([self.user, user_2], nodes)
+        self.assertEqual(self.conn.get_members(self.dept_2.dn).count(self.user.dn), 1)
+
+        self.cli.delete_users_from_nodes([user_2], nodes)
+        for node in nodes:
+            self.assertEqual(self.conn.get_members(node.dn), [self.user.dn])
+        self.cli.delete_users_from_nodes([user_2], nodes)
+        self.assertEqual(self.conn.get_members(self.child_dept_1.dn), [self.user.dn])
+
     def test_add_multiple_dept(self):
         self.cli.add_users_to_dept([self.user], self.dept_1)
         self.cli.add_users_to_dept([self.user], self.dept_2)
@@ -443,6 +459,20 @@ class LDAPExecuterGroupTestCase(LDAPBaseTestCase):
         self.cli.add_users_to_group([self.user], self.group_1)
         self.cli.add_users_to_group([self.user], self.group_2)
 
+    def test_users_to_nodes(self):
+        dept = self.cli.create_dept(DEPT_DATA)
+        self.cli.add_dept_to_dept(dept, Dept.valid_objects.get(uid='root'))
+        nodes = [self.group_1, dept]
+
+        self.cli.add_users_to_nodes([self.user], nodes)
+        for node in nodes:
+            self.assertIn(self.user.dn, self.conn.get_members(node.dn))
+
+        self.cli.delete_users_from_nodes([self.user], nodes)
+        for node in nodes:
+            self.assertNotIn(self.user.dn, self.conn.get_members(node.dn))
+        self.assertIn(self.user.dn, self.conn.get_members(self.group_2.dn))
+
     def test_delete_users(self):
         self.assertIn(self.user.dn, self.conn.get_members(self.group_2.dn))
         self.cli.delete_users([self.user])
@@ -0,0 +1,118 @@
+'''
+tests for LDAP connection pool
+'''
+# pylint: disable=missing-docstring
+
+import threading
+
+from django.test import SimpleTestCase
+from ldap3 import Server, MOCK_SYNC
+from ldap3.core.exceptions import LDAPSocketOpenError, LDAPSocketReceiveError, LDAPNoSuchObjectResult
+
+from executer.LDAP.client import Connection
+from executer.LDAP import LDAPExecuter
+from executer.LDAP.pool import ConnectionPool, LDAPPoolTimeout, get_pool
+
+ADMIN_DN = 'cn=admin,dc=example,dc=org'
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = Server('mock')
+        self.connected = 0
+        conn = Connection(self.server, client_strategy=MOCK_SYNC)
+        conn.strategy.add_entry(ADMIN_DN, {'userPassword': 'admin', 'sn': 'admin'})
+
+    def connect(self):
+        self.connected += 1
+        conn = Connection(self.server,
+                          user=ADMIN_DN,
+                          password='admin',
+                          client_strategy=MOCK_SYNC,
+                          raise_exceptions=True)
+        conn.bind()
+        return conn
+
+    def get_pool(self, size=2, timeout=0.1):
+        return ConnectionPool(self.connect, size=size, timeout=timeout, check_interval=60)
+
+    def test_reuse(self):
+        pool = self.get_pool()
+        with pool.connection() as conn:
+            first = conn
+        with pool.connection() as conn:
+            self.assertIs(conn, first)
+            self.assertTrue(conn.bound)
+        self.assertEqual(self.connected, 1)
+
+    def test_bounded(self):
+        pool = self.get_pool(size=2)
+        conns = [pool.acquire(), pool.acquire()]
+        with self.assertRaises(LDAPPoolTimeout):
+            pool.acquire()
+
+        released = threading.Timer(0.05, pool.release, args=(conns[0], ))
+        released.start()
+        pool.timeout = 5
+        self.assertIs(pool.acquire(), conns[0])
+        released.join()
+        self.assertEqual(self.connected, 2)
+
+    def test_rebind(self):
+        pool = self.get_pool()
+        with pool.connection() as conn:
+            first = conn
+        first.unbind()
+        with pool.connection() as conn:
+            self.assertIsNot(conn, first)
+            self.assertTrue(conn.bound)
+        self.assertEqual(self.connected, 2)
+
+    def test_discard_broken(self):
+        pool = self.get_pool(size=1)
+        with self.assertRaises(LDAPSocketReceiveError):
+            with pool.connection() as conn:
+                first = conn
+                raise LDAPSocketReceiveError
+        self.assertFalse(first.bound)
+
+        with self.assertRaises(LDAPNoSuchObjectResult):
+            with pool.connection() as conn:
+                second = conn
+                raise LDAPNoSuchObjectResult
+        with pool.connection() as conn:
+            self.assertIs(conn, second)
+        self.assertEqual(self.connected, 2)
+
+    def test_failed_connect(self):
+        def connect():
+            raise LDAPSocketOpenError
+
+        pool = ConnectionPool(connect,
+                              size=1,
+                              timeout=0.1,
+                              check_interval=60)
+        for _ in range(2):
+            with self.assertRaises(LDAPSocketOpenError):
+                pool.acquire()
+        self.assertEqual(pool._created, 0)    # pylint: disable=protected-access
+
+    def test_named_pools(self):
+        pool = get_pool('ldap://pool-test', ADMIN_DN, 'admin')
+        self.assertIs(get_pool('ldap://pool-test', ADMIN_DN, 'admin'), pool)
+        aggregate_pool = get_pool('ldap://pool-test', ADMIN_DN, 'admin', name='aggregate', size=1)
+        self.assertIsNot(aggregate_pool, pool)
+        self.assertEqual(aggregate_pool.size, 1)
+        self.assertIs(get_pool('ldap://pool-test', ADMIN_DN, 'admin', name='aggregate'), aggregate_pool)
+
+
+class ExecuterConnectionTestCase(SimpleTestCase):
+    def test_thread_local(self):
+        executer = LDAPExecuter('ldap://pool-test', user=ADMIN_DN, password='admin')
+        executer.conn = conn = object()
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(executer.conn))
+        thread.start()
+        thread.join()
+        self.assertEqual(seen, [None])
+        self.assertIs(executer.conn, conn)
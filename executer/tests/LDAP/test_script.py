@@ -6,13 +6,30 @@ test for LDAP scripts
 import time
 import string    # pylint: disable=deprecated-module
 import random
+import threading
+from contextlib import contextmanager
+from unittest import mock
+
+from django.test import SimpleTestCase
 
 from executer.tests.LDAP.test_executer import LDAPBaseTestCase, LDAPExecuterDeptTestCase
 from siteapi.v1.tests.test_user import USER_DATA
-from oneid_meta.models import UserPerm, Perm
+from oneid_meta.models import UserPerm, Perm, Dept, DeptMember
 
 from scripts.ldap_user_perm import flush_user_perm
-from scripts.ldap_aggregate_user import aggregate_user_in_dept, aggregate_user_in_group
+from scripts import ldap_aggregate_user
+from scripts.ldap_aggregate_user import (
+    aggregate_user_by_dn,
+    aggregate_user_in_dept,
+    aggregate_user_in_group,
+    apply_changes,
+    compute_changes,
+)
+
+DEPT_BASE = 'ou=dept,dc=example,dc=org'
+USER_1 = 'uid=user_1,ou=people,dc=example,dc=org'
+USER_2 = 'uid=user_2,ou=people,dc=example,dc=org'
+USER_3 = 'uid=user_3,ou=people,dc=example,dc=org'
 
 
 class PerformanceTestCase(LDAPBaseTestCase):
@@ -56,6 +73,7 @@ class UserPermTestCase(LDAPBaseTestCase):
         perms = self.conn.get_vals(user.dn, 'ou')
         expect = list(string.ascii_lowercase)
         self.assertEqual(sorted(perms), expect)
+        self.assertEqual(flush_user_perm(self.conn), 0)
 
         user_perm = UserPerm.valid_objects.get(owner=user, perm__uid='b')
         user_perm.value = False
@@ -75,6 +93,10 @@ class UserPermTestCase(LDAPBaseTestCase):
         self.conn.search('ou=people,dc=example,dc=org', '(ou=b)')
         self.assertEqual(len(self.conn.entries), 0)
 
+        UserPerm.valid_objects.filter(owner=user).update(value=False)
+        self.assertEqual(flush_user_perm(self.conn), 1)
+        self.assertEqual(self.conn.get_vals(user.dn, 'ou'), [])
+
 
 class UserAggregateTestCase(LDAPExecuterDeptTestCase):
     def test_aggregate_user_in_dept(self):
@@ -90,5 +112,88 @@ class UserAggregateTestCase(LDAPExecuterDeptTestCase):
         self.assertEqual(self.conn.get_members(self.dept_1.dn), expect)
         self.assertEqual(self.conn.get_members(self.parent_dept.dn), expect)
 
+        self.assertEqual(aggregate_user_in_dept(self.conn, 'ou=dept,dc=example,dc=org'), 0)
+
     def test_aggregate_user_in_group(self):
         aggregate_user_in_group(self.conn, 'ou=group,dc=example,dc=org')
+
+
+class ComputeChangesTestCase(SimpleTestCase):
+    def test_missing_node(self):
+        current = {
+            DEPT_BASE: set(),
+            f'cn=a,{DEPT_BASE}': {USER_1},
+            f'cn=unknown,cn=a,{DEPT_BASE}': {USER_2},
+            f'cn=b,cn=a,{DEPT_BASE}': set(),
+        }
+        changes = compute_changes(current, {'a': set(), 'b': {USER_3}})
+        # RDB 中不存在的节点不修改，其成员仍计入上级
+        self.assertEqual(changes, [
+            (f'cn=b,cn=a,{DEPT_BASE}', {USER_3}, set()),
+            (f'cn=a,{DEPT_BASE}', {USER_2, USER_3}, {USER_1}),
+        ])
+
+    def test_removed_members(self):
+        current = {
+            f'cn=a,{DEPT_BASE}': {USER_1, USER_2},
+            f'cn=b,cn=a,{DEPT_BASE}': {USER_2},
+        }
+        changes = compute_changes(current, {'a': {USER_1}, 'b': set()})
+        self.assertEqual(changes, [
+            (f'cn=b,cn=a,{DEPT_BASE}', set(), {USER_2}),
+            (f'cn=a,{DEPT_BASE}', {USER_1}, {USER_1, USER_2}),
+        ])
+
+        conn = mock.Mock()
+        apply_changes(conn, changes)
+        conn.modify_override.assert_called_once_with(f'cn=b,cn=a,{DEPT_BASE}', 'member', '')
+        conn.modify_diff.assert_called_once_with(f'cn=a,{DEPT_BASE}', 'member', set(), {USER_2})
+
+    def test_unchanged(self):
+        current = {
+            f'cn=a,{DEPT_BASE}': {USER_1, USER_2},
+            f'cn=b,cn=a,{DEPT_BASE}': {USER_2},
+        }
+        self.assertEqual(compute_changes(current, {'a': {USER_1}, 'b': {USER_2}}), [])
+
+    def test_parallel(self):
+        current = {
+            DEPT_BASE: set(),
+            f'cn=a,{DEPT_BASE}': set(),
+            f'cn=a1,cn=a,{DEPT_BASE}': set(),
+            f'cn=b,{DEPT_BASE}': set(),
+            f'cn=c,{DEPT_BASE}': {USER_3},
+        }
+        direct_members = {'a': set(), 'a1': {USER_1}, 'b': {USER_2}, 'c': {USER_3}}
+        conn = mock.Mock()
+        conn.extend.standard.paged_search.return_value = [{
+            'dn': dn,
+            'type': 'searchResEntry',
+            'attributes': {
+                'member': sorted(members)
+            },
+        } for dn, members in current.items()]
+
+        subtree_conns = []
+        lock = threading.Lock()
+
+        @contextmanager
+        def connect():
+            subtree_conn = mock.Mock()
+            with lock:
+                subtree_conns.append(subtree_conn)
+            yield subtree_conn
+
+        with mock.patch.object(ldap_aggregate_user, 'get_direct_members', return_value=direct_members):
+            self.assertEqual(
+                aggregate_user_by_dn(conn, DEPT_BASE, Dept, DeptMember, workers=2, connect=connect), 3)
+
+        conn.modify_diff.assert_not_called()
+        # 每个有修改的子树取用一个连接，同一子树的修改在同一连接上按自下而上的顺序发送
+        self.assertEqual(len(subtree_conns), 2)
+        calls = sorted([call[0] for call in subtree_conn.modify_diff.call_args_list]
+                       for subtree_conn in subtree_conns)
+        self.assertEqual(calls, [
+            [(f'cn=a1,cn=a,{DEPT_BASE}', 'member', {USER_1}, set()), (f'cn=a,{DEPT_BASE}', 'member', {USER_1}, set())],
+            [(f'cn=b,{DEPT_BASE}', 'member', {USER_2}, set())],
+        ])
@@ -0,0 +1,157 @@
+'''
+tests for executer.outbox
+'''
+# pylint: disable=missing-docstring
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from executer import outbox
+from executer.core import Executer, cli_factory
+from oneid_meta.models import User, Dept, ExecuterOutbox
+
+RECORDING_EXECUTER = 'executer.tests.test_outbox.RecordingExecuter'
+
+
+class RecordingExecuter(Executer):    # pylint: disable=abstract-method
+    '''
+    记录被执行的操作，failures 中的操作执行时报错
+    '''
+    calls = []
+    failures = set()
+
+    def _record(self, func_name, *args):
+        if func_name in self.failures:
+            raise RuntimeError(func_name)
+        self.calls.append((func_name, ) + args)
+
+    def update_user(self, user, user_info):
+        self._record('update_user', user.username, user_info)
+
+    def create_dept(self, dept_info):
+        self._record('create_dept', dept_info['uid'])
+
+    def update_dept(self, dept, dept_info):
+        self._record('update_dept', dept.uid, dept_info)
+
+    def add_users_to_dept(self, users, dept):
+        self._record('add_users_to_dept', [user.username for user in users], dept.uid)
+
+
+@override_settings(EXECUTER_WRITE_BEHIND=[RECORDING_EXECUTER])
+class ExecuterOutboxTestCase(TestCase):
+    def setUp(self):
+        RecordingExecuter.calls = []
+        RecordingExecuter.failures = set()
+        self.user = User.valid_objects.get(username='admin')
+        self.dept = Dept.valid_objects.create(uid='outbox', name='outbox', parent=Dept.get_root())
+        self.cli = cli_factory(['executer.RDB.RDBExecuter', RECORDING_EXECUTER])(self.user)
+
+    def test_write_behind(self):
+        self.cli.update_user(self.user, {'name': 'a', 'email': 'a@example.com'})
+        self.cli.update_user(self.user, {'name': 'b'})
+        self.cli.add_users_to_dept([self.user], self.dept)
+        self.cli.update_user(self.user, {'mobile': '18812341234'})
+
+        self.assertEqual(User.valid_objects.get(username='admin').name, 'b')
+        self.assertEqual(RecordingExecuter.calls, [])
+        self.assertEqual(ExecuterOutbox.objects.count(), 4)
+
+        self.assertEqual(outbox.drain(), {RECORDING_EXECUTER: 4})
+        self.assertEqual(RecordingExecuter.calls, [
+            ('update_user', 'admin', {
+                'name': 'b',
+                'email': 'a@example.com'
+            }),
+            ('add_users_to_dept', ['admin'], 'outbox'),
+            ('update_user', 'admin', {
+                'mobile': '18812341234'
+            }),
+        ])
+        self.assertFalse(ExecuterOutbox.objects.exists())
+
+    def test_password(self):
+        self.cli.set_user_password(self.user, 'password')
+        self.assertFalse(ExecuterOutbox.objects.exists())
+        self.assertTrue(User.valid_objects.get(username='admin').check_password('password'))
+
+    def test_retry_in_order(self):
+        RecordingExecuter.failures = {'create_dept'}
+        self.cli.create_dept({'uid': 'new', 'name': 'new'})
+        self.cli.update_dept(self.dept, {'name': 'c'})
+
+        self.assertEqual(outbox.drain(), {RECORDING_EXECUTER: 0})
+        self.assertEqual(RecordingExecuter.calls, [])
+        entry = ExecuterOutbox.objects.order_by('id').first()
+        self.assertEqual(entry.attempts, 1)
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+
+        RecordingExecuter.failures = set()
+        self.assertEqual(outbox.drain(), {RECORDING_EXECUTER: 0})
+
+        ExecuterOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.drain(), {RECORDING_EXECUTER: 2})
+        self.assertEqual(RecordingExecuter.calls, [
+            ('create_dept', 'new'),
+            ('update_dept', 'outbox', {
+                'name': 'c'
+            }),
+        ])
+
+    @override_settings(EXECUTER_OUTBOX_MAX_ATTEMPTS=1)
+    def test_give_up(self):
+        RecordingExecuter.failures = {'create_dept'}
+        self.cli.create_dept({'uid': 'new', 'name': 'new'})
+        self.cli.update_dept(self.dept, {'name': 'c'})
+
+        self.assertEqual(outbox.drain(), {RECORDING_EXECUTER: 1})
+        self.assertEqual(RecordingExecuter.calls, [('update_dept', 'outbox', {'name': 'c'})])
+        entry = ExecuterOutbox.objects.get()
+        self.assertEqual(entry.status, ExecuterOutbox.STATUS_DEAD)
+        self.assertIn('RuntimeError', entry.last_error)
+
+    def test_bulk_fallback(self):
+        self.cli.add_users_to_nodes([self.user], [self.dept])
+        self.assertTrue(self.dept.users)
+        self.assertEqual(outbox.drain(), {RECORDING_EXECUTER: 1})
+        self.assertEqual(RecordingExecuter.calls, [('add_users_to_dept', ['admin'], 'outbox')])
+
+    def test_missing_reference(self):
+        dept = Dept.valid_objects.create(uid='deleted', name='deleted', parent=Dept.get_root())
+        self.cli.update_dept(dept, {'name': 'c'})
+        self.cli.add_users_to_dept([self.user], self.dept)
+        Dept.objects.filter(pk=dept.pk).delete()
+
+        self.assertEqual(outbox.drain(), {RECORDING_EXECUTER: 1})
+        self.assertEqual(RecordingExecuter.calls, [('add_users_to_dept', ['admin'], 'outbox')])
+        entry = ExecuterOutbox.objects.get()
+        self.assertEqual(entry.status, ExecuterOutbox.STATUS_DEAD)
+        self.assertEqual(entry.attempts, 1)
+        self.assertIn('MissingReference', entry.last_error)
+
+    def test_proxy_func_names_only(self):
+        executer = outbox.OutboxExecuter(RecordingExecuter)
+        self.assertTrue(callable(executer.update_user))
+        self.assertFalse(hasattr(executer, 'unknown'))
+        self.assertFalse(hasattr(executer, 'outbox_params'))
+
+    def test_lock_kept_when_taken_over(self):
+        lock_key = outbox.LOCK_PREFIX + RECORDING_EXECUTER
+        self.cli.update_dept(self.dept, {'name': 'c'})
+
+        def take_over(*args):    # pylint: disable=unused-argument
+            # 锁过期后被其他进程取得
+            cache.set(lock_key, 'other')
+            return 0
+
+        with mock.patch.object(outbox, 'drain_executer', take_over):
+            self.assertEqual(outbox.drain(), {RECORDING_EXECUTER: 0})
+        self.assertEqual(cache.get(lock_key), 'other')
+        self.assertEqual(outbox.drain(), {})
+
+        cache.delete(lock_key)
+        self.assertEqual(outbox.drain(), {RECORDING_EXECUTER: 1})
+        self.assertIsNone(cache.get(lock_key))
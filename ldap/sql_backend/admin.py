@@ -6,9 +6,28 @@ from ldap.sql_backend.models import (
     LDAPEntry,
     LDAPEntryObjectclasses,
 )
+from ldap.sql_backend.scripts import refresh_ldap_entries
 
 
-class LDAPOCMappingsAdmin(admin.ModelAdmin):
+class RefreshLDAPEntriesMixin:
+    '''
+    修改 raw_ldap_entries 后刷新 ldap_entries
+    删除 LDAPOCMappings 时级联删除 entry，同样需要刷新
+    '''
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_ldap_entries()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_ldap_entries()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        refresh_ldap_entries()
+
+
+class LDAPOCMappingsAdmin(RefreshLDAPEntriesMixin, admin.ModelAdmin):
     pass
 
 
@@ -16,7 +35,7 @@ class LDAPAttrMappingAdmin(admin.ModelAdmin):
     pass
 
 
-class LDAPEntryAdmin(admin.ModelAdmin):
+class LDAPEntryAdmin(RefreshLDAPEntriesMixin, admin.ModelAdmin):
     pass
 
 
@@ -0,0 +1,57 @@
+# Generated by Django 2.2.10 on 2026-10-19 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sql_backend', '0009_ldapentry_tag'),
+    ]
+
+    # 原 0003 中的视图，回滚时恢复
+    view_sql = '''
+CREATE VIEW ldap_entries (id, dn, oc_map_id, parent, keyval, subject) AS
+    (SELECT id, dn, oc_map_id, parent_id, keyval, subject \
+        FROM raw_ldap_entries WHERE raw_ldap_entries.subject != 3)
+UNION
+    (SELECT id, dn, oc_map_id, parent_id, keyval + 100000, subject \
+        FROM raw_ldap_entries WHERE raw_ldap_entries.subject = 3)
+'''
+
+    populate_sql = '''
+INSERT INTO ldap_entries (id, dn, oc_map_id, parent, keyval, subject)
+    SELECT id, dn, oc_map_id, parent_id, CASE WHEN subject = 3 THEN keyval + 100000 ELSE keyval END, subject
+        FROM raw_ldap_entries
+'''
+
+    operations = [
+        migrations.RunSQL('drop view if exists ldap_entries;', reverse_sql=view_sql),
+        migrations.CreateModel(
+            name='MaterializedLDAPEntry',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('dn', models.CharField(max_length=256)),
+                ('oc_map_id', models.IntegerField()),
+                ('parent', models.IntegerField(null=True)),
+                ('keyval', models.IntegerField()),
+                ('subject', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'ldap_entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='materializedldapentry',
+            index=models.Index(fields=['dn'], name='ldap_entries_dn_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materializedldapentry',
+            index=models.Index(fields=['parent'], name='ldap_entries_parent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materializedldapentry',
+            index=models.Index(fields=['keyval', 'oc_map_id'], name='ldap_entries_keyval_idx'),
+        ),
+        migrations.RunSQL(populate_sql, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -74,6 +74,36 @@ class LDAPEntry(models.Model):
         return self.dn
 
 
+class MaterializedLDAPEntry(models.Model):
+    '''
+    供 back-sql 查询的 ldap_entries，由 raw_ldap_entries 派生
+    group 的 keyval 加 GROUP_KEYVAL_OFFSET，以和 dept 区分
+    由 scripts.refresh_ldap_entries 维护
+    '''
+    class Meta:    # pylint: disable=missing-class-docstring
+        db_table = 'ldap_entries'
+        # MySQL 默认排序规则不区分大小写，dn 索引可用于大小写无关的查找
+        indexes = [
+            models.Index(fields=['dn'], name='ldap_entries_dn_idx'),
+            models.Index(fields=['parent'], name='ldap_entries_parent_idx'),
+            models.Index(fields=['keyval', 'oc_map_id'], name='ldap_entries_keyval_idx'),
+        ]
+
+    GROUP_KEYVAL_OFFSET = 100000
+
+    id = models.IntegerField(primary_key=True)    # 即 raw_ldap_entries.id
+    dn = models.CharField(max_length=256)
+    oc_map_id = models.IntegerField()
+    parent = models.IntegerField(null=True)
+    keyval = models.IntegerField()
+    subject = models.IntegerField()
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return self.dn
+
+
 class LDAPEntryObjectclasses(models.Model):
     '''
     LDAP entry 与 数据库记录之间的映射
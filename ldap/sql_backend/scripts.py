@@ -1,129 +1,172 @@
 '''
 确保db中的dn正确，供LDAP查询
+由批量查询在内存中算出应有的 entry，与现有 entry 一次读取后比对，只写入差异
+raw_ldap_entries 的每次修改都须同步至供 back-sql 查询的 ldap_entries 表：
+sync_entries 有修改时即刷新，flush_entries 在全部类型同步后只刷新一次，admin 中的修改保存后刷新
 '''
 import time
 
 from celery import shared_task
+from django.db import transaction
 
 from oneid_meta.models import User, Group, Dept, GroupMember, DeptMember
 from ldap.sql_backend.models import LDAPEntry as Entry
 from ldap.sql_backend.models import LDAPOCMappings as OCMap
+from ldap.sql_backend.models import MaterializedLDAPEntry
 
+USER_BASE_DN = 'ou=people,dc=example,dc=org'
+GROUP_BASE_DN = 'ou=group,dc=example,dc=org'
+DEPT_BASE_DN = 'ou=dept,dc=example,dc=org'
 
-def clear_deprecated_entries(entry_subject, required_tag):
-    '''
-    对于此类型(entry_subject)的entry, 若tag不一致则删除
-    '''
-    for entry in Entry.objects.filter(subject=entry_subject):
-        if entry.tag != required_tag:
-            entry.delete()
+# 每条 SQL 写入、删除的行数
+BATCH_SIZE = 500
 
 
-def flush_user_entries():
+def node_dns(node_cls, base_dn):
     '''
-    维护user LDAP Entries
+    各节点（不含根节点）的 dn
+    父子关系一次查出，在内存中逐级拼接，不再逐个节点追溯 upstream_uids
+    :rtype: dict {dn: node id}
+    '''
+    prefix = node_cls.NODE_PREFIX
+    nodes = {pk: (uid, parent_id) for pk, uid, parent_id in node_cls.objects.values_list('id', 'uid', 'parent_id')}
+    # 节点至根节点（不含）的 cn 序列，无法追溯到根节点时为 None
+    paths = {}
+
+    def get_path(node_id):
+        chain = []
+        node = node_id
+        while node is not None and node not in paths and node not in chain:
+            uid, parent_id = nodes[node]
+            if uid == 'root':
+                paths[node] = ()
+                break
+            chain.append(node)
+            node = parent_id if parent_id in nodes else None
+        path = paths.get(node)
+        for item in reversed(chain):
+            if path is not None:
+                # 与 upstream_uids 推导出的 cn 保持一致
+                path = ('cn={}'.format((prefix + nodes[item][0]).replace(prefix, '')), ) + path
+            paths[item] = path
+        return paths[node_id]
+
+    dns = {}
+    for node_id in node_cls.valid_objects.exclude(uid='root').values_list('id', flat=True):
+        path = get_path(node_id)
+        if path:
+            dns[','.join(path + (base_dn, ))] = node_id
+    return dns
+
+
+def sync_entries(entry_subject, oc_map_name, base_dn, expected, refresh=True):    # pylint: disable=too-many-locals
+    '''
+    以 expected {dn: keyval} 为准同步此类型(entry_subject)的 entry
+    base_dn 下同 dn 的其他类型 entry 被接管，此类型多余的 entry 被删除
+    有修改且 refresh 为 True 时在同一事务中刷新 ldap_entries
+    :rtype: (新增数量, 更新数量, 删除数量)
     '''
     tag = int(time.time())
-    entry_subject = 1
-    oc_map = OCMap.objects.get(name='inetOrgPerson')
-    user_base = Entry.objects.get(dn='ou=people,dc=example,dc=org')
-    for user in User.valid_objects.all():
-        dn = 'uid={},ou=people,dc=example,dc=org'.format(user.username)
-        entry = Entry.objects.filter(dn=dn).first()
-        if entry:
-            if entry.oc_map != oc_map:
-                entry.oc_map = oc_map
-            if entry.parent != user_base:
-                entry.parent = user_base
-            if entry.keyval != user.id:
-                entry.keyval = user.id
-            if entry.subject != entry_subject:
-                entry.subject = entry_subject
+    oc_map = OCMap.objects.get(name=oc_map_name)
+    base = Entry.objects.get(dn=base_dn)
+
+    to_update = []
+    to_delete = []
+    existed = set()
+    entries = Entry.objects.filter(dn__endswith=',' + base_dn) | Entry.objects.filter(subject=entry_subject)
+    for entry in entries.only('id', 'dn', 'oc_map_id', 'parent_id', 'keyval', 'subject').order_by('id'):
+        keyval = expected.get(entry.dn)
+        if keyval is None or entry.dn in existed:
+            if entry.subject == entry_subject:
+                to_delete.append(entry.id)
+            continue
+        existed.add(entry.dn)
+        if (entry.oc_map_id, entry.parent_id, entry.keyval, entry.subject) != \
+                (oc_map.id, base.id, keyval, entry_subject):
+            entry.oc_map_id = oc_map.id
+            entry.parent_id = base.id
+            entry.keyval = keyval
+            entry.subject = entry_subject
             entry.tag = tag
-            entry.save()
-        else:
-            Entry.objects.create(
-                dn=dn,
-                oc_map=oc_map,
-                parent=user_base,
-                keyval=user.id,
-                subject=entry_subject,
-                tag=tag,
-            )
+            to_update.append(entry)
+
+    to_create = [
+        Entry(dn=dn, oc_map_id=oc_map.id, parent_id=base.id, keyval=keyval, subject=entry_subject, tag=tag)
+        for dn, keyval in expected.items() if dn not in existed
+    ]
 
-    clear_deprecated_entries(entry_subject, tag)
+    with transaction.atomic():
+        changes = apply_changes(Entry, to_create, to_update, ['oc_map', 'parent', 'keyval', 'subject', 'tag'],
+                                to_delete)
+        if refresh and any(changes):
+            refresh_ldap_entries()
+    return changes
 
 
-def flush_group():
+def apply_changes(model, to_create, to_update, update_fields, to_delete):
     '''
-    维护 group LDAP Entries
+    在一个事务中分批写入新增、更新、删除
+    :rtype: (新增数量, 更新数量, 删除数量)
     '''
-    tag = int(time.time())
-    entry_subject = 3
-    oc_map = OCMap.objects.get(name='groupOfNames')
-    group_base = Entry.objects.get(dn='ou=group,dc=example,dc=org')
-    for group in Group.valid_objects.exclude(uid='root'):
-        dn = ','.join([f"cn={uid.replace('g_', '')}"
-                       for uid in list(group.upstream_uids)][:-1]) + ',ou=group,dc=example,dc=org'
-        entry = Entry.objects.filter(dn=dn).first()
-        if entry:
-            if entry.oc_map != oc_map:
-                entry.oc_map = oc_map
-            if entry.parent != group_base:
-                entry.parent = group_base
-            if entry.keyval != group.id:
-                entry.keyval = group.id
-            if entry.subject != entry_subject:
-                entry.subject = entry_subject
-            entry.tag = tag
-            entry.save()
-        else:
-            Entry.objects.create(
-                dn=dn,
-                oc_map=oc_map,
-                parent=group_base,
-                keyval=group.id,
-                subject=entry_subject,
-                tag=tag,
-            )
+    with transaction.atomic():
+        model.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        model.objects.bulk_update(to_update, update_fields, batch_size=BATCH_SIZE)
+        for i in range(0, len(to_delete), BATCH_SIZE):
+            model.objects.filter(id__in=to_delete[i:i + BATCH_SIZE]).delete()
+    return len(to_create), len(to_update), len(to_delete)
 
-    clear_deprecated_entries(entry_subject, tag)
+
+def refresh_ldap_entries():
+    '''
+    以 raw_ldap_entries 为准刷新 ldap_entries，只写入差异
+    :rtype: (新增数量, 更新数量, 删除数量)
+    '''
+    fields = ('dn', 'oc_map_id', 'parent', 'keyval', 'subject')
+    offset = MaterializedLDAPEntry.GROUP_KEYVAL_OFFSET
+    expected = {
+        pk: (dn, oc_map_id, parent_id, keyval + offset if subject == 3 else keyval, subject)
+        for pk, dn, oc_map_id, parent_id, keyval, subject in Entry.objects.values_list(
+            'id', 'dn', 'oc_map_id', 'parent_id', 'keyval', 'subject')
+    }
+
+    to_update = []
+    to_delete = []
+    for entry in MaterializedLDAPEntry.objects.all():
+        row = expected.pop(entry.id, None)
+        if row is None:
+            to_delete.append(entry.id)
+        elif tuple(getattr(entry, field) for field in fields) != row:
+            for field, value in zip(fields, row):
+                setattr(entry, field, value)
+            to_update.append(entry)
+
+    to_create = [MaterializedLDAPEntry(id=pk, **dict(zip(fields, row))) for pk, row in expected.items()]
+    return apply_changes(MaterializedLDAPEntry, to_create, to_update, fields, to_delete)
+
+
+def flush_user_entries(refresh=True):
+    '''
+    维护user LDAP Entries
+    '''
+    expected = {
+        'uid={},{}'.format(username, USER_BASE_DN): pk
+        for pk, username in User.valid_objects.values_list('id', 'username')
+    }
+    return sync_entries(1, 'inetOrgPerson', USER_BASE_DN, expected, refresh=refresh)
 
 
-def flush_dept_entries():
+def flush_group(refresh=True):
     '''
-    维护 dept LDAP Entries
+    维护 group LDAP Entries
     '''
-    tag = int(time.time())
-    entry_subject = 2
-    oc_map = OCMap.objects.get(name='groupOfNames')
-    dept_base = Entry.objects.get(dn='ou=dept,dc=example,dc=org')
-    for dept in Dept.valid_objects.exclude(uid='root'):
-        dn = ','.join([f"cn={uid.replace('d_', '')}"
-                       for uid in list(dept.upstream_uids)][:-1]) + ',ou=dept,dc=example,dc=org'
-        entry = Entry.objects.filter(dn=dn).first()
-        if entry:
-            if entry.oc_map != oc_map:
-                entry.oc_map = oc_map
-            if entry.parent != dept_base:
-                entry.parent = dept_base
-            if entry.keyval != dept.id:
-                entry.keyval = dept.id
-            if entry.subject != entry_subject:
-                entry.subject = entry_subject
-            entry.tag = tag
-            entry.save()
-        else:
-            Entry.objects.create(
-                dn=dn,
-                oc_map=oc_map,
-                parent=dept_base,
-                keyval=dept.id,
-                subject=entry_subject,
-                tag=tag,
-            )
+    return sync_entries(3, 'groupOfNames', GROUP_BASE_DN, node_dns(Group, GROUP_BASE_DN), refresh=refresh)
+
 
-    clear_deprecated_entries(entry_subject, tag)
+def flush_dept_entries(refresh=True):
+    '''
+    维护 dept LDAP Entries
+    '''
+    return sync_entries(2, 'groupOfNames', DEPT_BASE_DN, node_dns(Dept, DEPT_BASE_DN), refresh=refresh)
 
 
 def insert_test_data():
@@ -152,6 +195,7 @@ def flush_entries():
     维护LDAP Entries
     '''
     # insert_test_data()
-    flush_group()
-    flush_user_entries()
-    flush_dept_entries()
+    flush_group(refresh=False)
+    flush_user_entries(refresh=False)
+    flush_dept_entries(refresh=False)
+    refresh_ldap_entries()
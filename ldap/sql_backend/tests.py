@@ -1,3 +1,187 @@
-from django.test import TestCase
+'''
+tests for ldap.sql_backend.scripts
+需启用 ldap.sql_backend，数据库为 MySQL
+'''
+# pylint: disable=missing-docstring
 
-# Create your tests here.
+from django.contrib import admin
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+
+from ldap.sql_backend.admin import LDAPEntryAdmin
+from ldap.sql_backend.models import LDAPEntry, LDAPOCMappings, MaterializedLDAPEntry
+from ldap.sql_backend.scripts import (
+    DEPT_BASE_DN,
+    GROUP_BASE_DN,
+    USER_BASE_DN,
+    flush_dept_entries,
+    flush_entries,
+    flush_group,
+    flush_user_entries,
+    node_dns,
+    refresh_ldap_entries,
+    sync_entries,
+)
+from oneid_meta.models import Dept, Group, User
+
+
+class NodeDNsTestCase(TestCase):
+    def setUp(self):
+        root = Dept.get_root()
+        self.parent = Dept.valid_objects.create(uid='parent', name='parent', parent=root)
+        self.child = Dept.valid_objects.create(uid='child', name='child', parent=self.parent)
+        self.deleted = Dept.valid_objects.create(uid='deleted', name='deleted', parent=root, is_del=True)
+
+    def test_node_dns(self):
+        dns = node_dns(Dept, DEPT_BASE_DN)
+        self.assertEqual(dns['cn=parent,' + DEPT_BASE_DN], self.parent.id)
+        self.assertEqual(dns['cn=child,cn=parent,' + DEPT_BASE_DN], self.child.id)
+        self.assertNotIn(Dept.get_root().id, dns.values())
+        self.assertNotIn(self.deleted.id, dns.values())
+
+    def test_group_dns(self):
+        group = Group.valid_objects.create(uid='group', name='group', parent=Group.get_root())
+        self.assertEqual(node_dns(Group, GROUP_BASE_DN)['cn=group,' + GROUP_BASE_DN],
+                         group.id)
+
+
+class SyncEntriesTestCase(TestCase):
+    def setUp(self):
+        self.oc_map = LDAPOCMappings.objects.get(name='groupOfNames')
+        self.base = LDAPEntry.objects.get(dn=DEPT_BASE_DN)
+
+    def create_entry(self, dn, keyval, subject=2):
+        return LDAPEntry.objects.create(dn=dn, oc_map=self.oc_map, parent=self.base, keyval=keyval, subject=subject)
+
+    def test_diff(self):
+        unchanged = self.create_entry('cn=unchanged,' + DEPT_BASE_DN, 1)
+        changed = self.create_entry('cn=changed,' + DEPT_BASE_DN, 2)
+        stale = self.create_entry('cn=stale,' + DEPT_BASE_DN, 3)
+        other = self.create_entry('cn=other,' + DEPT_BASE_DN, 4, subject=0)
+        duplicated = self.create_entry('cn=unchanged,' + DEPT_BASE_DN, 1)
+        expected = {
+            'cn=unchanged,' + DEPT_BASE_DN: 1,
+            'cn=changed,' + DEPT_BASE_DN: 20,
+            'cn=other,' + DEPT_BASE_DN: 4,
+            'cn=new,' + DEPT_BASE_DN: 5,
+        }
+
+        self.assertEqual(sync_entries(2, 'groupOfNames', DEPT_BASE_DN, expected), (1, 2, 2))
+        self.assertEqual(
+            dict(LDAPEntry.objects.filter(subject=2, dn__endswith=',' + DEPT_BASE_DN).values_list('dn', 'keyval')),
+            expected)
+        self.assertTrue(LDAPEntry.objects.filter(id=unchanged.id).exists())
+        self.assertEqual(LDAPEntry.objects.get(id=changed.id).keyval, 20)
+        self.assertEqual(LDAPEntry.objects.get(id=other.id).subject, 2)
+        self.assertFalse(LDAPEntry.objects.filter(id__in=[stale.id, duplicated.id]).exists())
+
+        self.assertEqual(sync_entries(2, 'groupOfNames', DEPT_BASE_DN, expected), (0, 0, 0))
+
+    def test_flush_idempotent(self):
+        Dept.valid_objects.create(uid='dept', name='dept', parent=Dept.get_root())
+        Group.valid_objects.create(uid='group', name='group', parent=Group.get_root())
+        User.valid_objects.create(username='ldap', name='ldap')
+
+        for flush in (flush_user_entries, flush_group, flush_dept_entries):
+            flush()
+            self.assertEqual(flush(), (0, 0, 0))
+        self.assertTrue(LDAPEntry.objects.filter(dn='uid=ldap,' + USER_BASE_DN, subject=1).exists())
+        self.assertTrue(LDAPEntry.objects.filter(dn='cn=dept,' + DEPT_BASE_DN, subject=2).exists())
+
+        User.valid_objects.filter(username='ldap').update(is_del=True)
+        self.assertEqual(flush_user_entries(), (0, 0, 1))
+        self.assertFalse(LDAPEntry.objects.filter(dn='uid=ldap,' + USER_BASE_DN).exists())
+
+
+def materialized_rows():
+    return {
+        entry.id: (entry.dn, entry.oc_map_id, entry.parent, entry.keyval, entry.subject)
+        for entry in MaterializedLDAPEntry.objects.all()
+    }
+
+
+def expected_rows():
+    offset = MaterializedLDAPEntry.GROUP_KEYVAL_OFFSET
+    return {
+        entry.id: (entry.dn, entry.oc_map_id, entry.parent_id, entry.keyval + offset if entry.subject == 3 else
+                   entry.keyval, entry.subject)
+        for entry in LDAPEntry.objects.all()
+    }
+
+
+class RefreshLDAPEntriesTestCase(TestCase):
+    def setUp(self):
+        refresh_ldap_entries()
+        self.oc_map = LDAPOCMappings.objects.get(name='groupOfNames')
+        self.base = LDAPEntry.objects.get(dn=GROUP_BASE_DN)
+
+    def test_refresh_diff(self):
+        self.assertEqual(refresh_ldap_entries(), (0, 0, 0))
+        self.assertEqual(materialized_rows(), expected_rows())
+
+        entry = LDAPEntry.objects.create(dn='cn=refresh,' + GROUP_BASE_DN,
+                                         oc_map=self.oc_map,
+                                         parent=self.base,
+                                         keyval=7,
+                                         subject=3)
+        self.assertEqual(refresh_ldap_entries(), (1, 0, 0))
+        self.assertEqual(MaterializedLDAPEntry.objects.get(id=entry.id).keyval,
+                         7 + MaterializedLDAPEntry.GROUP_KEYVAL_OFFSET)
+
+        LDAPEntry.objects.filter(id=entry.id).update(keyval=8)
+        self.assertEqual(refresh_ldap_entries(), (0, 1, 0))
+        self.assertEqual(materialized_rows(), expected_rows())
+
+        LDAPEntry.objects.filter(id=entry.id).delete()
+        self.assertEqual(refresh_ldap_entries(), (0, 0, 1))
+        self.assertFalse(MaterializedLDAPEntry.objects.filter(id=entry.id).exists())
+        self.assertEqual(refresh_ldap_entries(), (0, 0, 0))
+
+    def test_flush_refreshes(self):
+        Group.valid_objects.create(uid='group', name='group', parent=Group.get_root())
+        flush_group(refresh=False)
+        self.assertFalse(MaterializedLDAPEntry.objects.filter(dn='cn=group,' + GROUP_BASE_DN).exists())
+        flush_entries()
+        self.assertEqual(materialized_rows(), expected_rows())
+
+        Group.valid_objects.create(uid='other', name='other', parent=Group.get_root())
+        self.assertEqual(flush_group(), (1, 0, 0))
+        self.assertTrue(MaterializedLDAPEntry.objects.filter(dn='cn=other,' + GROUP_BASE_DN).exists())
+        self.assertEqual(materialized_rows(), expected_rows())
+
+    def test_admin_refreshes(self):
+        entry = LDAPEntry.objects.create(dn='cn=admin,' + GROUP_BASE_DN,
+                                         oc_map=self.oc_map,
+                                         parent=self.base,
+                                         keyval=9,
+                                         subject=3)
+        refresh_ldap_entries()
+        LDAPEntryAdmin(LDAPEntry, admin.site).delete_model(None, entry)
+        self.assertFalse(MaterializedLDAPEntry.objects.filter(id=entry.id).exists())
+
+
+class MaterializedLDAPEntriesMigrationTestCase(TransactionTestCase):
+    # 迁移中写入的数据在测试后恢复
+    serialized_rollback = True
+    migrate_from = [('sql_backend', '0009_ldapentry_tag')]
+    migrate_to = [('sql_backend', '0010_materialized_ldap_entries')]
+
+    def test_populate(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        old_apps = executor.loader.project_state(self.migrate_from).apps
+        OldEntry = old_apps.get_model('sql_backend', 'LDAPEntry')    # pylint: disable=invalid-name
+        base = OldEntry.objects.get(dn=GROUP_BASE_DN)
+        entry = OldEntry.objects.create(dn='cn=migrate,' + GROUP_BASE_DN,
+                                        oc_map_id=base.oc_map_id,
+                                        parent=base,
+                                        keyval=3,
+                                        subject=3)
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+        self.assertEqual(materialized_rows(), expected_rows())
+        self.assertEqual(MaterializedLDAPEntry.objects.get(id=entry.id).keyval,
+                         3 + MaterializedLDAPEntry.GROUP_KEYVAL_OFFSET)
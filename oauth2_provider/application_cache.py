@@ -0,0 +1,56 @@
+"""
+Process-wide registry of OAuth2/OIDC applications, keyed by client_id.
+
+Applications are loaded lazily, unknown client_ids included, and kept
+until APPLICATION_GENERATION changes, which happens whenever an
+application is saved or deleted.
+"""
+import copy
+
+from common.django.generation import CacheGeneration, GenerationCache
+
+from .settings import oauth2_settings
+
+APPLICATION_GENERATION = CacheGeneration("oauth2_application")
+
+_registry = GenerationCache(APPLICATION_GENERATION, maxsize=oauth2_settings.APPLICATION_CACHE_SIZE)
+
+
+def get_application(model, client_id):
+    """
+    Return the `model` application of `client_id`, None if unknown.
+    The returned instance is a copy and safe to modify.
+    """
+    application = _registry.get_or_load(
+        (model._meta.label, client_id),
+        lambda: model.objects.filter(client_id=client_id).first(),
+    )
+    return _copy(application)
+
+
+def get_application_by_id(model, pk):
+    """
+    Return the `model` application of primary key `pk`, None if unknown.
+    The returned instance is a copy and safe to modify.
+    """
+    application = _registry.get_or_load(
+        (model._meta.label, "pk", pk),
+        lambda: model.objects.filter(pk=pk).first(),
+    )
+    return _copy(application)
+
+
+def _copy(application):
+    if application is None:
+        return None
+    application = copy.copy(application)
+    application._state = copy.copy(application._state)
+    application._state.fields_cache = {}
+    return application
+
+
+def bump_application_generation(sender, **kwargs):
+    """
+    Application saved or deleted.
+    """
+    APPLICATION_GENERATION.bump()
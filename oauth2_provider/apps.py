@@ -1,6 +1,45 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
+from django.db.models.signals import post_delete, post_save
 
 
 class DOTConfig(AppConfig):
     name = "oauth2_provider"
     verbose_name = "Django OAuth Toolkit"
+
+    def ready(self):
+        from .application_cache import bump_application_generation
+        from .keyring import bump_rsa_key_generation
+        from .models import (
+            get_access_token_model, get_application_model, get_oidc_access_token_model,
+            get_oidc_application_model, get_oidc_rsa_key_model,
+        )
+        from .token_cache import invalidate_access_token, invalidate_user_access_tokens
+
+        for model in (get_access_token_model(), get_oidc_access_token_model()):
+            post_save.connect(
+                invalidate_access_token, sender=model,
+                dispatch_uid="access_token_cache:{}:save".format(model._meta.model_name))
+            post_delete.connect(
+                invalidate_access_token, sender=model,
+                dispatch_uid="access_token_cache:{}:delete".format(model._meta.model_name))
+
+        user_model = get_access_token_model()._meta.get_field("user").related_model
+        post_save.connect(
+            invalidate_user_access_tokens, sender=user_model, dispatch_uid="access_token_cache:user:save")
+        post_delete.connect(
+            invalidate_user_access_tokens, sender=user_model, dispatch_uid="access_token_cache:user:delete")
+
+        # proxies such as oneid_meta's OAuthAPP send signals as themselves
+        application_models = (get_application_model(), get_oidc_application_model())
+        for model in apps.get_models():
+            if issubclass(model, application_models):
+                post_save.connect(
+                    bump_application_generation, sender=model,
+                    dispatch_uid="application_generation:{}:save".format(model._meta.label_lower))
+                post_delete.connect(
+                    bump_application_generation, sender=model,
+                    dispatch_uid="application_generation:{}:delete".format(model._meta.label_lower))
+
+        rsa_key_model = get_oidc_rsa_key_model()
+        post_save.connect(bump_rsa_key_generation, sender=rsa_key_model, dispatch_uid="rsa_key_generation:save")
+        post_delete.connect(bump_rsa_key_generation, sender=rsa_key_model, dispatch_uid="rsa_key_generation:delete")
@@ -0,0 +1,101 @@
+"""
+Self-contained JWT access tokens.
+
+Applications whose `access_token_format` is "jwt" are issued RS256 signed
+access tokens, which resource servers can validate offline against the
+JWKS document. The AccessToken row is kept for refresh and revocation
+bookkeeping, but its `token` column holds the jti rather than the JWT.
+
+The row is the source of truth: a JWT is revoked once the row of its jti
+is gone. Lookups go through the bearer token cache, so a lost or flushed
+cache only costs a query and never makes a revoked token valid again.
+"""
+import calendar
+import json
+import uuid
+from datetime import datetime
+
+from django.utils import timezone
+from jwkest import JWKESTException
+from jwkest.jws import JWS, factory
+
+from . import token_cache
+from .keyring import key_ring
+from .models import AbstractApplication, get_access_token_model
+
+ALG = "RS256"
+
+
+def is_jwt(token):
+    """
+    Whether `token` looks like a compact JWS.
+    """
+    return bool(token) and token.count(".") == 2
+
+
+def generate_jti():
+    return uuid.uuid4().hex
+
+
+def encode(access_token, issuer):
+    """
+    Sign the JWT of an AccessToken whose `token` is its jti.
+    """
+    keys = key_ring.get_signing_keys()
+    if not keys:
+        raise Exception("You must add at least one RSA Key.")
+    claims = {
+        "iss": issuer,
+        "client_id": access_token.application.client_id,
+        "scope": access_token.scope,
+        "iat": int(calendar.timegm((access_token.updated or timezone.now()).timetuple())),
+        "exp": int(calendar.timegm(access_token.expires.timetuple())),
+        "jti": access_token.token,
+    }
+    if access_token.user:
+        claims["sub"] = access_token.user.get_username()
+    return JWS(json.dumps(claims), alg=ALG).sign_compact(keys[:1])
+
+
+def decode(token):
+    """
+    Return the claims of `token` if its signature is valid, None otherwise.
+    Expiration and revocation are not checked, see `is_active`.
+    """
+    if not is_jwt(token):
+        return None
+    try:
+        jws = factory(token)
+        if jws is None or jws.jwt.headers.get("alg") != ALG:
+            return None
+        key = key_ring.get_key(jws.jwt.headers.get("kid"))
+        if key is None:
+            return None
+        claims = JWS().verify_compact(token, keys=[key])
+    except (JWKESTException, ValueError, TypeError):
+        return None
+    if not isinstance(claims, dict) or "jti" not in claims or "exp" not in claims:
+        return None
+    return claims
+
+
+def get_expires(claims):
+    return datetime.fromtimestamp(claims["exp"], tz=timezone.utc)
+
+
+def is_active(claims):
+    """
+    Whether the decoded token is neither expired nor revoked.
+    """
+    return timezone.now() < get_expires(claims) and not is_revoked(claims["jti"])
+
+
+def is_revoked(jti):
+    """
+    Whether the AccessToken row of `jti` is gone.
+    """
+    return token_cache.get_access_token(get_access_token_model(), jti) is None
+
+
+def uses_jwt(application):
+    return getattr(application, "access_token_format", None) == AbstractApplication.ACCESS_TOKEN_JWT
@@ -0,0 +1,94 @@
+"""
+In-memory ring of parsed OIDC RSA keys.
+
+PEM parsing is expensive, so each process parses the `OidcRsaKey` rows
+once and keeps the `RSAKey` objects, keyed by kid, together with the
+public JWKS document. The ring is reloaded when RSA_KEY_GENERATION
+changes, which happens whenever a key is saved or deleted.
+"""
+from collections import OrderedDict
+
+from Cryptodome.PublicKey.RSA import importKey
+from jwkest import long_to_base64
+from jwkest.jwk import RSAKey
+
+from common.django.generation import CacheGeneration
+
+RSA_KEY_GENERATION = CacheGeneration("oidc_rsa_key")
+
+
+class KeyRing:
+    """
+    Parsed signing keys of this process.
+    """
+
+    def __init__(self, generation=RSA_KEY_GENERATION):
+        self.generation = generation
+        self._loaded = None
+
+    def _load(self):
+        # Unlike GenerationCache this is also used inside transactions:
+        # id_tokens are signed within save_bearer_token's atomic block.
+        version = self.generation.peek()
+        loaded = self._loaded
+        if loaded is None or loaded[0] != version:
+            loaded = (version, self._parse())
+            self._loaded = loaded
+        return loaded[1]
+
+    @staticmethod
+    def _parse():
+        from .models import get_oidc_rsa_key_model
+
+        keys = OrderedDict()
+        jwks = []
+        for rsa_key in get_oidc_rsa_key_model().objects.order_by("id"):
+            key = importKey(rsa_key.key)
+            kid = rsa_key.kid
+            keys[kid] = RSAKey(key=key, kid=kid)
+            public_key = key.publickey()
+            jwks.append({
+                "kty": "RSA",
+                "alg": "RS256",
+                "use": "sig",
+                "kid": kid,
+                "n": long_to_base64(public_key.n),
+                "e": long_to_base64(public_key.e),
+            })
+        return keys, {"keys": jwks}
+
+    def get_signing_keys(self):
+        """
+        Return the list of parsed `RSAKey`s.
+        """
+        return list(self._load()[0].values())
+
+    def get_key(self, kid):
+        """
+        Return the parsed `RSAKey` of `kid`, None if unknown.
+        """
+        return self._load()[0].get(kid)
+
+    def get_jwks(self):
+        """
+        Return the public JWKS document.
+        """
+        return self._load()[1]
+
+    @property
+    def version(self):
+        return self.generation.peek()
+
+    @property
+    def last_modified(self):
+        return self.generation.last_modified
+
+
+key_ring = KeyRing()
+
+
+def bump_rsa_key_generation(sender, **kwargs):
+    """
+    RSA key saved or deleted.
+    """
+    RSA_KEY_GENERATION.bump()
@@ -1,10 +1,35 @@
 from django.core.management.base import BaseCommand
 
-from ...models import clear_expired
+from common.django.cleanup import CleanupTarget, run_cleanup
+from drf_expiring_authtoken.cache import token_cache
+from drf_expiring_authtoken.models import ExpiringToken
+from oneid_meta.models import RequestDataClientLog
+
+from ...models import get_expired_targets
 
 
 class Command(BaseCommand):
     help = "Can be run as a cronjob or directly to clean out expired tokens"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Rows deleted per transaction.")
+        parser.add_argument("--time-budget", type=float, default=None,
+                            help="Stop after this many seconds; the next run resumes where this one stopped.")
+        parser.add_argument("--restart", action="store_true",
+                            help="Ignore the positions saved by an interrupted run.")
+
     def handle(self, *args, **options):
-        clear_expired()
+        targets = get_expired_targets() + [
+            CleanupTarget("expiring_token", ExpiringToken.get_expired, raw=True,
+                          invalidate=lambda keys: token_cache.invalidate(*keys)),
+            CleanupTarget("request_data_log", RequestDataClientLog.get_expired),
+        ]
+        results = run_cleanup(
+            targets,
+            batch_size=options["batch_size"],
+            time_budget=options["time_budget"],
+            resume=not options["restart"],
+        )
+        for name, deleted, finished in results:
+            self.stdout.write("{}: {} deleted{}".format(name, deleted, "" if finished else ", unfinished"))
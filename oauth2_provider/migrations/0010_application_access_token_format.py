@@ -0,0 +1,18 @@
+# Generated by Django 2.2.10 on 2026-10-19 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oauth2_provider', '0009_auto_20200407_1109'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='access_token_format',
+            field=models.CharField(choices=[('opaque', 'Opaque'), ('jwt', 'JWT')], default='opaque', max_length=16),
+        ),
+    ]
@@ -11,10 +11,10 @@ from django.utils.translation import ugettext_lazy as _
 
 from jwkest.jwk import SYMKey
 from jwkest.jws import JWS
-from Cryptodome.PublicKey.RSA import importKey
-from jwkest.jwk import RSAKey
 
+from common.django.cleanup import CleanupTarget, run_cleanup
 from oauth2_provider.generators import generate_client_id, generate_client_secret
+from oauth2_provider.keyring import key_ring
 from oauth2_provider.scopes import get_scopes_backend
 from oauth2_provider.settings import oauth2_settings
 from oauth2_provider.validators import RedirectURIValidator, WildcardSet
@@ -44,6 +44,8 @@ class AbstractApplication(models.Model):
     * :attr:`client_secret` Confidential secret issued to the client during
                             the registration process as described in :rfc:`2.2`
     * :attr:`name` Friendly name for the Application
+    * :attr:`access_token_format` Opaque tokens, or self-contained signed JWTs
+                                  which resource servers can validate offline
     """
     CLIENT_CONFIDENTIAL = "confidential"
     CLIENT_PUBLIC = "public"
@@ -63,6 +65,13 @@ class AbstractApplication(models.Model):
         (GRANT_CLIENT_CREDENTIALS, _("Client credentials")),
     )
 
+    ACCESS_TOKEN_OPAQUE = "opaque"
+    ACCESS_TOKEN_JWT = "jwt"
+    ACCESS_TOKEN_FORMATS = (
+        (ACCESS_TOKEN_OPAQUE, _("Opaque")),
+        (ACCESS_TOKEN_JWT, _("JWT")),
+    )
+
     id = models.BigAutoField(primary_key=True)
     client_id = models.CharField(max_length=100, unique=True, default=generate_client_id, db_index=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
@@ -84,6 +93,11 @@ class AbstractApplication(models.Model):
     client_secret = models.CharField(max_length=255, blank=True, default=generate_client_secret, db_index=True)
     name = models.CharField(max_length=255, blank=True)
     skip_authorization = models.BooleanField(default=False)
+    access_token_format = models.CharField(
+        max_length=16,
+        choices=ACCESS_TOKEN_FORMATS,
+        default=ACCESS_TOKEN_OPAQUE,
+    )
 
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
@@ -672,9 +686,7 @@ class OidcAccessToken(AbstractAccessToken):
         Returns a list of keys.
         """
         if client.jwt_alg == 'RS256':
-            keys = []
-            for rsa_key in get_oidc_rsa_key_model().objects.all():
-                keys.append(RSAKey(key=importKey(rsa_key.key), kid=rsa_key.kid))
+            keys = key_ring.get_signing_keys()
             if not keys:
                 raise Exception('You must add at least one RSA Key.')
         elif client.jwt_alg == 'HS256':
@@ -830,12 +842,13 @@ def get_oidc_rsa_key_model():
     return apps.get_model(oauth2_settings.OIDC_RSA_KEY_MODEL)
 
 
-def clear_expired():
+def get_expired_targets():
+    """
+    Return the `CleanupTarget`s of expired refresh tokens, access tokens
+    and grants, in the order they should be deleted.
+    """
     now = timezone.now()
     refresh_expire_at = None
-    access_token_model = get_access_token_model()
-    refresh_token_model = get_refresh_token_model()
-    grant_model = get_grant_model()
     REFRESH_TOKEN_EXPIRE_SECONDS = oauth2_settings.REFRESH_TOKEN_EXPIRE_SECONDS
     if REFRESH_TOKEN_EXPIRE_SECONDS:
         if not isinstance(REFRESH_TOKEN_EXPIRE_SECONDS, timedelta):
@@ -846,9 +859,34 @@ def clear_expired():
                 raise ImproperlyConfigured(e)
         refresh_expire_at = now - REFRESH_TOKEN_EXPIRE_SECONDS
 
-    with transaction.atomic():
+    targets = []
+    for prefix, access_token_model, refresh_token_model, grant_model in (
+        ("", get_access_token_model(), get_refresh_token_model(), get_grant_model()),
+        ("oidc_", get_oidc_access_token_model(), get_oidc_refresh_token_model(), get_oidc_grant_model()),
+    ):
         if refresh_expire_at:
-            refresh_token_model.objects.filter(revoked__lt=refresh_expire_at).delete()
-            refresh_token_model.objects.filter(access_token__expires__lt=refresh_expire_at).delete()
-        access_token_model.objects.filter(refresh_token__isnull=True, expires__lt=now).delete()
-        grant_model.objects.filter(expires__lt=now).delete()
+            targets.append(CleanupTarget(
+                prefix + "revoked_refresh_token",
+                lambda model=refresh_token_model: model.objects.filter(revoked__lt=refresh_expire_at)))
+            targets.append(CleanupTarget(
+                prefix + "expired_refresh_token",
+                lambda model=refresh_token_model: model.objects.filter(access_token__expires__lt=refresh_expire_at)))
+        # nothing references these rows any more, and cached access tokens
+        # never outlive `expires`, so they are deleted without signals
+        targets.append(CleanupTarget(
+            prefix + "access_token",
+            lambda model=access_token_model: model.objects.filter(refresh_token__isnull=True, expires__lt=now),
+            raw=True))
+        targets.append(CleanupTarget(
+            prefix + "grant",
+            lambda model=grant_model: model.objects.filter(expires__lt=now),
+            raw=True))
+    return targets
+
+
+def clear_expired(batch_size=1000, time_budget=None, resume=True):
+    """
+    Delete expired tokens and grants in bounded batches, each in its own
+    short transaction. See `common.django.cleanup.run_cleanup`.
+    """
+    return run_cleanup(get_expired_targets(), batch_size=batch_size, time_budget=time_budget, resume=resume)
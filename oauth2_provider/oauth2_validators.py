@@ -12,7 +12,7 @@ from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
-from django.db.models import Q, QuerySet
+from django.db.models import Q
 from django.urls import reverse
 from django.utils import timezone, dateformat
 from django.utils.timezone import make_aware
@@ -25,6 +25,7 @@ from .models import (
 )
 from .scopes import get_scopes_backend
 from .settings import oauth2_settings
+from . import application_cache, jwt_tokens, token_cache
 from oauthlib.oauth2 import RequestValidator
 
 log = logging.getLogger("oauth2_provider")
@@ -159,17 +160,19 @@ class OAuth2Validator(RequestValidator):
         # we want to be sure that request has the client attribute!
         assert hasattr(request, "client"), '"request" instance has no "client" attribute'
         try:
-            if request.scopes and 'openid' in request.scopes:
-                request.client = request.client or OidcApplication.objects.get(client_id=client_id)
-            elif request.scopes and 'openid' not in request.scopes:
-                request.client = request.client or Application.objects.get(client_id=client_id)
-            elif not request.scopes:
-                request.client = request.client or Application.objects.filter(
-                    client_id=client_id) or OidcApplication.objects.filter(client_id=client_id)
-            try:
-                request.client = request.client[0] if isinstance(request.client, QuerySet) else request.client
-            except IndexError:
-                raise Application.DoesNotExist
+            if not request.client:
+                if request.scopes and 'openid' in request.scopes:
+                    models = (OidcApplication,)
+                elif request.scopes and 'openid' not in request.scopes:
+                    models = (Application,)
+                else:
+                    models = (Application, OidcApplication)
+                for model in models:
+                    request.client = application_cache.get_application(model, client_id)
+                    if request.client:
+                        break
+                else:
+                    raise Application.DoesNotExist
             # Check that the application can be used (defaults to always True)
             if not request.client.is_usable(request):
                 log.debug("Failed body authentication: Application %r is disabled" % (client_id))
@@ -375,16 +378,11 @@ class OAuth2Validator(RequestValidator):
         introspection_token = oauth2_settings.RESOURCE_SERVER_AUTH_TOKEN
         introspection_credentials = oauth2_settings.RESOURCE_SERVER_INTROSPECTION_CREDENTIALS
 
-        if re.search('oidc', request.uri):
-            try:
-                access_token = OidcAccessToken.objects.select_related("application", "user").get(token=token)
-            except OidcAccessToken.DoesNotExist:
-                access_token = None
+        model = OidcAccessToken if "oidc" in request.uri else AccessToken
+        if model is AccessToken and jwt_tokens.is_jwt(token):
+            access_token = self._load_jwt_access_token(token)
         else:
-            try:
-                access_token = AccessToken.objects.select_related("application", "user").get(token=token)
-            except AccessToken.DoesNotExist:
-                access_token = None
+            access_token = token_cache.get_access_token(model, token)
         # if there is no token or it's invalid then introspect the token if there's an external OAuth server
         if not access_token or not access_token.is_valid(scopes):
             if introspection_url and (introspection_token or introspection_credentials):
@@ -406,6 +404,31 @@ class OAuth2Validator(RequestValidator):
             self._set_oauth2_error_on_request(request, access_token, scopes)
             return False
 
+    @staticmethod
+    def _load_jwt_access_token(token):
+        """
+        Build an unsaved AccessToken from a JWT access token, without
+        touching the token table. None if invalid or revoked.
+        """
+        claims = jwt_tokens.decode(token)
+        if claims is None or jwt_tokens.is_revoked(claims["jti"]):
+            return None
+        application = application_cache.get_application(Application, claims.get("client_id"))
+        if application is None:
+            return None
+        user = None
+        if claims.get("sub"):
+            user = UserModel.valid_objects.filter(username=claims["sub"]).first()
+            if user is None:
+                return None
+        return AccessToken(
+            token=token,
+            user=user,
+            application=application,
+            scope=claims.get("scope", ""),
+            expires=jwt_tokens.get_expires(claims),
+        )
+
     def validate_code(self, client_id, code, client, request, *args, **kwargs):
         try:
             grant = Grant.objects.get(code=code, application=client) if isinstance(client, Application) \
@@ -557,12 +580,15 @@ class OAuth2Validator(RequestValidator):
                 access_token = AccessToken.objects.select_for_update().get(
                     pk=refresh_token_instance.access_token.pk
                 )
+                # the token string is replaced in place, drop the cached old one;
+                # a JWT issued for the old jti is revoked along with it
+                token_cache.invalidate(AccessToken, access_token.token)
                 access_token.user = request.user
                 access_token.scope = token["scope"]
                 access_token.expires = expires
                 access_token.token = token["access_token"]
                 access_token.application = request.client
-                access_token.save()
+                self._issue_jwt_access_token(access_token, token)
 
             # else create fresh with access & refresh tokens
             else:
@@ -603,6 +629,8 @@ class OAuth2Validator(RequestValidator):
                     # make sure that the token data we're returning matches
                     # the existing token
                     token["access_token"] = previous_access_token.token
+                    if jwt_tokens.uses_jwt(previous_access_token.application):
+                        token["access_token"] = jwt_tokens.encode(previous_access_token, get_issuer())
                     token["refresh_token"] = previous_access_token.source_refresh_token.token
                     token["scope"] = previous_access_token.scope
 
@@ -636,9 +664,22 @@ class OAuth2Validator(RequestValidator):
             id_token = self.create_id_token(access_token, request.user, request.client.client_id, nonce=code.nonce,
                                             at_hash=access_token.at_hash, request=request, scope=None)
             access_token.id_token = id_token
-        access_token.save()
+        self._issue_jwt_access_token(access_token, token)
         return access_token
 
+    @staticmethod
+    def _issue_jwt_access_token(access_token, token):
+        """
+        Save the access token. For applications issuing JWT access tokens
+        the row keeps the jti and the client receives the signed JWT.
+        """
+        if not (isinstance(access_token, AccessToken) and jwt_tokens.uses_jwt(access_token.application)):
+            access_token.save()
+            return
+        access_token.token = jwt_tokens.generate_jti()
+        access_token.save()
+        token["access_token"] = jwt_tokens.encode(access_token, get_issuer())
+
     def _create_refresh_token(self, request, token, access_token):
         if isinstance(access_token, AccessToken):
             refresh_token = RefreshToken(
@@ -673,6 +714,14 @@ class OAuth2Validator(RequestValidator):
         }
 
         token_type = token_types.get(token_type_hint, AccessToken)
+        if jwt_tokens.is_jwt(token):
+            # the row of a JWT access token is keyed by its jti
+            claims = jwt_tokens.decode(token)
+            if claims is None:
+                return
+            token_type = AccessToken
+            token = claims["jti"]
+        token_cache.invalidate(AccessToken, token)
         try:
             token_type.objects.get(token=token).revoke()
         except ObjectDoesNotExist:
@@ -851,7 +900,7 @@ def get_issuer(site_url=None, request=None) -> str:
     appended.
     """
     site_url = get_site_url(site_url=site_url, request=request)
-    path = reverse('oauth2_provider:provider-info').split('/.well-known/openid-configuration')[0]
+    path = reverse('oauth2_provider:oidc_provider:oidc_provider-info').split('/.well-known/openid-configuration')[0]
     issuer = site_url + path
     return str(issuer)
 
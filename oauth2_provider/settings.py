@@ -53,6 +53,10 @@ DEFAULTS = {
     "INTROSPECTION": "introspection token",
     "AUTHORIZATION_CODE_EXPIRE_SECONDS": 60,
     "ACCESS_TOKEN_EXPIRE_SECONDS": 36000,
+    "ACCESS_TOKEN_CACHE_SECONDS": 300,
+    "ACCESS_TOKEN_NEGATIVE_CACHE_SECONDS": 30,
+    "JWKS_MAX_AGE": 300,
+    "APPLICATION_CACHE_SIZE": 1024,
     "OIDC_ID_TOKEN_EXPIRE": 600,
     "REFRESH_TOKEN_EXPIRE_SECONDS": None,
     "REFRESH_TOKEN_GRACE_PERIOD_SECONDS": 0,
@@ -0,0 +1,114 @@
+"""
+Cache of validated bearer tokens.
+
+Positive entries hold the field values of the access token until
+min(token.expires, ACCESS_TOKEN_CACHE_SECONDS); the application always comes from
+the in-process application cache and the user is loaded by primary key on
+first access, so neither is pickled into the shared cache. Negative entries
+mark unknown tokens for ACCESS_TOKEN_NEGATIVE_CACHE_SECONDS. Entries are
+dropped when a token is saved, deleted, revoked or rotated, or its user is
+saved or deleted, and dropped again when the current transaction commits.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils import timezone
+
+from . import application_cache
+from .settings import oauth2_settings
+
+KEY_PREFIX = "oneid:oauth2:access_token:"
+MISSING = "missing"
+
+
+def _cache_key(model, token):
+    digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    return "{}{}:{}".format(KEY_PREFIX, model._meta.model_name, digest)
+
+
+def get_access_token(model, token):
+    """
+    Return the access token of `model` matching `token`, None if unknown.
+    """
+    key = _cache_key(model, token)
+    entry = cache.get(key)
+    if entry == MISSING:
+        return None
+    if entry is not None:
+        return _from_entry(model, entry)
+
+    access_token = model.objects.filter(token=token).first()
+    if access_token is not None:
+        access_token = _with_application(model, access_token)
+
+    if transaction.get_connection().in_atomic_block:
+        return access_token
+    if access_token is None:
+        if oauth2_settings.ACCESS_TOKEN_NEGATIVE_CACHE_SECONDS:
+            cache.set(key, MISSING, oauth2_settings.ACCESS_TOKEN_NEGATIVE_CACHE_SECONDS)
+    elif oauth2_settings.ACCESS_TOKEN_CACHE_SECONDS:
+        timeout = int(min(
+            (access_token.expires - timezone.now()).total_seconds(),
+            oauth2_settings.ACCESS_TOKEN_CACHE_SECONDS,
+        ))
+        if timeout > 0:
+            cache.set(key, _to_entry(access_token), timeout)
+    return access_token
+
+
+def _to_entry(access_token):
+    """
+    Field values of the access token, without related objects.
+    """
+    return [getattr(access_token, field.attname) for field in access_token._meta.concrete_fields]
+
+
+def _from_entry(model, entry):
+    """
+    Rebuild the access token of a cache entry, None if its application is gone.
+    """
+    return _with_application(model, model.from_db(router.db_for_read(model), None, entry))
+
+
+def _with_application(model, access_token):
+    """
+    Attach the cached application of the access token, None if it is gone.
+    """
+    if access_token.application_id is None:
+        return access_token
+    application_model = model._meta.get_field("application").related_model
+    application = application_cache.get_application_by_id(application_model, access_token.application_id)
+    if application is None:
+        return None
+    access_token.application = application
+    return access_token
+
+
+def invalidate(model, *tokens):
+    """
+    Drop the entries of the given tokens of `model`.
+    """
+    keys = [_cache_key(model, token) for token in tokens if token]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_access_token(sender, instance, **kwargs):
+    """
+    Access token saved or deleted.
+    """
+    invalidate(sender, instance.token)
+
+
+def invalidate_user_access_tokens(sender, instance, **kwargs):
+    """
+    User saved or deleted, e.g. deactivated or soft-deleted.
+    """
+    from .models import get_access_token_model, get_oidc_access_token_model
+
+    for model in (get_access_token_model(), get_oidc_access_token_model()):
+        invalidate(model, *model.objects.filter(user_id=instance.pk).values_list("token", flat=True))
@@ -6,10 +6,10 @@ from datetime import timedelta
 from urllib.parse import urlencode
 import importlib
 
-from Cryptodome.PublicKey import RSA
 from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.urls import reverse
-from jwkest import long_to_base64
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -24,7 +24,9 @@ from drf_expiring_authtoken.models import ExpiringToken
 from ..exceptions import OAuthToolkitError
 from ..forms import AllowForm
 from ..http import OAuth2ResponseRedirect
-from ..models import get_access_token_model, get_oidc_access_token_model, get_application_model, get_oidc_application_model, get_oidc_rsa_key_model
+from .. import jwt_tokens
+from ..keyring import key_ring
+from ..models import get_access_token_model, get_oidc_access_token_model, get_application_model, get_oidc_application_model
 from ..scopes import get_scopes_backend
 from ..settings import oauth2_settings
 from ..signals import app_authorized
@@ -381,7 +383,13 @@ class TokenView(OAuthLibMixin, View):
         if status == 200:
             json_body = json.loads(body)
             access_token = json_body.get("access_token")
-            if access_token is not None:
+            if access_token is not None and jwt_tokens.is_jwt(access_token):
+                # self-contained access tokens are handed out as issued
+                token = get_access_token_model().objects.get(token=jwt_tokens.decode(access_token)["jti"])
+                app_authorized.send(
+                    sender=self, request=request,
+                    token=token)
+            elif access_token is not None:
                 access_token_model = get_access_token_model() if 'openid' not in json_body.get("scope") else get_oidc_access_token_model()
                 token = access_token_model.objects.get(token=access_token)
                 if token.user == None:
@@ -465,22 +473,21 @@ class UserInfoOidcView(APIView):
 
 
 class JwksView(APIView):
+    """
+    Public keys for verifying signed tokens, open to resource servers.
+    """
+    authentication_classes = []
+    permission_classes = []
 
     def get(self, request, *args, **kwargs):
-        dic = dict(keys=[])
-
-        for rsakey in get_oidc_rsa_key_model().objects.all():
-            public_key = RSA.importKey(rsakey.key).publickey()
-            dic['keys'].append({
-                'kty': 'RSA',
-                'alg': 'RS256',
-                'use': 'sig',
-                'kid': rsakey.kid,
-                'n': long_to_base64(public_key.n),
-                'e': long_to_base64(public_key.e),
-            })
-
-        response = JsonResponse(dic)
+        etag = quote_etag("jwks-{}".format(key_ring.version))
+        last_modified = int(key_ring.last_modified)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = JsonResponse(key_ring.get_jwks())
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'public, max-age={}'.format(oauth2_settings.JWKS_MAX_AGE)
         response['Access-Control-Allow-Origin'] = '*'
         return response
 
@@ -500,9 +507,9 @@ class OidcProviderInfoView(View):
         dic['token_endpoint'] = site_url + reverse('oauth2_provider:token')
         dic['userinfo_endpoint'] = site_url + reverse('oauth2_provider:userinfo')
         # dic['end_session_endpoint'] = site_url + reverse('oauth2_provider:end-session')
-        dic['introspection_endpoint'] = site_url + reverse('oauth2_provider:oidc_introspect')
+        dic['introspection_endpoint'] = site_url + reverse('oauth2_provider:oidc_provider:oidc_introspect')
         dic['response_types_supported'] = [response_type[0] for response_type in get_oidc_application_model().RESPONSE_TYPES]
-        dic['jwks_uri'] = site_url + reverse('oauth2_provider:jwks')
+        dic['jwks_uri'] = site_url + reverse('oauth2_provider:oidc_provider:oidc_jwks')
         dic['id_token_signing_alg_values_supported'] = [jwt_alg[0] for jwt_alg in get_oidc_application_model().JWT_ALGS]
         # See: http://openid.net/specs/openid-connect-core-1_0.html#SubjectIDTypes
         dic['subject_types_supported'] = [client_type[0] for client_type in get_oidc_application_model().CLIENT_TYPES]
@@ -6,6 +6,7 @@ from django.http import HttpResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 
+from oauth2_provider import jwt_tokens
 from oauth2_provider.models import get_access_token_model, get_oidc_access_token_model
 from oauth2_provider.views import ScopedProtectedResourceView
 
@@ -21,8 +22,37 @@ class IntrospectTokenView(ScopedProtectedResourceView):
     """
     required_scopes = ["introspection"]
 
+    @staticmethod
+    def get_jwt_token_response(token_value):
+        """
+        Introspect a JWT access token from its claims and the cached row of its jti.
+        """
+        claims = jwt_tokens.decode(token_value)
+        if claims is None:
+            return HttpResponse(
+                content=json.dumps({"active": False}),
+                status=401,
+                content_type="application/json"
+            )
+        if not jwt_tokens.is_active(claims):
+            return HttpResponse(content=json.dumps({
+                "active": False,
+            }), status=200, content_type="application/json")
+        data = {
+            "active": True,
+            "scope": claims.get("scope", ""),
+            "exp": claims["exp"],
+        }
+        if claims.get("client_id"):
+            data["client_id"] = claims["client_id"]
+        if claims.get("sub"):
+            data["username"] = claims["sub"]
+        return HttpResponse(content=json.dumps(data), status=200, content_type="application/json")
+
     @staticmethod
     def get_token_response(token_value=None):
+        if jwt_tokens.is_jwt(token_value):
+            return IntrospectTokenView.get_jwt_token_response(token_value)
         try:
             token = get_access_token_model().objects.get(token=token_value)
         except ObjectDoesNotExist:
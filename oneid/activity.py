@@ -0,0 +1,230 @@
+'''
+activity tracking
+- 活跃记录：daily hash，HINCRBY
+- 各统计周期的活跃用户数：HyperLogLog
+- 各统计周期的登录次数（按登录方式）、注册数（按账号来源）：hash
+- 最近活跃时间：先写入 redis，定时批量写回数据库
+
+每次记录为一次 pipeline 往返，开销与活跃用户数无关
+统计周期为小时、日、周、月，跨周期的活跃用户数由 PFCOUNT 合并各 HyperLogLog 得到
+'''
+import datetime
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+from oneid.utils import redis_conn
+
+KEY_PREFIX = 'oneid:activity:'
+# 待写回数据库的最近活跃时间 user_id -> timestamp
+PENDING_KEY = KEY_PREFIX + 'last_active'
+FLUSHING_KEY = PENDING_KEY + ':flushing'
+
+PERIODS = ('hour', 'day', 'week', 'month')
+
+
+def period_start(period, moment):
+    '''
+    moment（本地时间）所在统计周期的起始时间
+    '''
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    if period == 'hour':
+        return moment
+    moment = moment.replace(hour=0)
+    if period == 'day':
+        return moment
+    if period == 'week':
+        return moment - datetime.timedelta(days=moment.weekday())
+    if period == 'month':
+        return moment.replace(day=1)
+    raise ValueError(f'unsupported period: {period}')
+
+
+def next_period_start(period, moment):
+    '''
+    moment 所在统计周期的下一周期的起始时间
+    '''
+    start = period_start(period, moment)
+    if period == 'hour':
+        return start + datetime.timedelta(hours=1)
+    if period == 'day':
+        return start + datetime.timedelta(days=1)
+    if period == 'week':
+        return start + datetime.timedelta(days=7)
+    return (start + datetime.timedelta(days=31)).replace(day=1)
+
+
+def period_starts(period, start, end):
+    '''
+    [start, end] 内各统计周期的起始时间
+    '''
+    moment = period_start(period, start)
+    while moment <= end:
+        yield moment
+        moment = next_period_start(period, moment)
+
+
+def earliest_period_start(period, now=None):
+    '''
+    仍保留统计数据的最早周期的起始时间
+    '''
+    now = timezone.localtime(now or timezone.now())
+    return period_start(period, now - datetime.timedelta(days=settings.ACTIVE_USER_DATA_LIFEDAY))
+
+
+def period_label(period, moment):
+    '''
+    moment 所在统计周期的标识
+    '''
+    if period == 'hour':
+        return moment.strftime('%Y-%m-%dT%H')
+    if period == 'day':
+        return moment.date().isoformat()
+    if period == 'week':
+        year, week, _ = moment.isocalendar()
+        return f'{year}-W{week:02d}'
+    if period == 'month':
+        return moment.strftime('%Y-%m')
+    raise ValueError(f'unsupported period: {period}')
+
+
+def period_key(metric, period, moment):
+    '''
+    统计项的键
+    :param str metric: active, logins, registers
+    '''
+    return f'{KEY_PREFIX}{metric}:{period}:{period_label(period, moment)}'
+
+
+def period_lifetime(period):
+    '''
+    统计数据保留时间（秒）
+    '''
+    lifetime = settings.ACTIVE_USER_DATA_LIFEDAY * 60 * 60 * 24
+    if period in ('week', 'month'):
+        lifetime += 31 * 60 * 60 * 24
+    return lifetime
+
+
+class ActivityTracker:
+    '''
+    记录用户活跃
+    '''
+    def __init__(self, conn=None):
+        self._conn = conn
+
+    @property
+    def conn(self):
+        '''
+        redis 连接
+        '''
+        return self._conn or redis_conn
+
+    def track(self, user, now=None):
+        '''
+        记录一次活跃
+        '''
+        now = now or timezone.now()
+        moment = timezone.localtime(now)
+        daily_key = settings.ACTIVE_USER_REDIS_KEY_PREFIX + moment.date().isoformat()
+
+        pipe = self.conn.pipeline(transaction=False)
+        pipe.hincrby(daily_key, user.id, 1)
+        pipe.expire(daily_key, period_lifetime('day'))
+        for period in PERIODS:
+            key = period_key('active', period, moment)
+            pipe.pfadd(key, user.id)
+            pipe.expire(key, period_lifetime(period))
+        pipe.hset(PENDING_KEY, user.id, now.timestamp())
+        pipe.execute()
+
+    def track_login(self, method, now=None):
+        '''
+        记录一次登录
+        :param str method: 登录方式
+        '''
+        self._incr('logins', method, now)
+
+    def track_register(self, user, now=None):
+        '''
+        记录一次注册，按账号来源分类
+        '''
+        self._incr('registers', user.origin, now)
+
+    def _incr(self, metric, field, now=None):
+        '''
+        各统计周期中 metric 的 field 计数加一
+        '''
+        moment = timezone.localtime(now or timezone.now())
+        pipe = self.conn.pipeline(transaction=False)
+        for period in PERIODS:
+            key = period_key(metric, period, moment)
+            pipe.hincrby(key, field, 1)
+            pipe.expire(key, period_lifetime(period))
+        pipe.execute()
+
+    def get_active_count(self, period='day', moment=None):
+        '''
+        某统计周期内的活跃用户数，为 HyperLogLog 估计值
+        '''
+        moment = timezone.localtime(moment or timezone.now())
+        return self.conn.pfcount(period_key('active', period, moment))
+
+    def get_rollups(self, period, start, end):
+        '''
+        [start, end] 内各统计周期的汇总
+        :param datetime start: 本地时间
+        :param datetime end: 本地时间
+        :return: 区间内活跃用户数（各周期合并去重），各周期的汇总
+        :rtype: (int, list)
+        '''
+        moments = list(period_starts(period, start, end))
+        if not moments:
+            return 0, []
+
+        pipe = self.conn.pipeline(transaction=False)
+        for moment in moments:
+            pipe.pfcount(period_key('active', period, moment))
+            pipe.hgetall(period_key('logins', period, moment))
+            pipe.hgetall(period_key('registers', period, moment))
+        pipe.pfcount(*[period_key('active', period, moment) for moment in moments])
+        res = pipe.execute()
+
+        rollups = []
+        for index, moment in enumerate(moments):
+            active_count, logins, registers = res[index * 3:index * 3 + 3]
+            rollups.append({
+                'time': period_label(period, moment),
+                'active_count': active_count,
+                'logins': {key: int(value) for key, value in logins.items()},
+                'registers': {key: int(value) for key, value in registers.items()},
+            })
+        return res[-1], rollups
+
+    def flush(self):
+        '''
+        将最近活跃时间批量写回数据库
+        :return: 写回的用户数
+        '''
+        from oneid_meta.models import User    # pylint: disable=import-outside-toplevel
+
+        # 上次写回中断时，先处理遗留数据
+        if not self.conn.exists(FLUSHING_KEY):
+            try:
+                self.conn.rename(PENDING_KEY, FLUSHING_KEY)
+            except redis.ResponseError:    # 无待写回数据
+                return 0
+
+        pending = self.conn.hgetall(FLUSHING_KEY)
+        users = [
+            User(id=int(user_id),
+                 last_active_time=datetime.datetime.fromtimestamp(float(timestamp), tz=datetime.timezone.utc))
+            for user_id, timestamp in pending.items()
+        ]
+        User.objects.bulk_update(users, ['last_active_time'], batch_size=500)
+        self.conn.delete(FLUSHING_KEY)
+        return len(users)
+
+
+activity_tracker = ActivityTracker()    # pylint: disable=invalid-name
@@ -2,20 +2,31 @@
 authentications
 - HeaderArkerBaseAuthentication
 '''
+import copy
+
 from rest_framework.authentication import BaseAuthentication
 from rest_framework import exceptions
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
 from drf_expiring_authtoken.authentication import ExpiringTokenAuthentication
+from common.django.generation import GenerationCache
+from oneid_meta.generation import ORG_GENERATION
 from oneid_meta.models import User
-from oneid.statistics import UserStatistics
+from oneid.activity import activity_tracker
 
 
 class HeaderArkerBaseAuthentication(BaseAuthentication):
     '''
     auth by header['HTTP_ARKER']
+
+    CREDIBLE_ARKERS 为列表时均以 admin 身份调用；
+    为字典时按 arker -> username 映射到各自的用户
     '''
+
+    # 进程内缓存，随 ORG_GENERATION 失效
+    _principal_cache = GenerationCache(ORG_GENERATION)
+
     def authenticate(self, request):
         '''
         auth by header['HTTP_ARKER']
@@ -24,13 +35,22 @@ class HeaderArkerBaseAuthentication(BaseAuthentication):
         if arker in settings.CREDIBLE_ARKERS:
             return (self.get_user(request), None)
 
-    @staticmethod
-    def get_user(request):    # pylint: disable=unused-argument
+    @classmethod
+    def get_user(cls, request):
         '''
-        目前返回admin
+        arker 对应的用户，默认为 admin
         后续支持sudo模式，可按需返回指定user
         '''
-        return User.valid_objects.get(username='admin')
+        arker = request.META.get('HTTP_ARKER', None)
+        arkers = settings.CREDIBLE_ARKERS
+        username = arkers.get(arker) if isinstance(arkers, dict) else 'admin'
+        user = cls._principal_cache.get_or_load(username,
+                                                lambda: User.valid_objects.filter(username=username).first())
+        if user is None:
+            raise exceptions.AuthenticationFailed(_('Invalid arker'))
+        user = copy.copy(user)
+        user._state = copy.copy(user._state)    # pylint: disable=protected-access
+        return user
 
 
 class BaseExpiringTokenAuthentication(ExpiringTokenAuthentication):
@@ -40,11 +60,11 @@ class BaseExpiringTokenAuthentication(ExpiringTokenAuthentication):
     def authenticate_credentials(self, key):
         '''
         在校验 token 基础上记录活跃程度
+        最近活跃时间由 activity_tracker 定时写回数据库
         '''
         user, token = super().authenticate_credentials(key)
         if not settings.TESTING and not user.is_admin:
-            UserStatistics.set_active_count(user)
-            user.update_last_active_time()
+            activity_tracker.track(user)
         return user, token
 
 
@@ -214,6 +214,16 @@ EXECUTERS = [    # 注意顺序
 
 EXECUTER_WIP = False
 
+# 延后执行的 executer，须同时在 EXECUTERS 中，如 'executer.LDAP.LDAPExecuter'
+# 其操作写入 outbox，由 celery 任务异步批量执行
+EXECUTER_WRITE_BEHIND = []
+EXECUTER_OUTBOX_BATCH_SIZE = 100
+# 失败后重试间隔（秒）按次数翻倍，不超过上限；超过次数后放弃
+EXECUTER_OUTBOX_RETRY_DELAY = 10
+EXECUTER_OUTBOX_MAX_RETRY_DELAY = 3600
+EXECUTER_OUTBOX_MAX_ATTEMPTS = 10
+EXECUTER_OUTBOX_LOCK_TIMEOUT = 600
+
 # LDAP
 
 LDAP_SERVER = 'ldap://localhost'
@@ -224,6 +234,12 @@ LDAP_USER_BASE = 'ou=people,{}'.format(LDAP_BASE)
 LDAP_DEPT_BASE = 'ou=dept,{}'.format(LDAP_BASE)
 LDAP_GROUP_BASE = 'cn=intra,ou=group,{}'.format(LDAP_BASE)
 LDAP_PASSWORD = 'admin'
+# 聚合部门、组成员时并发写入 LDAP 的连接数，这些连接取自独立的连接池
+LDAP_AGGREGATE_WORKERS = 1
+# 每个进程内 LDAP 连接池的连接数上限、等待空闲连接的超时（秒）、闲置多久后借出前探活（秒）
+LDAP_POOL_SIZE = 4
+LDAP_POOL_TIMEOUT = 10
+LDAP_POOL_CHECK_INTERVAL = 60
 
 # PASSWORD
 # one of 'MD5', 'SMD5', 'SHA', 'SSHA'
@@ -291,12 +307,18 @@ FE_TOKEN_URL = '/oauth/fe/token/'
 SAML_LOGIN_URL = '/saml/fe/login/'
 ALIYUN_ROLE_SSO_LOGIN_URL = '/saml/aliyun/sso-role/fe/login/'
 
+# SAML 响应的签名后端
+# - xmlsec1: 每次签名调用 xmlsec1 命令
+# - python-xmlsec: 进程内签名，需安装 xmlsec (python-xmlsec)
+SAML_CRYPTO_BACKEND = 'xmlsec1'
+
 # TODO
 FE_EMAIL_REGISTER_URL = '/oneid#/oneid/signup'    # 邮件注册页面
 FE_EMAIL_RESET_PWD_URL = '/oneid#/oneid/password'    # 邮件重置密码页面
 FE_EMAIL_ACTIVATE_USER_URL = '/oneid#/oneid/activate'    # 邮件激活账号页面
 FE_EMAIL_UPDATE_EMAIL_URL = '/oneid/#/reset_email_callback'    # 邮件重置邮箱页面
 LOGIN_URL = '/#/oneid/login'
+# 可信的内部调用方，均以 admin 身份调用；也可配置为 {arker: username} 以映射到不同用户
 CREDIBLE_ARKERS = [
     'oneid_broker',
     'arkbe_broker',
@@ -318,9 +340,18 @@ MINIO_BUCKET = 'oneid'
 # SMS
 SMS_LIFESPAN = datetime.timedelta(seconds=120)
 
+# 请求内容日志的保留时间，由 cleartokens 命令清理
+REQUEST_DATA_LOG_RETENTION = datetime.timedelta(days=90)
+
 
 ACTIVE_USER_DATA_LIFEDAY = 30
 ACTIVE_USER_REDIS_KEY_PREFIX = 'active-'
+# 最近活跃时间写回数据库的间隔（秒）
+ACTIVE_USER_FLUSH_INTERVAL = 60
+# 仅修改这些用户字段时不清除 token 缓存，这些字段也不写入 token 缓存
+EXPIRING_TOKEN_USER_IGNORED_FIELDS = ('last_active_time', 'last_login')
+# 不写入 token 缓存的敏感用户字段，访问时从数据库读取
+EXPIRING_TOKEN_USER_UNCACHED_FIELDS = ('password', 'private_email')
 
 # 密码复杂度规则
 # 值表示至少需包含的相应元素的个数，默认全部为0
@@ -27,16 +27,8 @@ class UserStatistics:
         '''
         update active_count to cache
         '''
-        date = datetime.datetime.today().date().isoformat()
-        uuid = str(user.uuid)
-        key = settings.ACTIVE_USER_REDIS_KEY_PREFIX + date
-        res = redis_conn.hgetall(key)
-
-        if res:
-            redis_conn.hincrby(key, uuid, 1)
-        else:
-            redis_conn.hset(key, uuid, 1)
-            redis_conn.expire(key, settings.ACTIVE_USER_DATA_LIFEDAY * 60 * 60 * 24)
+        from oneid.activity import activity_tracker    # pylint: disable=import-outside-toplevel
+        activity_tracker.track(user)
 
 
 class TimeCash:
@@ -0,0 +1 @@
+default_app_config = 'oneid_meta.apps.OneidMetaConfig'
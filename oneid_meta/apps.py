@@ -5,3 +5,7 @@ from django.apps import AppConfig
 
 class OneidMetaConfig(AppConfig):
     name = 'oneid_meta'
+
+    def ready(self):
+        from oneid_meta import signals    # pylint: disable=import-outside-toplevel
+        signals.connect()
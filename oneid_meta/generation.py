@@ -0,0 +1,13 @@
+'''
+数据版本号
+- ORG_GENERATION: 组织结构（部门、组、成员关系、管理员组、用户）
+- CONFIG_GENERATION: 配置（各单例配置、自定义字段、原生字段、国际手机号码）
+- SAML_APP_GENERATION: SAML 应用
+- PERM_GENERATION: 权限（应用、权限定义、用户权限判定结果）
+'''
+from common.django.generation import CacheGeneration
+
+ORG_GENERATION = CacheGeneration('org')
+CONFIG_GENERATION = CacheGeneration('config')
+SAML_APP_GENERATION = CacheGeneration('saml_app')
+PERM_GENERATION = CacheGeneration('perm')
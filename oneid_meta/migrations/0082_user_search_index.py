@@ -0,0 +1,110 @@
+# Generated by Django 2.2.10 on 2026-10-19 10:00
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+from pypinyin import lazy_pinyin, Style
+
+
+# 以下为建立索引时 oneid_meta.models.search 的实现，复制于此，不随应用代码变化
+TOKEN_MAX_LENGTH = 3
+
+CJK_PATTERN = re.compile(r'[一-鿿]')
+
+# 每批写入的行数
+BATCH_SIZE = 1000
+
+
+def normalize(text):
+    '''
+    统一为小写
+    '''
+    return (text or '').strip().lower()
+
+
+def gen_search_texts(user):
+    '''
+    用户的检索文本：用户名、邮箱、私人邮箱、手机、姓名，以及中文姓名的全拼和首字母
+    '''
+    texts = [
+        normalize(user.username),
+        normalize(user.email),
+        normalize(user.private_email),
+        normalize(user.mobile),
+        normalize(user.name),
+    ]
+    if CJK_PATTERN.search(user.name or ''):
+        texts.append(normalize(''.join(lazy_pinyin(user.name))))
+        texts.append(normalize(''.join(lazy_pinyin(user.name, style=Style.FIRST_LETTER))))
+    return [text for text in texts if text]
+
+
+def gen_tokens(text):
+    '''
+    文本中所有长度不超过 TOKEN_MAX_LENGTH 的片段
+    '''
+    tokens = set()
+    for length in range(1, TOKEN_MAX_LENGTH + 1):
+        for index in range(len(text) - length + 1):
+            tokens.add(text[index:index + length])
+    return tokens
+
+
+def build_user_search_index(apps, schema_editor):    # pylint: disable=unused-argument
+    '''
+    为已有用户建立检索索引，跨用户按 BATCH_SIZE 行分批写入
+    '''
+    User = apps.get_model('oneid_meta', 'User')
+    UserSearchToken = apps.get_model('oneid_meta', 'UserSearchToken')
+    UserSearchText = apps.get_model('oneid_meta', 'UserSearchText')
+
+    tokens, texts = [], []
+
+    def flush():
+        UserSearchToken.objects.bulk_create(tokens, batch_size=BATCH_SIZE)
+        UserSearchText.objects.bulk_create(texts, batch_size=BATCH_SIZE)
+        tokens.clear()
+        texts.clear()
+
+    users = User._base_manager.only('id', 'username', 'email', 'private_email', 'mobile', 'name')    # pylint: disable=protected-access
+    for user in users.iterator():
+        user_texts = gen_search_texts(user)
+        tokens.extend(
+            UserSearchToken(user_id=user.id, token=token)
+            for token in set().union(*(gen_tokens(text) for text in user_texts)))
+        texts.append(UserSearchText(user_id=user.id, content='\n'.join(user_texts)))
+        if len(tokens) >= BATCH_SIZE or len(texts) >= BATCH_SIZE:
+            flush()
+    flush()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oneid_meta', '0081_auto_20210204_1702'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=3, verbose_name='片段')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='oneid_meta.User')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserSearchText',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField(blank=True, default='', verbose_name='检索文本')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_text', to='oneid_meta.User')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='usersearchtoken',
+            index=models.Index(fields=['token', 'user'], name='user_search_token_index'),
+        ),
+        migrations.RunPython(build_user_search_index, migrations.RunPython.noop),
+    ]
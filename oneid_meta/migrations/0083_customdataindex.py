@@ -0,0 +1,108 @@
+# Generated by Django 2.2.10 on 2026-10-19 14:00
+
+import json
+import math
+
+from django.db import migrations, models
+
+
+# 以下为建立索引时 oneid_meta.models.search 的实现，复制于此，不随应用代码变化
+KEY_MAX_LENGTH = 64
+VALUE_MAX_LENGTH = 255
+
+# 每批写入的行数
+BATCH_SIZE = 1000
+
+
+def custom_value_str(value):
+    '''
+    自定义字段值的字符串形式，非标量按 JSON 文本
+    '''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def to_number(value):
+    '''
+    转为数值，不能转换时返回None
+    '''
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def gen_custom_values(data):
+    '''
+    自定义字段中可索引的键值
+    :rtype: list of (key, value_str, value_num)
+    '''
+    values = []
+    for key, value in (data or {}).items():
+        if len(key) > KEY_MAX_LENGTH:
+            continue
+        value = custom_value_str(value)
+        values.append((key, value[:VALUE_MAX_LENGTH], to_number(value)))
+    return values
+
+
+def build_custom_data_index(apps, schema_editor):    # pylint: disable=unused-argument
+    '''
+    为已有自定义字段建立键值索引，按 BATCH_SIZE 行分批写入
+    '''
+    CustomDataIndex = apps.get_model('oneid_meta', 'CustomDataIndex')
+    rows = []
+    for model_name, subject, owner_field in (
+        ('CustomUser', 'user', 'user_id'),
+        ('CustomDept', 'dept', 'dept_id'),
+        ('CustomGroup', 'group', 'group_id'),
+    ):
+        model = apps.get_model('oneid_meta', model_name)
+        for owner_id, data in model._base_manager.values_list(owner_field, 'data').iterator():    # pylint: disable=protected-access
+            rows.extend(
+                CustomDataIndex(subject=subject, owner_id=owner_id, key=key, value_str=value_str, value_num=value_num)
+                for key, value_str, value_num in gen_custom_values(data))
+            if len(rows) >= BATCH_SIZE:
+                CustomDataIndex.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+                rows = []
+    CustomDataIndex.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oneid_meta', '0082_user_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomDataIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(choices=[('user', '用户'), ('dept', '部门'), ('group', '组')], max_length=16, verbose_name='对象类型')),
+                ('owner_id', models.IntegerField(verbose_name='用户、部门或组的id')),
+                ('key', models.CharField(max_length=64, verbose_name='字段')),
+                ('value_str', models.CharField(max_length=255, verbose_name='值')),
+                ('value_num', models.FloatField(null=True, verbose_name='数值')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='customdataindex',
+            index=models.Index(fields=['subject', 'key', 'value_str'], name='custom_data_str_index'),
+        ),
+        migrations.AddIndex(
+            model_name='customdataindex',
+            index=models.Index(fields=['subject', 'key', 'value_num'], name='custom_data_num_index'),
+        ),
+        migrations.AddIndex(
+            model_name='customdataindex',
+            index=models.Index(fields=['subject', 'owner_id'], name='custom_data_owner_index'),
+        ),
+        migrations.RunPython(build_custom_data_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.10 on 2026-10-19 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oneid_meta', '0083_customdataindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecuterOutbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('executer', models.CharField(max_length=255, verbose_name='executer 路径')),
+                ('func_name', models.CharField(max_length=64, verbose_name='操作')),
+                ('subject', models.CharField(blank=True, default='', max_length=128, verbose_name='操作对象，用于合并连续操作')),
+                ('params', models.TextField(verbose_name='参数')),
+                ('status', models.CharField(choices=[('pending', '待执行'), ('dead', '多次失败，已放弃')], default='pending', max_length=16, verbose_name='状态')),
+                ('attempts', models.IntegerField(default=0, verbose_name='已尝试次数')),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True, verbose_name='下次重试时间')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='最近一次错误')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='executeroutbox',
+            index=models.Index(fields=['executer', 'status', 'id'], name='executer_outbox_index'),
+        ),
+    ]
@@ -54,3 +54,12 @@ from oneid_meta.models.advance import (
     MiddlewarePlugin,
     CrontabPlugin,
 )
+
+from oneid_meta.models.search import (
+    UserSearchToken,
+    UserSearchText,
+    CustomDataIndex,
+)
+
+from oneid_meta.models.outbox import (
+    ExecuterOutbox, )
@@ -2,7 +2,9 @@
 '''
 schema for GlobalConfig
 '''
+import copy
 import hashlib
+
 from django.db import models
 from django.contrib.sites.models import Site
 from django.conf import settings
@@ -10,6 +12,8 @@ import jsonfield
 from aliyunsdkcore.acs_exception.exceptions import ServerException
 
 from common.django.model import BaseModel
+from common.django.generation import GenerationCache
+from oneid_meta.generation import CONFIG_GENERATION
 from common.sms.aliyun.sms_manager import SMSAliyunManager
 from common.Email.email_manager import EmailManager
 from thirdparty_data_sdk.dingding.dingsdk.accesstoken_manager import AccessTokenManager
@@ -25,10 +29,25 @@ class SingletonConfigMixin:
     '''
     单例配置
     '''
+
+    # 进程内缓存，随 CONFIG_GENERATION 失效
+    _current_cache = GenerationCache(CONFIG_GENERATION)
+
     @classmethod
     def get_current(cls):
         '''
         当前所用配置
+        优先取进程内缓存，返回副本，调用方修改不影响缓存
+        '''
+        obj = cls._current_cache.get_or_load(cls, cls.get_current_from_db)
+        clone = copy.copy(obj)
+        clone._state = copy.copy(obj._state)    # pylint: disable=protected-access
+        return clone
+
+    @classmethod
+    def get_current_from_db(cls):
+        '''
+        从数据库读取当前所用配置
         '''
         obj, _ = cls.valid_objects.get_or_create(site=Site.objects.get_current())
         return obj
@@ -387,6 +406,35 @@ class CustomField(BaseModel):
     schema = jsonfield.JSONField(default={'type': 'string'}, verbose_name='字段定义')
     is_visible = models.BooleanField(default=True, verbose_name='是否展示')
 
+    # 进程内缓存，随 CONFIG_GENERATION 失效
+    _schema_cache = GenerationCache(CONFIG_GENERATION)
+
+    @classmethod
+    def get_schema(cls, subject, visible_only=False):
+        '''
+        某分类下自定义字段的定义，不查库
+        :rtype: list of dict: uuid(hex), name, schema, is_visible
+        '''
+        fields = cls._schema_cache.get_or_load('schema', cls._load_schema).get(subject, [])
+        if visible_only:
+            return [field for field in fields if field['is_visible']]
+        return fields
+
+    @classmethod
+    def _load_schema(cls):
+        '''
+        按分类整理所有自定义字段
+        '''
+        res = {}
+        for field in cls.valid_objects.all():
+            res.setdefault(field.subject, []).append({
+                'uuid': field.uuid.hex,
+                'name': field.name,
+                'schema': field.schema,
+                'is_visible': field.is_visible,
+            })
+        return res
+
 
 class NativeField(BaseModel):
     '''
@@ -403,6 +451,20 @@ class NativeField(BaseModel):
     is_visible = models.BooleanField(default=True, verbose_name='是否展示')
     is_visible_editable = models.BooleanField(default=True, verbose_name='对于`是否展示`，是否可以修改')
 
+    # 进程内缓存，随 CONFIG_GENERATION 失效
+    _visible_keys_cache = GenerationCache(CONFIG_GENERATION)
+
+    @classmethod
+    def get_visible_keys(cls, subject):
+        '''
+        某分类下可见的原生字段，不查库
+        '''
+        return list(
+            cls._visible_keys_cache.get_or_load(
+                subject,
+                lambda: [field.key for field in cls.valid_objects.filter(subject=subject, is_visible=True)],
+            ))
+
 
 class AlipayConfig(BaseModel, SingletonConfigMixin):
     '''
@@ -4,7 +4,9 @@ schema of log
 import uuid
 from collections import OrderedDict
 
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class RequestAccessLog(models.Model):
@@ -52,6 +54,18 @@ class RequestDataClientLog(models.Model):
             content_type=request.content_type,
         )
 
+    @classmethod
+    def get_expired(cls):
+        '''
+        超过保留时间的请求内容
+        以保留时间前最后一条操作日志引用的请求内容为界，id 不大于它的均已过期
+        '''
+        boundary = Log.objects.filter(created__lt=timezone.now() - settings.REQUEST_DATA_LOG_RETENTION,
+                                      data__isnull=False).order_by('-id').values_list('data_id', flat=True).first()
+        if boundary is None:
+            return cls.objects.none()
+        return cls.objects.filter(id__lte=boundary)
+
 
 class Log(models.Model):
     '''
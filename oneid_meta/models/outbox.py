@@ -0,0 +1,38 @@
+'''
+schema of executer outbox
+'''
+from django.db import models
+
+
+class ExecuterOutbox(models.Model):
+    '''
+    待延后执行的 executer 操作，与触发它的数据修改在同一事务中写入
+    由 executer.outbox 按 id 顺序逐个 executer 取出执行
+    '''
+
+    STATUS_PENDING = 'pending'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, '待执行'),
+        (STATUS_DEAD, '多次失败，已放弃'),
+    )
+
+    executer = models.CharField(max_length=255, verbose_name='executer 路径')
+    func_name = models.CharField(max_length=64, verbose_name='操作')
+    subject = models.CharField(max_length=128, blank=True, default='', verbose_name='操作对象，用于合并连续操作')
+    params = models.TextField(verbose_name='参数')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='状态')
+    attempts = models.IntegerField(default=0, verbose_name='已尝试次数')
+    next_attempt_at = models.DateTimeField(blank=True, null=True, verbose_name='下次重试时间')
+    last_error = models.TextField(blank=True, default='', verbose_name='最近一次错误')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    objects = models.Manager()
+
+    class Meta:    # pylint: disable=missing-class-docstring
+        indexes = [
+            models.Index(fields=['executer', 'status', 'id'], name='executer_outbox_index'),
+        ]
+
+    def __str__(self):
+        return f'ExecuterOutbox: {self.executer}.{self.func_name}({self.subject})'
@@ -0,0 +1,261 @@
+'''
+schema for search index
+- UserSearchToken: 用户关键字检索的倒排索引
+- UserSearchText: 用户检索文本，用于复核
+- CustomDataIndex: 自定义字段的键值索引
+'''
+import json
+import math
+import re
+
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import Count
+from pypinyin import lazy_pinyin, Style
+
+# 索引片段的最大长度
+TOKEN_MAX_LENGTH = 3
+
+CJK_PATTERN = re.compile(r'[一-鿿]')
+
+
+def normalize(text):
+    '''
+    统一为小写
+    '''
+    return (text or '').strip().lower()
+
+
+def gen_search_texts(user):
+    '''
+    用户的检索文本：用户名、邮箱、私人邮箱、手机、姓名，以及中文姓名的全拼和首字母
+    '''
+    texts = [
+        normalize(user.username),
+        normalize(user.email),
+        normalize(user.private_email),
+        normalize(user.mobile),
+        normalize(user.name),
+    ]
+    if CJK_PATTERN.search(user.name or ''):
+        texts.append(normalize(''.join(lazy_pinyin(user.name))))
+        texts.append(normalize(''.join(lazy_pinyin(user.name, style=Style.FIRST_LETTER))))
+    return [text for text in texts if text]
+
+
+def gen_tokens(text, max_length=TOKEN_MAX_LENGTH):
+    '''
+    文本中所有长度不超过 max_length 的片段
+    '''
+    tokens = set()
+    for length in range(1, max_length + 1):
+        for index in range(len(text) - length + 1):
+            tokens.add(text[index:index + length])
+    return tokens
+
+
+def gen_keyword_tokens(keyword):
+    '''
+    检索关键字对应的片段：短关键字本身即为片段，长关键字拆为定长片段
+    '''
+    if len(keyword) <= TOKEN_MAX_LENGTH:
+        return {keyword}
+    return {keyword[index:index + TOKEN_MAX_LENGTH] for index in range(len(keyword) - TOKEN_MAX_LENGTH + 1)}
+
+
+class UserSearchToken(models.Model):
+    '''
+    用户检索文本中的片段
+    '''
+    class Meta:    # pylint: disable=missing-class-docstring
+        indexes = [models.Index(fields=['token', 'user'], name='user_search_token_index')]
+
+    user = models.ForeignKey('oneid_meta.User', related_name='search_tokens', on_delete=models.CASCADE)
+    token = models.CharField(max_length=TOKEN_MAX_LENGTH, verbose_name='片段')
+
+    objects = models.Manager()
+
+    @classmethod
+    def search(cls, keyword):
+        '''
+        匹配关键字的用户id
+        关键字不超过 TOKEN_MAX_LENGTH 时索引即精确结果，否则以检索文本复核
+        :rtype: QuerySet of user_id
+        '''
+        keyword = normalize(keyword)
+        tokens = gen_keyword_tokens(keyword)
+        user_ids = cls.objects.filter(token__in=tokens).values('user_id').\
+            annotate(hits=Count('token', distinct=True)).filter(hits=len(tokens)).values('user_id')
+        if len(keyword) <= TOKEN_MAX_LENGTH:
+            return user_ids
+        return UserSearchText.objects.filter(user_id__in=user_ids, content__contains=keyword).values('user_id')
+
+    @classmethod
+    def refresh(cls, users):
+        '''
+        重建用户的索引，检索文本未变化时跳过
+        由 User 的 post_save 信号调用；QuerySet.update() 不触发信号，批量修改检索字段后须自行调用
+        '''
+        users = list(users)
+        contents = dict(UserSearchText.objects.filter(user__in=users).values_list('user_id', 'content'))
+        with transaction.atomic():
+            for user in users:
+                texts = gen_search_texts(user)
+                content = '\n'.join(texts)
+                if contents.get(user.id) == content:
+                    continue
+                cls.objects.filter(user=user).delete()
+                cls.objects.bulk_create(
+                    [cls(user=user, token=token) for token in set().union(*(gen_tokens(text) for text in texts))])
+                UserSearchText.objects.update_or_create(user=user, defaults={'content': content})
+
+
+class UserSearchText(models.Model):
+    '''
+    用户检索文本，各项以换行分隔，均为小写
+    '''
+    user = models.OneToOneField('oneid_meta.User', related_name='search_text', on_delete=models.CASCADE)
+    content = models.TextField(blank=True, default='', verbose_name='检索文本')
+
+    objects = models.Manager()
+
+
+def custom_value_str(value):
+    '''
+    自定义字段值的字符串形式，非标量按 JSON 文本
+    '''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def gen_custom_values(data):
+    '''
+    自定义字段中可索引的键值
+    超长的值只索引前 VALUE_MAX_LENGTH 个字符，查找时复核；超长的键不索引，也不可查找
+    :rtype: list of (key, value_str, value_num)
+    '''
+    values = []
+    for key, value in (data or {}).items():
+        if len(key) > CustomDataIndex.KEY_MAX_LENGTH:
+            continue
+        value = custom_value_str(value)
+        values.append((key, value[:CustomDataIndex.VALUE_MAX_LENGTH], to_number(value)))
+    return values
+
+
+def to_number(value):
+    '''
+    转为数值，不能转换时返回None
+    '''
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+class CustomDataIndex(models.Model):
+    '''
+    CustomUser、CustomDept、CustomGroup 中自定义字段的键值索引
+    值可转为数值时同时记录数值，范围查找按数值比较
+    '''
+    SUBJECT_CHOICES = (
+        ('user', '用户'),
+        ('dept', '部门'),
+        ('group', '组'),
+    )
+    KEY_MAX_LENGTH = 64
+    VALUE_MAX_LENGTH = 255
+    LOOKUPS = ('lte', 'lt', 'gte', 'gt')
+
+    class Meta:    # pylint: disable=missing-class-docstring
+        indexes = [
+            models.Index(fields=['subject', 'key', 'value_str'], name='custom_data_str_index'),
+            models.Index(fields=['subject', 'key', 'value_num'], name='custom_data_num_index'),
+            models.Index(fields=['subject', 'owner_id'], name='custom_data_owner_index'),
+        ]
+
+    subject = models.CharField(choices=SUBJECT_CHOICES, max_length=16, verbose_name='对象类型')
+    owner_id = models.IntegerField(verbose_name='用户、部门或组的id')
+    key = models.CharField(max_length=KEY_MAX_LENGTH, verbose_name='字段')
+    value_str = models.CharField(max_length=VALUE_MAX_LENGTH, verbose_name='值')
+    value_num = models.FloatField(null=True, verbose_name='数值')
+
+    objects = models.Manager()
+
+    @classmethod
+    def refresh(cls, subject, owner_id, data):
+        '''
+        重建某一对象的索引
+        '''
+        values = set(gen_custom_values(data))
+        with transaction.atomic():
+            existed = {
+                (item.key, item.value_str, item.value_num): item.id
+                for item in cls.objects.filter(subject=subject, owner_id=owner_id)
+            }
+            expired = [pk for value, pk in existed.items() if value not in values]
+            if expired:
+                cls.objects.filter(id__in=expired).delete()
+            cls.objects.bulk_create([
+                cls(subject=subject, owner_id=owner_id, key=key, value_str=value_str, value_num=value_num)
+                for key, value_str, value_num in values if (key, value_str, value_num) not in existed
+            ])
+
+    @classmethod
+    def remove(cls, subject, owner_id):
+        '''
+        删除某一对象的索引
+        '''
+        cls.objects.filter(subject=subject, owner_id=owner_id).delete()
+
+    @classmethod
+    def search(cls, subject, key, value, lookup=None):
+        '''
+        匹配条件的对象id
+        lookup 为 lte、lt、gte、gt 之一时进行范围查找，参数可转为数值时按数值比较，否则按字符串比较
+        超长的值按前 VALUE_MAX_LENGTH 个字符比较，精确查找时再以原数据复核
+        :rtype: QuerySet or list of owner_id
+        '''
+        if len(key) > cls.KEY_MAX_LENGTH:
+            raise ValueError(f'custom field key longer than {cls.KEY_MAX_LENGTH}: {key}')
+        queryset = cls.objects.filter(subject=subject, key=key)
+        value = str(value)
+        if lookup is None:
+            if len(value) < cls.VALUE_MAX_LENGTH:
+                return queryset.filter(value_str=value).values('owner_id')
+            owner_ids = queryset.filter(value_str=value[:cls.VALUE_MAX_LENGTH]).values_list('owner_id', flat=True)
+            return cls.recheck(subject, key, value, owner_ids)
+        if lookup not in cls.LOOKUPS:
+            raise ValueError(f'unsupported lookup: {lookup}')
+        number = to_number(value)
+        if number is not None:
+            return queryset.filter(**{f'value_num__{lookup}': number}).values('owner_id')
+        return queryset.filter(**{f'value_str__{lookup}': value[:cls.VALUE_MAX_LENGTH]}).values('owner_id')
+
+    @staticmethod
+    def recheck(subject, key, value, owner_ids):
+        '''
+        以原数据复核索引中只收录了前缀的值
+        :rtype: list of owner_id
+        '''
+        model_name, owner_field = CUSTOM_DATA_MODELS[subject]
+        model = apps.get_model('oneid_meta', model_name)
+        return [
+            owner_id for owner_id, data in model.objects.filter(**{
+                f'{owner_field}__in': list(owner_ids)
+            }).values_list(owner_field, 'data') if key in (data or {}) and custom_value_str(data[key]) == value
+        ]
+
+
+# subject: (自定义数据模型, 所属对象id字段)
+CUSTOM_DATA_MODELS = {
+    'user': ('CustomUser', 'user_id'),
+    'dept': ('CustomDept', 'dept_id'),
+    'group': ('CustomGroup', 'group_id'),
+}
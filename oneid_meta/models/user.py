@@ -15,6 +15,8 @@ from django.conf import settings
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 from common.django.model import BaseModel, IgnoreDeletedManager
+from common.django.generation import GenerationCache
+from oneid_meta.generation import ORG_GENERATION, PERM_GENERATION
 from oneid_meta.models.config import CustomField
 from oneid_meta.models.group import GroupMember, Group
 from oneid_meta.models.dept import DeptMember, Dept
@@ -80,6 +82,11 @@ class User(BaseModel, PermOwnerMixin):
 
     isolated_objects = IsolatedManager()
 
+    # 进程内缓存，随 ORG_GENERATION 失效
+    _extern_user_ids_cache = GenerationCache(ORG_GENERATION)
+    # 进程内缓存，随 PERM_GENERATION 失效
+    _perm_ids_cache = GenerationCache(PERM_GENERATION, maxsize=10000)
+
     def save(self, *args, **kwargs):    # pylint: disable=arguments-differ,signature-differs
         for unique_feilds in [
                 'username',
@@ -248,6 +255,16 @@ class User(BaseModel, PermOwnerMixin):
             return True
         return UserPerm.valid_objects.filter(owner=self, perm=perm, value=True).exists()
 
+    @property
+    def perm_ids(self):
+        '''
+        拥有的全部权限的id，进程内缓存，随 PERM_GENERATION 失效
+        '''
+        return self._perm_ids_cache.get_or_load(
+            self.id,
+            lambda: frozenset(UserPerm.valid_objects.filter(owner=self, value=True).values_list('perm_id', flat=True)),
+        )
+
     def has_perm_realtime(self, perm):
         '''
         实时判断是否有某权限
@@ -563,8 +580,17 @@ class User(BaseModel, PermOwnerMixin):
         '''
         是否为内部员工
         '''
-        # bad implement
-        return not GroupMember.valid_objects.filter(owner__uid='extern', user=self).exists()
+        return self.id not in self.get_extern_user_ids()
+
+    @classmethod
+    def get_extern_user_ids(cls):
+        '''
+        所有外部联系人的id，进程内缓存，随 ORG_GENERATION 失效
+        '''
+        return cls._extern_user_ids_cache.get_or_load(
+            'extern',
+            lambda: set(GroupMember.valid_objects.filter(owner__uid='extern').values_list('user_id', flat=True)),
+        )
 
     def update_last_active_time(self, gap_minutes=5):
         '''
@@ -624,38 +650,24 @@ class CustomUser(BaseModel):
         res = []
         data = self.data
 
-        kwargs = {}
-        if visible_only:
-            kwargs.update(is_visible=True)
-
         if self.user.is_intra:
-            for field in CustomField.valid_objects.filter(subject='user', **kwargs):
-                res.append({
-                    'uuid': field.uuid.hex,
-                    'name': field.name,
-                    'value': data.get(field.uuid.hex, ''),
-                })
-            for field in CustomField.valid_objects.filter(subject='extern_user', **kwargs):
-                if field.uuid.hex in data:    # pylint: disable=unsupported-membership-test
-                    res.append({
-                        'uuid': field.uuid.hex,
-                        'name': field.name,
-                        'value': data.get(field.uuid.hex),
-                    })
+            subject, other_subject = 'user', 'extern_user'
         else:
-            for field in CustomField.valid_objects.filter(subject='extern_user', **kwargs):
+            subject, other_subject = 'extern_user', 'user'
+
+        for field in CustomField.get_schema(subject, visible_only=visible_only):
+            res.append({
+                'uuid': field['uuid'],
+                'name': field['name'],
+                'value': data.get(field['uuid'], ''),
+            })
+        for field in CustomField.get_schema(other_subject, visible_only=visible_only):
+            if field['uuid'] in data:    # pylint: disable=unsupported-membership-test
                 res.append({
-                    'uuid': field.uuid.hex,
-                    'name': field.name,
-                    'value': data.get(field.uuid.hex, ''),
+                    'uuid': field['uuid'],
+                    'name': field['name'],
+                    'value': data.get(field['uuid']),
                 })
-            for field in CustomField.valid_objects.filter(subject='user', **kwargs):
-                if field.uuid.hex in data:    # pylint: disable=unsupported-membership-test
-                    res.append({
-                        'uuid': field.uuid.hex,
-                        'name': field.name,
-                        'value': data.get(field.uuid.hex),
-                    })
         return res
 
 
@@ -0,0 +1,128 @@
+'''
+signals of oneid_meta
+- 数据变更时递增相应版本号
+- 用户变更时更新检索索引
+- 自定义字段变更时更新键值索引
+- SAML 应用变更时递增其版本号，IdP Server 据此重建
+- 应用、权限及用户权限变更时递增权限版本号
+'''
+from django.apps import apps
+from django.contrib.sites.models import Site
+from django.db.models.signals import post_save, post_delete
+
+from oneid_meta.generation import ORG_GENERATION, CONFIG_GENERATION, SAML_APP_GENERATION, PERM_GENERATION
+
+# 仅更新以下字段时不视为组织结构变更
+USER_ACTIVITY_FIELDS = {'last_active_time', 'last_login'}
+
+# 自定义字段的索引对象
+CUSTOM_DATA_OWNERS = {
+    'CustomUser': lambda instance: ('user', instance.user_id),
+    'CustomDept': lambda instance: ('dept', instance.dept_id),
+    'CustomGroup': lambda instance: ('group', instance.group_id),
+}
+
+
+def bump_org_generation(sender, update_fields=None, **kwargs):    # pylint: disable=unused-argument
+    '''
+    组织结构变更
+    '''
+    if update_fields and set(update_fields) <= USER_ACTIVITY_FIELDS:
+        return
+    ORG_GENERATION.bump()
+
+
+def refresh_user_search_index(sender, instance, update_fields=None, **kwargs):    # pylint: disable=unused-argument
+    '''
+    更新用户检索索引
+    '''
+    from oneid_meta.models import UserSearchToken    # pylint: disable=import-outside-toplevel
+    if update_fields and set(update_fields) <= USER_ACTIVITY_FIELDS:
+        return
+    UserSearchToken.refresh([instance])
+
+
+def refresh_custom_data_index(sender, instance, **kwargs):    # pylint: disable=unused-argument
+    '''
+    更新自定义字段键值索引
+    '''
+    from oneid_meta.models import CustomDataIndex    # pylint: disable=import-outside-toplevel
+    subject, owner_id = CUSTOM_DATA_OWNERS[sender.__name__](instance)
+    CustomDataIndex.refresh(subject, owner_id, instance.data)
+
+
+def remove_custom_data_index(sender, instance, **kwargs):    # pylint: disable=unused-argument
+    '''
+    删除自定义字段键值索引
+    '''
+    from oneid_meta.models import CustomDataIndex    # pylint: disable=import-outside-toplevel
+    subject, owner_id = CUSTOM_DATA_OWNERS[sender.__name__](instance)
+    CustomDataIndex.remove(subject, owner_id)
+
+
+def bump_config_generation(sender, **kwargs):    # pylint: disable=unused-argument
+    '''
+    配置变更
+    '''
+    CONFIG_GENERATION.bump()
+
+
+def bump_saml_app_generation(sender, **kwargs):    # pylint: disable=unused-argument
+    '''
+    SAML 应用变更
+    '''
+    SAML_APP_GENERATION.bump()
+
+
+def bump_perm_generation(sender, **kwargs):    # pylint: disable=unused-argument
+    '''
+    应用、权限或用户权限变更
+    '''
+    PERM_GENERATION.bump()
+
+
+def connect():    # pylint: disable=too-many-locals
+    '''
+    注册信号
+    '''
+    from oneid_meta.models import (    # pylint: disable=import-outside-toplevel
+        User, Dept, DeptMember, Group, GroupMember, ManagerGroup, CustomField, NativeField, I18NMobileConfig,
+        CustomUser, CustomDept, SAMLAPP, APP, Perm, UserPerm,
+    )
+    from oneid_meta.models.group import CustomGroup    # pylint: disable=import-outside-toplevel
+    from oneid_meta.models.config import SingletonConfigMixin    # pylint: disable=import-outside-toplevel
+
+    for sender in (User, Dept, DeptMember, Group, GroupMember, ManagerGroup):
+        post_save.connect(bump_org_generation, sender=sender, dispatch_uid=f'org_generation:{sender.__name__}:save')
+        post_delete.connect(bump_org_generation, sender=sender, dispatch_uid=f'org_generation:{sender.__name__}:delete')
+
+    post_save.connect(refresh_user_search_index, sender=User, dispatch_uid='user_search_index:save')
+
+    for sender in (CustomUser, CustomDept, CustomGroup):
+        post_save.connect(refresh_custom_data_index,
+                          sender=sender,
+                          dispatch_uid=f'custom_data_index:{sender.__name__}:save')
+        post_delete.connect(remove_custom_data_index,
+                            sender=sender,
+                            dispatch_uid=f'custom_data_index:{sender.__name__}:delete')
+
+    config_senders = [
+        model for model in apps.get_app_config('oneid_meta').get_models() if issubclass(model, SingletonConfigMixin)
+    ]
+    config_senders += [Site, CustomField, NativeField, I18NMobileConfig]
+    for sender in config_senders:
+        post_save.connect(bump_config_generation,
+                          sender=sender,
+                          dispatch_uid=f'config_generation:{sender.__name__}:save')
+        post_delete.connect(bump_config_generation,
+                            sender=sender,
+                            dispatch_uid=f'config_generation:{sender.__name__}:delete')
+
+    post_save.connect(bump_saml_app_generation, sender=SAMLAPP, dispatch_uid='saml_app_generation:save')
+    post_delete.connect(bump_saml_app_generation, sender=SAMLAPP, dispatch_uid='saml_app_generation:delete')
+
+    for sender in (APP, SAMLAPP, Perm, UserPerm):
+        post_save.connect(bump_perm_generation, sender=sender, dispatch_uid=f'perm_generation:{sender.__name__}:save')
+        post_delete.connect(bump_perm_generation,
+                            sender=sender,
+                            dispatch_uid=f'perm_generation:{sender.__name__}:delete')
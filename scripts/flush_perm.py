@@ -6,6 +6,7 @@ from django.db import connection
 
 from oneid_meta.models import User, Group, Dept
 from oneid_meta.models import GroupPerm, DeptPerm, UserPerm, Perm, GroupMember, DeptMember, APP
+from oneid_meta.generation import PERM_GENERATION
 from oneid.statistics import TimeCash
 from siteapi.v1.serializers.dept import DeptCash
 
@@ -167,6 +168,7 @@ def update_user_perm(user):
                                   owner=user).update(value=True)
     UserPerm.valid_objects.filter(Q(dept_perm_value=False) & Q(group_perm_value=False), status=0,
                                   owner=user).update(value=False)
+    PERM_GENERATION.bump()    # update() 不触发信号
 
 
 def flush_user_perm():
@@ -226,6 +228,7 @@ def flush_user_perm():
     UserPerm.valid_objects.filter(status=-1).update(value=False)
     UserPerm.valid_objects.filter(Q(dept_perm_value=True) | Q(group_perm_value=True), status=0).update(value=True)
     UserPerm.valid_objects.filter(Q(dept_perm_value=False) & Q(group_perm_value=False), status=0).update(value=False)
+    PERM_GENERATION.bump()    # update() 不触发信号
 
 
 if __name__ == '__main__':
@@ -1,58 +1,130 @@
 '''
 OneID中组和部门都有层级关系，而LDAP中的group无法原生实现。
 这里通过定期脚本，将子组中的成员添加到父组中，从而使得在查询中仍能提现出层级从属关系
+
+LDAP 中的节点一次读出，各节点的聚合成员由 RDB 中的直属成员在内存中自下而上算出，
+与读出的成员比对后只发送差异
 '''
 import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
-from ldap3 import LEVEL
+from django.conf import settings
+from ldap3 import SUBTREE
 
-from oneid_meta.models import Dept, Group
-from executer.utils.tree_node import dn_lrd_walker
+from oneid_meta.models import Dept, DeptMember, Group, GroupMember
 from executer.LDAP.client import FILTER_ALL
 
+# 每页读取的 entry 数
+PAGE_SIZE = 500
+
+CN_PATTERN = re.compile(r'^cn=([\w|_]+),')
+
 
-def get_member_from_children(conn, dn):
+def read_members(conn, base_dn):
     '''
-    返回下级dn的所有成员
-    下级是指dn路径上的下级
-    成员是指member属性
+    base_dn 及其下所有 entry 的成员
+    :rtype: dict {dn: set of member dn}
     '''
-    conn.search(dn, search_scope=LEVEL, search_filter=FILTER_ALL)
-    all_members = set()
-    for entry in conn.entries:
-        members = conn.get_members(entry.entry_dn)
-        all_members.update(members)
-    return all_members
+    entries = conn.extend.standard.paged_search(
+        search_base=base_dn,
+        search_filter=FILTER_ALL,
+        search_scope=SUBTREE,
+        attributes=['member'],
+        paged_size=PAGE_SIZE,
+        generator=True,
+    )
+    return {
+        entry['dn']: set(filter(None, entry['attributes'].get('member', [])))
+        for entry in entries if entry['type'] == 'searchResEntry'
+    }
 
 
-def aggregate_user_by_dn(conn, base_dn, cls):
+def get_direct_members(cls, member_cls):
     '''
-    从下往上聚合dn成员
+    RDB 中各节点的直属成员
+    :param cls: Dept 或 Group
+    :param member_cls: 对应的 DeptMember 或 GroupMember
+    :rtype: dict {uid: set of user dn}
+    '''
+    members = {uid: set() for uid in cls.valid_objects.values_list('uid', flat=True)}
+    relations = member_cls.valid_objects.filter(owner__is_del=False)
+    for uid, username in relations.values_list('owner__uid', 'user__username'):
+        members[uid].add('uid={},ou=people,{}'.format(username, settings.LDAP_BASE))
+    return members
+
+
+def compute_changes(current, direct_members):
+    '''
+    自下而上聚合成员
     LDAP当前节点成员 = LDAP下级节点成员之和 + RDB中查询得到的当前节点成员
+    RDB 中不存在的节点保持原样，其现有成员计入上级
+    :param dict current: {dn: 现有成员}
+    :param dict direct_members: {uid: 直属成员}
+    :rtype: list of (dn, 应有成员, 现有成员)
+    '''
+    children_members = defaultdict(set)
+    changes = []
+    for dn in sorted(current, key=lambda dn: dn.count(','), reverse=True):
+        members = current[dn]
+        result = CN_PATTERN.findall(dn)
+        if result and result[0] in direct_members:
+            members = children_members.pop(dn, set()) | direct_members[result[0]]
+            if members != current[dn]:
+                changes.append((dn, members, current[dn]))
+        parent_dn = dn.split(',', 1)[-1]
+        if parent_dn in current:
+            children_members[parent_dn] |= members
+    return changes
+
+
+def apply_changes(conn, changes):
+    '''
+    逐节点发送成员差异
     '''
-    for dn in dn_lrd_walker(conn, base_dn):
-        result = re.findall(r'^cn=([\w|_]+),', dn)
-        if not result:
-            continue
-        uid = result[0]
-        members = get_member_from_children(conn, dn)
+    for dn, members, exist in changes:
+        if members:
+            conn.modify_diff(dn, 'member', members - exist, exist - members)
+        else:
+            conn.modify_override(dn, 'member', '')
+
+
+def aggregate_user_by_dn(conn, base_dn, cls, member_cls, workers=1, connect=None):    # pylint: disable=too-many-arguments
+    '''
+    从下往上聚合dn成员
+    :param int workers: 大于 1 且提供 connect 时，按 base_dn 下的子树分组并发写入，每个子树取用一个连接
+    :param callable connect: 返回连接的上下文管理器，供并发写入使用，如 ConnectionPool.connection
+    :return: 修改的节点数
+    '''
+    changes = compute_changes(read_members(conn, base_dn), get_direct_members(cls, member_cls))
+
+    if workers <= 1 or connect is None:
+        apply_changes(conn, changes)
+        return len(changes)
 
-        self_members = [user.dn for user in cls.valid_objects.get(uid=uid).users]
+    subtrees = defaultdict(list)
+    for change in changes:
+        relative = change[0][:-len(base_dn)].rstrip(',')
+        subtrees[relative.rsplit(',', 1)[-1]].append(change)
 
-        members.update(self_members)
+    def apply_subtree(subtree_changes):
+        with connect() as subtree_conn:
+            apply_changes(subtree_conn, subtree_changes)
 
-        conn.modify_soft_override(dn, 'member', members)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(apply_subtree, subtrees.values()))
+    return len(changes)
 
 
-def aggregate_user_in_dept(conn, dept_base):
+def aggregate_user_in_dept(conn, dept_base, **kwargs):
     '''
     从下往上聚合部门成员并逐节点保存
     '''
-    return aggregate_user_by_dn(conn, base_dn=dept_base, cls=Dept)
+    return aggregate_user_by_dn(conn, base_dn=dept_base, cls=Dept, member_cls=DeptMember, **kwargs)
 
 
-def aggregate_user_in_group(conn, group_base):
+def aggregate_user_in_group(conn, group_base, **kwargs):
     '''
     从下往上聚合组成员并逐节点保存
     '''
-    return aggregate_user_by_dn(conn, base_dn=group_base, cls=Group)
+    return aggregate_user_by_dn(conn, base_dn=group_base, cls=Group, member_cls=GroupMember, **kwargs)
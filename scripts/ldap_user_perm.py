@@ -6,22 +6,58 @@ user的权限可以独立于组、部门另外自行设置
 即一方面可以通过group进行管理，也可以直接针对具体权限管理
 
 暂不打算将组、部门的权限通过LDAP暴露
+
+只有权限与上次写入时不同的用户才会写入LDAP，见 executer.LDAP.perm_digest
 '''
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import QuerySet
+from ldap3.core.exceptions import LDAPNoSuchObjectResult
 
 from oneid_meta.models import User, UserPerm
+from executer.LDAP.perm_digest import get_digest, load_digests, save_digests
+
+# 每批比对、写入的用户数
+BATCH_SIZE = 1000
 
 
-def flush_user_perm(conn, users=None):
+def flush_user_perm(conn, users=None):    # pylint: disable=too-many-locals
     '''
     LDAP中维护用户权限
+    没有任何权限的用户，清空其ou；LDAP中不存在的用户跳过
+    :return: 写入的用户数
     '''
     if users is None:
         users = User.valid_objects.all()
+    if isinstance(users, QuerySet):
+        usernames = list(users.values_list('id', 'username'))
+    else:
+        usernames = [(user.id, user.username) for user in users]
 
-    for user in users:
-        user_dn = user.dn
-        valid_perm_uids = UserPerm.valid_objects.filter(owner=user, value=True).values_list('perm__uid', flat=True)
-        if not valid_perm_uids:
-            continue
+    user_perms = defaultdict(set)
+    for owner_id, perm_uid in UserPerm.valid_objects.filter(owner__in=users, value=True).values_list(
+            'owner_id', 'perm__uid'):
+        user_perms[owner_id].add(perm_uid)
 
-        conn.modify_soft_override(user_dn, 'ou', valid_perm_uids)
+    flushed = 0
+    for i in range(0, len(usernames), BATCH_SIZE):
+        batch = usernames[i:i + BATCH_SIZE]
+        digests = load_digests([username for _, username in batch])
+        changed = {}
+        try:
+            for user_id, username in batch:
+                perm_uids = user_perms[user_id]
+                digest = get_digest(perm_uids)
+                if digests.get(username) == digest:
+                    continue
+                user_dn = 'uid={},ou=people,{}'.format(username, settings.LDAP_BASE)
+                try:
+                    conn.modify_override(user_dn, 'ou', sorted(perm_uids))
+                except LDAPNoSuchObjectResult:
+                    continue
+                changed[username] = digest
+        finally:
+            save_digests(changed)
+            flushed += len(changed)
+    return flushed
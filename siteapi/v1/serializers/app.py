@@ -51,6 +51,7 @@ class OAuthAPPSerializer(DynamicFieldsModelSerializer):
             'redirect_uris',
             'client_type',
             'authorization_grant_type',
+            'access_token_format',
             'more_detail',
         )
 
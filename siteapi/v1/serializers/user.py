@@ -90,9 +90,9 @@ class UserProfileSerializer(DynamicFieldsModelSerializer, IgnoreNoneMix):
         哪些字段可见
         '''
         if instance.is_intra:
-            return [field.key for field in NativeField.valid_objects.filter(subject='user', is_visible=True)]
+            return NativeField.get_visible_keys('user')
 
-        return [field.key for field in NativeField.valid_objects.filter(subject='extern_user', is_visible=True)]
+        return NativeField.get_visible_keys('extern_user')
 
     @staticmethod
     def get_depts(instance):
@@ -2,12 +2,19 @@
 tests for api about admin
 '''
 # pylint: disable=missing-docstring
+from unittest import mock
 
+from django.db import connection
+from django.test import override_settings
+from django.test.client import RequestFactory
 from django.urls import reverse
 from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
 
 from siteapi.v1.tests import TestCase
 from drf_expiring_authtoken.settings import token_settings
+from oneid.authentication import HeaderArkerBaseAuthentication
+from oneid_meta.models import User
 
 
 class AdminTestCase(TestCase):
@@ -58,3 +65,22 @@ class AdminTestCase(TestCase):
         header = {'HTTP_ARKER': 'oneid_broker'}
         res = self.anonymous.get(reverse('siteapi:dept_tree', args=('root', )), **header)
         self.assertEqual(res.status_code, 200)
+
+    @override_settings(CREDIBLE_ARKERS={'oneid_broker': 'admin', 'msghub': 'msghub'})
+    def test_header_arker_principal(self):
+        request = RequestFactory().get('/', HTTP_ARKER='msghub')
+        with self.assertRaises(AuthenticationFailed):
+            HeaderArkerBaseAuthentication.get_user(request)
+
+        User.objects.create(username='msghub', name='msghub')
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(HeaderArkerBaseAuthentication.get_user(request).username, 'msghub')
+            with self.assertNumQueries(0):
+                self.assertEqual(HeaderArkerBaseAuthentication.get_user(request).username, 'msghub')
+
+        header = {'HTTP_ARKER': 'oneid_broker'}
+        res = self.anonymous.get(reverse('siteapi:dept_tree', args=('root', )), **header)
+        self.assertEqual(res.status_code, 200)
+        header = {'HTTP_ARKER': 'noah'}
+        res = self.anonymous.get(reverse('siteapi:dept_tree', args=('root', )), **header)
+        self.assertEqual(res.status_code, 401)
@@ -2,15 +2,44 @@
 tests for api about app
 '''
 # pylint: disable=missing-docstring
+import json
 import os
+import shutil
+import tempfile
+import time
+import unittest
+from io import StringIO
 from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory
 from django.urls import reverse
+from django.utils import timezone
+from Cryptodome.PublicKey import RSA
+from oauth2_provider import application_cache, jwt_tokens, token_cache
+from oauth2_provider.models import Application, AccessToken, OidcRsaKey, Grant, get_expired_targets
+from drf_expiring_authtoken.cache import token_cache as drf_token_cache
+from drf_expiring_authtoken.models import ExpiringToken
+from common.django.cleanup import CleanupTarget
+from oauth2_provider.keyring import key_ring
+from oauth2_provider.oauth2_validators import OAuth2Validator
+from oauth2_provider.views import IntrospectTokenView
 from djangosaml2idp.scripts.idpinit import run
+from django.core.exceptions import ImproperlyConfigured
+from saml2 import class_name, saml
+from saml2.sigver import CryptoBackendXmlSec1, SignatureError, pre_signature_part
+from saml2.time_util import instant
+from djangosaml2idp.crypto import BACKEND_PYTHON_XMLSEC, CryptoBackendPythonXmlSec, xmlsec
+from djangosaml2idp import idpserver
+from djangosaml2idp.idpserver import idp_server_cache
+from djangosaml2idp.processors import BaseProcessor, get_spauthn_token
 
 from siteapi.v1.tests import TestCase
 from oneid_meta.models import (
     APP,
     OAuthAPP,
+    SAMLAPP,
     Perm,
     User,
     UserPerm,
@@ -66,6 +95,7 @@ APP_2_EXCEPT = {
         'redirect_uris': 'http://localhost/callback',
         'client_type': 'confidential',
         'authorization_grant_type': 'authorization-code',
+        'access_token_format': 'opaque',
         'more_detail': [],
     },
     'oidc_app': None,
@@ -256,6 +286,7 @@ class APPTestCase(TestCase):
                 'redirect_uris': 'http://localhost/callback',
                 'client_type': 'confidential',
                 'authorization_grant_type': 'authorization-code',
+                'access_token_format': 'opaque',
                 'more_detail': [],
             },
             'oidc_app': None,
@@ -477,3 +508,285 @@ class APPTestCase(TestCase):
     def test_create_app_empty_name(self):
         res = self.client.json_post(reverse('siteapi:app_list'), data={'name': '  '})
         self.assertEqual(res.json(), {"name": ["This field may not be blank."]})
+
+
+class AccessTokenCacheTestCase(TestCase):
+    def test_validate_bearer_token_cached(self):
+        application = Application.objects.create(name='demo',
+                                                 client_type=Application.CLIENT_CONFIDENTIAL,
+                                                 authorization_grant_type=Application.GRANT_AUTHORIZATION_CODE)
+        AccessToken.objects.create(user=self.user,
+                                   application=application,
+                                   token='bearer-token',
+                                   scope='read',
+                                   expires=timezone.now() + timezone.timedelta(hours=1))
+        validator = OAuth2Validator()
+        request = mock.Mock(uri='http://testserver/oauth/userinfo/')
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertTrue(validator.validate_bearer_token('bearer-token', ['read'], request))
+            self.assertTrue(validator.validate_bearer_token('bearer-token', ['read'], request))
+            # 用户不进入缓存，按主键读取
+            with self.assertNumQueries(1):
+                self.assertTrue(validator.validate_bearer_token('bearer-token', ['read'], request))
+                self.assertEqual(request.user, self.user)
+                self.assertEqual(request.client.client_secret, application.client_secret)
+            self.assertNotIn(application.client_secret, str(cache.get(token_cache._cache_key(AccessToken, 'bearer-token'))))    # pylint: disable=protected-access
+            self.assertFalse(validator.validate_bearer_token('unknown', ['read'], request))
+            with self.assertNumQueries(0):
+                self.assertFalse(validator.validate_bearer_token('unknown', ['read'], request))
+
+        self.user.save()
+        self.assertIsNone(cache.get(token_cache._cache_key(AccessToken, 'bearer-token')))    # pylint: disable=protected-access
+
+        validator.revoke_token('bearer-token', 'access_token', request)
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertFalse(validator.validate_bearer_token('bearer-token', ['read'], request))
+
+
+class KeyRingTestCase(TestCase):
+    def test_jwks(self):
+        rsa_key = OidcRsaKey.objects.create(key=RSA.generate(1024).exportKey('PEM').decode('utf8'))
+        self.assertEqual([key.kid for key in key_ring.get_signing_keys()], [rsa_key.kid])
+        with self.assertNumQueries(0):
+            self.assertEqual(key_ring.get_key(rsa_key.kid).kid, rsa_key.kid)
+
+        res = self.anonymous.get(reverse('oauth2_provider:oidc_provider:oidc_jwks'))
+        self.assertEqual([key['kid'] for key in res.json()['keys']], [rsa_key.kid])
+        self.assertIn('max-age', res['Cache-Control'])
+        res = self.anonymous.get(reverse('oauth2_provider:oidc_provider:oidc_jwks'), HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, 304)
+
+        rsa_key.delete()
+        self.assertEqual(key_ring.get_signing_keys(), [])
+        res = self.anonymous.get(reverse('oauth2_provider:oidc_provider:oidc_jwks'))
+        self.assertEqual(res.json(), {'keys': []})
+
+
+class JWTAccessTokenTestCase(TestCase):
+    def test_jwt_access_token(self):
+        OidcRsaKey.objects.create(key=RSA.generate(1024).exportKey('PEM').decode('utf8'))
+        application = Application.objects.create(name='demo',
+                                                 client_type=Application.CLIENT_CONFIDENTIAL,
+                                                 authorization_grant_type=Application.GRANT_CLIENT_CREDENTIALS,
+                                                 access_token_format=Application.ACCESS_TOKEN_JWT)
+        res = self.anonymous.post(reverse('oauth2_provider:token'),
+                                  data={
+                                      'grant_type': 'client_credentials',
+                                      'client_id': application.client_id,
+                                      'client_secret': application.client_secret,
+                                  })
+        token = res.json()['access_token']
+        claims = jwt_tokens.decode(token)
+        self.assertEqual(claims['client_id'], application.client_id)
+        self.assertEqual(AccessToken.objects.get(application=application).token, claims['jti'])
+
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            IntrospectTokenView.get_token_response(token)
+            with self.assertNumQueries(0):
+                res = IntrospectTokenView.get_token_response(token)
+        self.assertEqual(json.loads(res.content)['client_id'], application.client_id)
+        self.assertTrue(json.loads(res.content)['active'])
+
+        validator = OAuth2Validator()
+        request = mock.Mock(uri='http://testserver/oauth/userinfo/')
+        self.assertTrue(validator.validate_bearer_token(token, ['read'], request))
+        self.assertEqual(request.client, application)
+
+        validator.revoke_token(token, 'access_token', request)
+        self.assertFalse(AccessToken.objects.filter(application=application).exists())
+        self.assertFalse(validator.validate_bearer_token(token, ['read'], request))
+        # 撤销以数据库为准，缓存清空后仍然有效
+        cache.clear()
+        self.assertFalse(validator.validate_bearer_token(token, ['read'], request))
+        res = IntrospectTokenView.get_token_response(token)
+        self.assertFalse(json.loads(res.content)['active'])
+        res = IntrospectTokenView.get_token_response(token[:-4] + 'abcd')
+        self.assertEqual(res.status_code, 401)
+
+
+class ClearTokensTestCase(TestCase):
+    def test_cleartokens(self):
+        application = Application.objects.create(name='demo',
+                                                 client_type=Application.CLIENT_CONFIDENTIAL,
+                                                 authorization_grant_type=Application.GRANT_AUTHORIZATION_CODE)
+        now = timezone.now()
+        for index in range(5):
+            AccessToken.objects.create(application=application,
+                                       token=f'expired-{index}',
+                                       expires=now - timezone.timedelta(hours=1))
+        AccessToken.objects.create(application=application, token='valid', expires=now + timezone.timedelta(hours=1))
+        Grant.objects.create(application=application,
+                             user=self.user,
+                             code='code',
+                             redirect_uri='http://localhost/callback',
+                             expires=now - timezone.timedelta(hours=1))
+        ExpiringToken.objects.filter(user=self.user).update(created=now - timezone.timedelta(days=365))
+
+        target = [target for target in get_expired_targets() if target.name == 'access_token'][0]
+        self.assertEqual(target.run(batch_size=2, deadline=time.monotonic()), (0, False))
+
+        out = StringIO()
+        call_command('cleartokens', batch_size=2, stdout=out)
+        self.assertIn('access_token: 5 deleted\n', out.getvalue())
+        self.assertIn('grant: 1 deleted\n', out.getvalue())
+        self.assertIn('expiring_token: 1 deleted\n', out.getvalue())
+        self.assertEqual(list(AccessToken.objects.values_list('token', flat=True)), ['valid'])
+        self.assertFalse(Grant.objects.exists())
+        self.assertFalse(ExpiringToken.objects.filter(user=self.user).exists())
+
+    def test_cleartokens_queries_per_batch(self):
+        application = Application.objects.create(name='demo',
+                                                 client_type=Application.CLIENT_CONFIDENTIAL,
+                                                 authorization_grant_type=Application.GRANT_AUTHORIZATION_CODE)
+        expires = timezone.now() - timezone.timedelta(hours=1)
+        for index in range(6):
+            AccessToken.objects.create(application=application, token=f'expired-{index}', expires=expires)
+        target = [target for target in get_expired_targets() if target.name == 'access_token'][0]
+        with self.assertNumQueries(9) as context:
+            self.assertEqual(target.run(batch_size=3, resume=False), (6, True))
+        # 每批: 查询主键、savepoint、一条 DELETE、释放 savepoint
+        self.assertEqual(len([query for query in context.captured_queries if query['sql'].startswith('DELETE')]), 2)
+        self.assertFalse(AccessToken.objects.exists())
+
+        key = self.user.auth_token.key
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertIsNotNone(drf_token_cache.get_or_load(key, lambda: {'user_id': self.user.id}))
+        ExpiringToken.objects.filter(key=key).update(created=timezone.now() - timezone.timedelta(days=365))
+        target = CleanupTarget('expiring_token', ExpiringToken.get_expired, raw=True,
+                               invalidate=lambda keys: drf_token_cache.invalidate(*keys))
+        with self.assertNumQueries(5):
+            self.assertEqual(target.run(batch_size=3, resume=False), (1, True))
+        self.assertIsNone(cache.get(drf_token_cache.KEY_PREFIX + key))
+
+
+class ApplicationCacheTestCase(TestCase):
+    def test_load_application_cached(self):
+        application = Application.objects.create(name='demo',
+                                                 client_type=Application.CLIENT_CONFIDENTIAL,
+                                                 authorization_grant_type=Application.GRANT_AUTHORIZATION_CODE)
+        validator = OAuth2Validator()
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            request = mock.Mock(client=None, scopes=None)
+            self.assertEqual(validator._load_application(application.client_id, request), application)    # pylint: disable=protected-access
+            with self.assertNumQueries(0):
+                request = mock.Mock(client=None, scopes=['read'])
+                self.assertEqual(validator._load_application(application.client_id, request), application)    # pylint: disable=protected-access
+                request.client.name = 'changed'
+            self.assertIsNone(application_cache.get_application(Application, 'unknown'))
+            with self.assertNumQueries(0):
+                self.assertIsNone(application_cache.get_application(Application, 'unknown'))
+                self.assertEqual(application_cache.get_application(Application, application.client_id).name, 'demo')
+
+        OAuthAPP.objects.filter(pk=application.pk).first().delete()
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertIsNone(application_cache.get_application(Application, application.client_id))
+
+
+class IdPServerCacheTestCase(TestCase):
+    def test_idp_server_cached(self):
+        run()
+        server = idp_server_cache.get()
+        self.assertIs(idp_server_cache.get(), server)
+
+        SAMLAPP.objects.create(entity_id='http://localhost/sp/saml')
+        rebuilt = idp_server_cache.get()
+        self.assertIsNot(rebuilt, server)
+        self.assertIs(idp_server_cache.get(), rebuilt)
+
+        with tempfile.TemporaryDirectory() as certificates_dir:
+            key_file = shutil.copy2(idpserver.KEY_FILE, certificates_dir)
+            cert_file = shutil.copy2(idpserver.CERT_FILE, certificates_dir)
+            with mock.patch.object(idpserver, 'KEY_FILE', key_file), \
+                    mock.patch.object(idpserver, 'CERT_FILE', cert_file):
+                copied = idp_server_cache.get()
+                self.assertIsNot(copied, rebuilt)
+                self.assertIs(idp_server_cache.get(), copied)
+
+                stat = os.stat(cert_file)
+                os.utime(cert_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+                self.assertIsNot(idp_server_cache.get(), copied)
+        idp_server_cache.clear()
+
+    def test_crypto_backend(self):
+        run()
+        idp_server_cache.clear()
+        self.assertIsInstance(idp_server_cache.get().sec.crypto, CryptoBackendXmlSec1)
+        self.assertNotIsInstance(idp_server_cache.get().sec.crypto, CryptoBackendPythonXmlSec)
+
+        idp_server_cache.clear()
+        with self.settings(SAML_CRYPTO_BACKEND='unknown'):
+            with self.assertRaises(ImproperlyConfigured):
+                idp_server_cache.get()
+
+        idp_server_cache.clear()
+        with self.settings(SAML_CRYPTO_BACKEND=BACKEND_PYTHON_XMLSEC):
+            if xmlsec is None:
+                with self.assertRaises(ImproperlyConfigured):
+                    idp_server_cache.get()
+            else:
+                self.assertIsInstance(idp_server_cache.get().sec.crypto, CryptoBackendPythonXmlSec)
+        idp_server_cache.clear()
+
+    @unittest.skipIf(xmlsec is None, 'python-xmlsec is not installed')
+    def test_python_xmlsec_signature(self):
+        run()
+        idp_server_cache.clear()
+        with self.settings(SAML_CRYPTO_BACKEND=BACKEND_PYTHON_XMLSEC):
+            server = idp_server_cache.get()
+        idp_server_cache.clear()
+        self.assertIsInstance(server.sec.crypto, CryptoBackendPythonXmlSec)
+
+        assertion = saml.Assertion(id='id-assertion',
+                                   version='2.0',
+                                   issue_instant=instant(),
+                                   issuer=saml.Issuer(text=server.config.entityid))
+        assertion.signature = pre_signature_part('id-assertion', server.sec.my_cert, 1)
+        node_name = class_name(assertion)
+        signed = server.sec.sign_statement(str(assertion), node_name, node_id='id-assertion')
+
+        server.sec.crypto = CryptoBackendXmlSec1(server.config.xmlsec_binary)
+        self.assertTrue(server.sec.verify_signature(signed, node_name=node_name, node_id='id-assertion'))
+        tampered = signed.replace(server.config.entityid, 'http://localhost/other')
+        with self.assertRaises(SignatureError):
+            server.sec.verify_signature(tampered, node_name=node_name, node_id='id-assertion')
+
+
+class SAMLAccessTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        app = APP.objects.create(uid='saml_demo', name='saml_demo')
+        SAMLAPP.objects.create(app=app, entity_id='http://localhost/sp/saml')
+        self.perm = app.access_perm
+        self.employee = User.objects.create(username='employee')
+        self.token = ExpiringToken.objects.create(user=self.employee)
+
+    def get_request(self, key):
+        request = RequestFactory().get('/saml/sso/post/')
+        request.COOKIES['spauthn'] = key
+        return request
+
+    def test_has_access(self):
+        processor = BaseProcessor('http://localhost/sp/saml')
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertFalse(processor.has_access(self.get_request(self.token.key)))
+            with self.assertNumQueries(0):
+                self.assertFalse(processor.has_access(self.get_request(self.token.key)))
+
+        UserPerm.get(self.employee, self.perm).permit()
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertTrue(processor.has_access(self.get_request(self.token.key)))
+            with self.assertNumQueries(0):
+                self.assertTrue(processor.has_access(self.get_request(self.token.key)))
+            self.assertFalse(BaseProcessor('http://localhost/sp/unknown').has_access(self.get_request(self.token.key)))
+            self.assertFalse(processor.has_access(self.get_request('unknown')))
+            self.assertTrue(processor.has_access(self.get_request(ExpiringToken.objects.get(user=self.user).key)))
+
+        UserPerm.get(self.employee, self.perm).reject()
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertFalse(processor.has_access(self.get_request(self.token.key)))
+
+    def test_token_resolved_once(self):
+        request = self.get_request(self.token.key)
+        self.assertEqual(get_spauthn_token(request).user, self.employee)
+        with self.assertNumQueries(0):
+            self.assertIs(get_spauthn_token(request), get_spauthn_token(request))
@@ -2,6 +2,7 @@
 
 from unittest import mock
 
+from django.db import connection
 from django.urls import reverse
 from rest_framework.status import HTTP_200_OK
 from siteapi.v1.tests import TestCase
@@ -367,6 +368,23 @@ class ConfigTestCase(TestCase):
         self.assertEqual(expect, res.json()['account_config'])
 
 
+class SingletonConfigCacheTestCase(TestCase):
+    def test_get_current_cached(self):
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            config = SMSConfig.get_current()
+            SMSConfig.valid_objects.filter(id=config.id).update(signature='stale')
+            with self.assertNumQueries(0):
+                self.assertEqual(SMSConfig.get_current().signature, config.signature)
+
+            config.signature = 'fresh'
+            config.save()
+            self.assertEqual(SMSConfig.get_current().signature, 'fresh')
+
+            cached = SMSConfig.get_current()
+            cached.signature = 'modified'
+            self.assertEqual(SMSConfig.get_current().signature, 'fresh')
+
+
 class ConfigAlterAdminTestCase(TestCase):
     @mock.patch("infrastructure.serializers.sms.SMSClaimSerializer.check_sms_token")
     def test_alter_admin(self, mock_sms_token):
@@ -441,6 +459,19 @@ class ConfigCustomFieldTestCase(TestCase):
         self.assertFalse(res.json()['is_visible'])
 
 
+    def test_custom_field_list_cache(self):
+        field = CustomField.valid_objects.create(name='忌口', subject='user')
+        url = reverse("siteapi:custom_field_list", args=('user', ))
+        self.assertEqual(self.client.get(url).json()[0]['name'], '忌口')
+
+        CustomField.valid_objects.filter(uuid=field.uuid).update(name='爱好')    # 绕过 save，缓存不失效
+        self.assertEqual(self.client.get(url).json()[0]['name'], '忌口')
+
+        field.name = '爱好'
+        field.save()
+        self.assertEqual(self.client.get(url).json()[0]['name'], '爱好')
+
+
 class ConfigNativeFieldTestCase(TestCase):
     def test_native_field(self):
         res = self.client.json_post(reverse('siteapi:native_field_list', args=('user', )), data={'name': '职位'})
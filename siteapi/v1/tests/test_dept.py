@@ -5,7 +5,7 @@ tests for api about dept
 from django.urls import reverse
 
 from siteapi.v1.tests import TestCase
-from oneid_meta.models import Dept, User, DeptMember
+from oneid_meta.models import Dept, User, DeptMember, CustomDept
 
 
 class DeptTestCase(TestCase):
@@ -98,6 +98,33 @@ class DeptTestCase(TestCase):
         }
         self.assertEqual(res.json(), expect)
 
+    def test_get_dept_list_by_custom(self):
+        level_1 = Dept.valid_objects.get(uid='level_1')
+        custom_dept = CustomDept.objects.create(dept=level_1, data={'cost_center': 'CC01', 'grade': '3'})
+        res = self.client.get(reverse('siteapi:dept_list'), data={'cost_center__custom': 'CC01'})
+        self.assertEqual([item['uid'] for item in res.json()['results']], ['level_1'])
+        res = self.client.get(reverse('siteapi:dept_list'), data={'grade__gt__custom': '10'})
+        self.assertEqual(res.json()['count'], 0)
+
+        custom_dept.data = {'cost_center': 'CC02', 'grade': '12'}
+        custom_dept.save()
+        res = self.client.get(reverse('siteapi:dept_list'), data={'cost_center__custom': 'CC01'})
+        self.assertEqual(res.json()['count'], 0)
+        res = self.client.get(reverse('siteapi:dept_list'), data={'grade__gt__custom': '10'})
+        self.assertEqual(res.json()['count'], 1)
+
+        remark = 'r' * 300
+        custom_dept.data = {'remark': remark, 'tags': ['a', 'b']}
+        custom_dept.save()
+        res = self.client.get(reverse('siteapi:dept_list'), data={'remark__custom': remark})
+        self.assertEqual(res.json()['count'], 1)
+        res = self.client.get(reverse('siteapi:dept_list'), data={'remark__custom': remark[:255]})
+        self.assertEqual(res.json()['count'], 0)
+        res = self.client.get(reverse('siteapi:dept_list'), data={'tags__custom': '["a", "b"]'})
+        self.assertEqual(res.json()['count'], 1)
+        res = self.client.get(reverse('siteapi:dept_list'), data={'k' * 65 + '__custom': 'v'})
+        self.assertEqual(res.status_code, 400)
+
     def test_get_dept_tree(self):
         res = self.client.get(
             reverse('siteapi:dept_tree', args=('root',)), data={'user_required': True}
@@ -3,6 +3,7 @@
 test for api about node
 '''
 from django.urls import reverse
+from django.utils.http import http_date
 
 from siteapi.v1.tests import TestCase
 from oneid_meta.models import (
@@ -135,6 +136,32 @@ class NodeTestCase(TestCase):
         }
         self.assertEqual(res.json(), expect)
 
+    def test_get_node_tree_not_modified(self):
+        url = reverse('siteapi:node_tree', args=('d_level_1', ))
+        res = self.client.get(url)
+        etag = res['ETag']
+        # 仅以 ETag 校验，Last-Modified 精度为秒且不区分请求者
+        self.assertNotIn('Last-Modified', res)
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(res.status_code, 200)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res['ETag'], etag)
+
+        res = self.client.get(reverse('siteapi:dept_tree', args=('level_1', )), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+
+        Dept.valid_objects.create(uid='level_2-3', name='level_2-3', parent=Dept.valid_objects.get(uid='level_1'))
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(len(res.json()['nodes']), 3)
+
+        employee = self.login_as(User.valid_objects.get(username='employee'))
+        res = employee.get(reverse('siteapi:ucenter_node_tree', args=('d_level_1', )), HTTP_IF_NONE_MATCH=etag)
+        self.assertNotEqual(res.status_code, 304)
+
     def test_get_node_child_node(self):
         res = self.client.get(reverse('siteapi:node_child_node', args=('g_role_group_1', )))
         expect = {
@@ -0,0 +1,96 @@
+'''
+tests for api about statistics
+'''
+# pylint: disable=missing-docstring
+import datetime
+from unittest import mock
+
+from django.urls import reverse
+
+from siteapi.v1.tests import TestCase
+from oneid_meta.models import User
+from oneid.activity import ActivityTracker, PENDING_KEY, FLUSHING_KEY
+
+
+class ActivityTrackerTestCase(TestCase):
+    def test_track(self):
+        conn = mock.MagicMock()
+        user = User.objects.create(username='employee', name='employee')
+        ActivityTracker(conn).track(user, now=self.now)
+
+        conn.pipeline.assert_called_once_with(transaction=False)
+        pipe = conn.pipeline.return_value
+        pipe.hincrby.assert_called_once_with('active-2019-01-01', user.id, 1)
+        self.assertEqual(pipe.pfadd.call_count, 4)
+        pipe.hset.assert_called_once_with(PENDING_KEY, user.id, self.now.timestamp())
+        pipe.execute.assert_called_once_with()
+
+    def test_flush(self):
+        conn = mock.MagicMock()
+        conn.exists.return_value = False
+        user = User.objects.create(username='employee', name='employee')
+        conn.hgetall.return_value = {str(user.id): str(self.now.timestamp())}
+
+        self.assertEqual(ActivityTracker(conn).flush(), 1)
+        conn.rename.assert_called_once_with(PENDING_KEY, FLUSHING_KEY)
+        conn.delete.assert_called_once_with(FLUSHING_KEY)
+        user.refresh_from_db()
+        self.assertEqual(user.last_active_time, self.now.astimezone(datetime.timezone.utc))
+
+
+class ActivityStatisticTestCase(TestCase):
+    mock_now = True
+
+    def test_get_activity_statistic(self):
+        conn = mock.MagicMock()
+        pipe = conn.pipeline.return_value
+        pipe.execute.return_value = [
+            2, {'user_login': '3'}, {'3': '1'},
+            1, {}, {},
+            3,
+        ]
+        with mock.patch('oneid.activity.activity_tracker._conn', conn):
+            res = self.client.get(reverse('siteapi:activity_statistic'), {
+                'start': '2019-01-01',
+                'end': '2019-01-02',
+            })
+        self.assertEqual(res.status_code, 200)
+        res = res.json()
+        self.assertEqual(res['active_count'], 3)
+        self.assertEqual(res['results'], [
+            {
+                'time': '2019-01-01',
+                'active_count': 2,
+                'logins': {
+                    'user_login': 3
+                },
+                'registers': {
+                    '3': 1
+                },
+            },
+            {
+                'time': '2019-01-02',
+                'active_count': 1,
+                'logins': {},
+                'registers': {},
+            },
+        ])
+        pipe.pfcount.assert_called_with('oneid:activity:active:day:2019-01-01', 'oneid:activity:active:day:2019-01-02')
+
+        res = self.client.get(reverse('siteapi:activity_statistic'), {'period': 'year'})
+        self.assertEqual(res.status_code, 400)
+        res = self.client.get(reverse('siteapi:activity_statistic'), {'period': 'hour', 'start': '2018-01-01'})
+        self.assertEqual(res.status_code, 400)
+        res = self.client.get(reverse('siteapi:activity_statistic'), {'start': '2018-12-31', 'end': '2020-13-45T00:00'})
+        self.assertEqual(res.json(), {'end': ['invalid']})
+        with mock.patch('oneid.activity.activity_tracker._conn', conn):
+            res = self.client.get(reverse('siteapi:activity_statistic'), {'period': 'month', 'start': '2018-12-01'})
+        self.assertEqual([item['time'] for item in res.json()['results']], ['2018-12', '2019-01'])
+        res = self.client.get(reverse('siteapi:activity_statistic'), {'period': 'month', 'start': '2018-11-01'})
+        self.assertEqual(res.json(), {'start': ['data expired']})
+        res = self.client.get(reverse('siteapi:activity_statistic'), {
+            'period': 'hour',
+            'start': '2018-12-31',
+            'end': '2019-02-01',
+        })
+        self.assertEqual(res.json(), {'start': ['range is too large']})
@@ -5,7 +5,10 @@ tests for api about ucenter
 
 from unittest import mock
 
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
 from common.django.drf.client import APIClient
 
 from siteapi.v1.tests import TestCase
@@ -25,6 +28,8 @@ from oneid_meta.models import (
     OAuthAPP,
 )
 from executer.utils.password import verify_password
+from oneid.authentication import CustomExpiringTokenAuthentication
+from drf_expiring_authtoken.cache import token_cache
 
 MAX_APP_ID = 2
 
@@ -361,6 +366,41 @@ class UCenterTestCase(TestCase):
         res2 = client.get(reverse('siteapi:ucenter_profile'))
         self.assertEqual(res2.status_code, 401)
 
+    def test_token_cache(self):
+        user = User.objects.create(username='employee', name='employee')
+        key = user.token
+        auth = CustomExpiringTokenAuthentication()
+        other_key = User.objects.create(username='other').token
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(auth.authenticate_credentials(key)[0].username, 'employee')
+            auth.authenticate_credentials(other_key)
+            # token 命中缓存，用户由缓存的快照重建
+            with self.assertNumQueries(0):
+                self.assertEqual(auth.authenticate_credentials(key)[0].username, 'employee')
+            # 敏感字段不写入缓存，访问时读取
+            with self.assertNumQueries(1):
+                self.assertEqual(auth.authenticate_credentials(key)[0].password, user.password)
+        entry = cache.get(token_cache.KEY_PREFIX + key)
+        self.assertEqual(set(entry), {'created', 'user'})
+        self.assertEqual(entry['user']['username'], 'employee')
+        self.assertNotIn('password', entry['user'])
+        self.assertNotIn('private_email', entry['user'])
+        self.assertNotIn('last_active_time', entry['user'])
+
+        new_key = user.refresh_token().key
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            with self.assertRaisesMessage(AuthenticationFailed, 'Invalid token'):
+                auth.authenticate_credentials(key)
+            self.assertEqual(auth.authenticate_credentials(new_key)[0].username, 'employee')
+            with self.assertNumQueries(0):
+                auth.authenticate_credentials(other_key)
+
+        user.is_active = False
+        user.save()
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            with self.assertRaisesMessage(AuthenticationFailed, 'User inactive or deleted'):
+                auth.authenticate_credentials(new_key)
+
 
 class UcenterCustomProfileTestCase(TestCase):
     def test_custom_profile(self):
@@ -2,15 +2,20 @@
 tests for api about user
 '''
 # pylint: disable=missing-docstring, too-many-lines
+import importlib
 import json
 import time
-import unittest
 import random
+from unittest import mock
+from django.apps import apps as django_apps
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.urls import reverse
 
 from siteapi.v1.tests import TestCase
 from oneid_meta.models import (DingUser, PosixUser, Group, Dept, User, CustomField, DeptMember, Perm, UserPerm,
-                               WechatUser, QQUser, AlipayUser)
+                               WechatUser, QQUser, AlipayUser, CustomUser, GroupMember, UserSearchText, UserSearchToken,
+                               CustomDataIndex)
 
 EMPLOYEE = {
     'user_id':
@@ -94,9 +99,6 @@ USER_DATA = {
     },
 }
 
-SKIP_GET_USER_LIST__CUSTOM = True
-
-
 class UserTestCase(TestCase):
     mock_now = True
 
@@ -163,6 +165,52 @@ class UserTestCase(TestCase):
         res = client.get(reverse('siteapi:user_list'), data={'keyword': '188', 'wechat_unionid': 'unionid-2'})
         self.assertEqual(0, res.json()['count'])
 
+    def test_query_userlist_by_keyword(self):
+        '''关键字检索用户'''
+        User.objects.create(username='zhangsan', name='张三丰', mobile='18812345678', email='Zhang@Example.com')
+        client = self.client
+        for keyword, expect_count in (('zsf', 1), ('zhangsanfeng', 1), ('三丰', 1), ('EXAMPLE.COM', 1),
+                                      ('12345678', 1), ('zhangsx', 0), ('三丰丰', 0)):
+            res = client.get(reverse('siteapi:user_list'), data={'keyword': keyword})
+            self.assertEqual(expect_count, len(res.json()['results']), keyword)
+
+        user = User.valid_objects.get(username='zhangsan')
+        user.name = '李四'
+        user.save()
+        res = client.get(reverse('siteapi:user_list'), data={'keyword': 'zsf'})
+        self.assertEqual(0, len(res.json()['results']))
+        res = client.get(reverse('siteapi:user_list'), data={'keyword': 'ls'})
+        self.assertEqual(1, len(res.json()['results']))
+
+    def test_search_index_migration(self):
+        '''迁移中建立的检索索引与信号维护的一致'''
+        migration = importlib.import_module('oneid_meta.migrations.0082_user_search_index')
+        User.objects.create(username='zhangsan', name='张三丰', mobile='18812345678', email='Zhang@Example.com')
+        expect_tokens = sorted(UserSearchToken.objects.values_list('user_id', 'token'))
+        expect_texts = dict(UserSearchText.objects.values_list('user_id', 'content'))
+        UserSearchToken.objects.all().delete()
+        UserSearchText.objects.all().delete()
+
+        with mock.patch.object(migration, 'BATCH_SIZE', 10):
+            migration.build_user_search_index(django_apps, None)
+        self.assertEqual(sorted(UserSearchToken.objects.values_list('user_id', 'token')), expect_tokens)
+        self.assertEqual(dict(UserSearchText.objects.values_list('user_id', 'content')), expect_texts)
+
+    def test_custom_index_migration(self):
+        '''迁移中建立的自定义字段索引与信号维护的一致'''
+        migration = importlib.import_module('oneid_meta.migrations.0083_customdataindex')
+        for index in range(3):
+            user = User.objects.create(username=f'custom{index}')
+            CustomUser.objects.create(user=user, data={'age': str(18 + index), 'tags': ['a', index], 'k' * 65: 'long'})
+        fields = ('subject', 'owner_id', 'key', 'value_str', 'value_num')
+        expect = sorted(CustomDataIndex.objects.values_list(*fields))
+        self.assertTrue(expect)
+        CustomDataIndex.objects.all().delete()
+
+        with mock.patch.object(migration, 'BATCH_SIZE', 4):
+            migration.build_custom_data_index(django_apps, None)
+        self.assertEqual(sorted(CustomDataIndex.objects.values_list(*fields)), expect)
+
     def test_username(self):
         res = self.client.json_post(reverse('siteapi:user_list'),
                                     data={
@@ -256,7 +304,6 @@ class UserTestCase(TestCase):
         }
         self.assertEqual(res.json(), expect)
 
-    @unittest.skipIf(SKIP_GET_USER_LIST__CUSTOM, '使用mysql对接测试')
     def test_get_user_list__custom(self):
         """测试用户自定义字段检索"""
         user1_data = {
@@ -318,6 +365,11 @@ class UserTestCase(TestCase):
         self.assertEqual(res.json()['count'], 1)
         res = self.client.get(reverse('siteapi:user_list'), {'age__lt__custom': 19})
         self.assertEqual(res.json()['count'], 1)
+        # 数值按数值比较
+        res = self.client.get(reverse('siteapi:user_list'), {'age__lt__custom': 9})
+        self.assertEqual(res.json()['count'], 0)
+        res = self.client.get(reverse('siteapi:user_list'), {'sex__custom': 'male', 'age__gte__custom': 18})
+        self.assertEqual(res.json()['count'], 1)
 
     # pylint:disable=too-many-locals
     # pylint:disable=invalid-name
@@ -538,6 +590,23 @@ class UserTestCase(TestCase):
         res = self.client.get(reverse('siteapi:user_detail', args=('employee1', ))).json()
         self.assertEqual(res, EMPLOYEE)
 
+    def test_custom_user_pretty_cached(self):
+        field = CustomField.valid_objects.create(name='忌口')
+        custom_user = CustomUser.objects.create(user=self.user, data={field.uuid.hex: '无'})
+        expect = [{'uuid': field.uuid.hex, 'name': '忌口', 'value': '无'}]
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(custom_user.pretty(), expect)
+            with self.assertNumQueries(0):
+                self.assertEqual(custom_user.pretty(), expect)
+
+            field.name = '爱好'
+            field.save()
+            self.assertEqual(custom_user.pretty()[0]['name'], '爱好')
+
+            extern = Group.valid_objects.create(uid='extern', name='extern')
+            GroupMember.valid_objects.create(user=self.user, owner=extern)
+            self.assertFalse(self.user.is_intra)
+
     def test_delete_user(self):
         self.create_user()
 
@@ -782,6 +851,58 @@ class UserTestCase(TestCase):
                                 })
         self.assertFalse(User.objects.get(username='test_reset_pwd').require_reset_password)
 
+    def test_import_csv(self):
+        content = 'username,name\nadmin,admin\ncsv1,csv1\ncsv2,csv2\ncsv1,csv1_new\n'
+        users_file = SimpleUploadedFile('users.csv', content.encode('utf-8'), content_type='text/csv')
+        res = self.client.post(reverse('siteapi:import_user'), data={'users': users_file, 'node_uid': 'd_test'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([item['username'] for item in res.json()], ['admin', 'csv1', 'csv2', 'csv1'])
+        self.assertEqual(User.valid_objects.get(username='csv1').name, 'csv1_new')
+        self.assertEqual(UserPerm.valid_objects.filter(owner__username='csv2').count(), Perm.valid_objects.count())
+        self.assertEqual(
+            set(DeptMember.valid_objects.filter(owner__uid='test').values_list('user__username', flat=True)),
+            {'admin', 'csv1', 'csv2'})
+
+        content = 'username,name\ncsv3,csv3\n123,invalid\n'
+        users_file = SimpleUploadedFile('users.csv', content.encode('utf-8'), content_type='text/csv')
+        res = self.client.post(reverse('siteapi:import_user'), data={'users': users_file})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json(), {'2': {'username': ['invalid']}})
+        self.assertFalse(User.valid_objects.filter(username='csv3').exists())
+
+        # 先出错的更新行先报告
+        content = 'username,name,gender\ncsv3,csv3,1\nadmin,admin,9\n123,invalid,1\n'
+        users_file = SimpleUploadedFile('users.csv', content.encode('utf-8'), content_type='text/csv')
+        res = self.client.post(reverse('siteapi:import_user'), data={'users': users_file})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(list(res.json()), ['2'])
+        self.assertIn('gender', res.json()['2'])
+        self.assertFalse(User.valid_objects.filter(username='csv3').exists())
+
+        # User.save 中的校验错误同样带行号
+        content = 'username,name,mobile\ncsv3,csv3,\ncsv4,csv4,123\n'
+        users_file = SimpleUploadedFile('users.csv', content.encode('utf-8'), content_type='text/csv')
+        res = self.client.post(reverse('siteapi:import_user'), data={'users': users_file})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json(), {'2': {'mobile': ['invalid']}})
+
+        User.valid_objects.filter(username='csv1').update(email='csv1@example.com')
+        content = 'username,name,email\ncsv3,csv3,\ncsv2,csv2,csv1@example.com\n'
+        users_file = SimpleUploadedFile('users.csv', content.encode('utf-8'), content_type='text/csv')
+        res = self.client.post(reverse('siteapi:import_user'), data={'users': users_file})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json(), {'2': {'email': ['existed']}})
+        self.assertFalse(User.valid_objects.filter(username='csv3').exists())
+
+    def test_import_csv_strip_username(self):
+        content = 'username,name\n csv5,csv5\ncsv5 ,csv5_new\n'
+        users_file = SimpleUploadedFile('users.csv', content.encode('utf-8'), content_type='text/csv')
+        res = self.client.post(reverse('siteapi:import_user'), data={'users': users_file, 'node_uid': 'd_test'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([item['username'] for item in res.json()], ['csv5', 'csv5'])
+        self.assertEqual(User.valid_objects.get(username='csv5').name, 'csv5_new')
+        self.assertTrue(DeptMember.valid_objects.filter(owner__uid='test', user__username='csv5').exists())
+
     def test_create_invalid_username(self):
         res = self.create_user()
         self.assertEqual(res.status_code, 201)
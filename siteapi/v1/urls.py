@@ -31,7 +31,7 @@ from siteapi.v1.views import (event as event_views, node as node_views, migrate
                               as shortcut_views, perm as perm_views, ucenter as ucenter_views, qr as qr_views, advance
                               as advance_views, third_party as third_party_views)
 
-from siteapi.v1.views.statistics import UserStatisticView
+from siteapi.v1.views.statistics import UserStatisticView, ActivityStatisticView
 
 urlpatterns = [
     # user
@@ -191,6 +191,7 @@ urlpatterns = [
     url(r'^invitation/user/(?P<username>[\w]+)/', event_views.InviteUserCreateAPIView.as_view(), name='invite_user'),
     # statistics
     url(r'^statistics/user_statistic/$', UserStatisticView.as_view(), name='user_statistic'),
+    url(r'^statistics/activity/$', ActivityStatisticView.as_view(), name='activity_statistic'),
 
     # advance
     url(r'^plugin/crontab/$', advance_views.CrontabPluginListAPIView.as_view(),
@@ -18,8 +18,10 @@ from siteapi.v1.serializers.config import (
 )
 from siteapi.v1.serializers.user import UserSerializer
 
+from common.django.drf.views import cache_response
 from oneid.permissions import IsAdminUser, CustomPerm
 from oneid_meta.models import User, CustomField, NativeField, I18NMobileConfig
+from oneid_meta.generation import CONFIG_GENERATION
 
 from executer.log.rdb import LOG_CLI
 
@@ -42,6 +44,10 @@ class ConfigAPIView(generics.RetrieveUpdateAPIView):
         site.refresh_from_db()
         return site
 
+    @cache_response(CONFIG_GENERATION)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def perform_update(self, serializer):
         super().perform_update(serializer)    # pylint: disable=no-member
         LOG_CLI().update_config()
@@ -66,6 +72,10 @@ class MetaConfigAPIView(generics.RetrieveAPIView):
         site.refresh_from_db()
         return site
 
+    @cache_response(CONFIG_GENERATION)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 class AdminAPIView(generics.RetrieveUpdateAPIView):
     '''
@@ -121,6 +131,10 @@ class CustomFieldListCreateAPIView(generics.ListCreateAPIView):
         '''
         return CustomField.valid_objects.filter(subject=self.kwargs['field_subject'])
 
+    @cache_response(CONFIG_GENERATION)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         '''
         save with field_subject
@@ -176,6 +190,10 @@ class NativeFieldListAPIView(generics.ListAPIView):
         '''
         return NativeField.valid_objects.filter(subject=self.kwargs['field_subject']).order_by('name')
 
+    @cache_response(CONFIG_GENERATION)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 class NativeFieldDetailAPIView(generics.RetrieveUpdateAPIView):
     '''
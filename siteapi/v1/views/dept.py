@@ -30,6 +30,7 @@ from siteapi.v1.views.utils import (
     get_users_from_uids,
     get_depts_from_uids,
     update_users_of_owner,
+    filter_by_custom_params,
     gen_uid,
 )
 from siteapi.v1.views import node as node_views
@@ -58,7 +59,9 @@ class DeptListAPIView(generics.ListAPIView):
         if name:
             kwargs.update(name__icontains=name)
 
-        return Dept.valid_objects.filter(**kwargs).exclude(uid='root').order_by('id')
+        queryset = Dept.valid_objects.filter(**kwargs).exclude(uid='root').order_by('id')
+        # 支持自定义字段（*__custom）搜索
+        return filter_by_custom_params(queryset, self.request.query_params, 'dept')
 
 
 class DeptScopeListAPIView(generics.ListAPIView):
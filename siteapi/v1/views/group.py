@@ -34,6 +34,7 @@ from siteapi.v1.views import node as node_views
 from siteapi.v1.views.utils import (
     get_users_from_uids,
     update_users_of_owner,
+    filter_by_custom_params,
     get_groups_from_uids,
     gen_uid,
 )
@@ -61,7 +62,9 @@ class GroupListAPIView(generics.ListAPIView):
         if name:
             kwargs.update(name__icontains=name)
 
-        return Group.valid_objects.filter(**kwargs).exclude(uid='root').order_by('id')
+        queryset = Group.valid_objects.filter(**kwargs).exclude(uid='root').order_by('id')
+        # 支持自定义字段（*__custom）搜索
+        return filter_by_custom_params(queryset, self.request.query_params, 'group')
 
 
 class GroupScopeListAPIView(generics.ListAPIView):
@@ -92,37 +92,49 @@ class UserCSVImportView(APIView):
         return Response(res)
 
     @staticmethod
-    def core_post(users_file, node_uid):
+    def core_post(users_file, node_uid):    # pylint: disable=too-many-locals
         '''
         creat or update users
         '''
         cli = CLI()
 
-        reader = csv.DictReader(io.StringIO(users_file.read().decode('utf-8')))
-        res = []
-        users = []
-        for index, row in enumerate(reader):
-            username = row.get('username')
-            user = User.valid_objects.filter(username=username).first()
+        rows = list(csv.DictReader(io.StringIO(users_file.read().decode('utf-8'))))
+        # 序列化器会去除用户名首尾空白，按去除后的用户名识别用户
+        usernames = [(row.get('username') or '').strip() for row in rows]
+        existed = {user.username: user for user in User.valid_objects.filter(username__in=usernames)}
+
+        # 已有用户及文件中重复出现的用户更新，其余创建
+        # 按文件顺序将连续的创建、更新各合为一批依次执行，报告的错误即第一个出错的行
+        runs = []    # [(是否更新, [行序号])]
+        seen = set(existed)
+        for index, username in enumerate(usernames):
+            is_update = username in seen
+            if not is_update and username:
+                seen.add(username)
+            if runs and runs[-1][0] == is_update:
+                runs[-1][1].append(index)
+            else:
+                runs.append((is_update, [index]))
 
+        users = [None] * len(rows)
+        for is_update, indexes in runs:
             try:
-                if user:
-                    cli.update_user(user, row)
+                if is_update:
+                    saved = cli.update_users([(existed[usernames[index]], rows[index]) for index in indexes])
                 else:
-                    user = cli.create_user(row)
+                    saved = cli.create_users([rows[index] for index in indexes])
             except ValidationError as exc:
-                raise ValidationError({index + 1: exc.detail})
+                raise ValidationError({indexes[pos] + 1: detail for pos, detail in exc.detail.items()})
+            for index, user in zip(indexes, saved):
+                users[index] = user    # 重复导入的后果可以接受，故不处理
+                existed[user.username] = user
 
-            users.append(user)    # 重复导入的后果可以接受，故不处理
-            res.append(UserCSVSerializer(user).data)
+        res = [UserCSVSerializer(user).data for user in users]
 
         if node_uid:
             node, node_subject = TreeNode.retrieve_node(node_uid)
-            if node_subject == 'dept':
-                cli.add_users_to_dept(users, node)
-            elif node_subject == 'group':
-                cli.add_users_to_group(users, node)
-            else:
+            if node_subject not in ('dept', 'group'):
                 raise ValueError
+            cli.add_users_to_nodes(users, [node])
 
         return res
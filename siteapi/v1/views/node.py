@@ -3,6 +3,7 @@ views for node
 '''
 
 from functools import wraps
+import hashlib
 
 from rest_framework import generics
 from rest_framework.views import APIView
@@ -11,6 +12,7 @@ from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError, NotFound, PermissionDenied
 from django.conf import settings
 from django.urls import resolve
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers, quote_etag
 from oneid_meta.models import Dept, Group
 from oneid_meta.models.mixin import TreeNode as Node
 from siteapi.v1.views import (
@@ -25,6 +27,40 @@ from oneid_meta.models.group import GroupMember, ManagerGroup
 from oneid_meta.models.dept import DeptMember
 from oneid.statistics import TimeCash
 from siteapi.v1.serializers import UserLiteSerializer
+from oneid_meta.generation import ORG_GENERATION
+from common.django.drf.views import cache_response
+
+
+def get_scope_fingerprint(user):
+    '''
+    请求者身份，决定可见范围
+    '''
+    return 'admin' if user.is_admin else f'user:{user.username}'
+
+
+def org_conditional_get(get):
+    '''
+    以组织结构版本号、请求者身份及请求路径生成ETag
+    命中 If-None-Match 时直接返回304，不再计算结果
+    '''
+
+    @wraps(get)
+    def wrapper(self, request, *args, **kwargs):
+        raw = f'{ORG_GENERATION.get()}:{get_scope_fingerprint(request.user)}:{request.get_full_path()}'
+        etag = quote_etag(hashlib.sha1(raw.encode('utf-8')).hexdigest())
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = get(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization', 'Sudo'))
+        return response
+
+    return wrapper
 
 
 class MetaNodeAPIView(APIView):
@@ -33,6 +69,8 @@ class MetaNodeAPIView(APIView):
     '''
     permission_classes = [IsAuthenticated]
 
+    @org_conditional_get
+    @cache_response(ORG_GENERATION)
     def get(self, request, *args, **kwargs):    # pylint: disable=unused-argument, no-self-use
         '''
         获取组织结构基本信息
@@ -237,6 +275,10 @@ class NodeTreeAPIView(generics.RetrieveAPIView):
         context['user_identity'] = self.user_identity
         return context
 
+    @org_conditional_get
+    def get(self, request, *args, **kwargs):
+        return self.retrieve(request, *args, **kwargs)
+
     def legacy_retrieve(self, request, *args, **kwargs):
         '''
         获取节点结构树
@@ -1,12 +1,18 @@
 """
 statistics
 """
+import datetime
+import itertools
 
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import generics
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from oneid.permissions import IsAdminUser
 from oneid_meta.models import User
+from oneid.activity import activity_tracker, PERIODS, period_starts, earliest_period_start
 from oneid.statistics import UserStatistics
 
 
@@ -21,3 +27,66 @@ class UserStatisticView(generics.GenericAPIView):
         total_count = User.valid_objects.count()
         res = {'total_count': total_count, 'active_count': UserStatistics.get_active_count()}
         return Response(data=res)
+
+
+class ActivityStatisticView(generics.GenericAPIView):
+    '''
+    按时间区间查询活跃统计
+    - period: hour, day, week, month，默认为 day
+    - start, end: 日期或时间，默认为最近7天；start 不得早于统计数据的保留时间
+    '''
+    permission_classes = [IsAuthenticated & IsAdminUser]
+
+    # 单次查询的最大周期数
+    MAX_PERIODS = 24 * 31
+
+    def get(self, request):
+        """
+        get activity rollups
+        """
+        period = request.query_params.get('period', 'day')
+        if period not in PERIODS:
+            raise ValidationError({'period': ['invalid']})
+
+        now = timezone.localtime()
+        end = self.parse_time(request.query_params.get('end'), 'end', now)
+        start = self.parse_time(request.query_params.get('start'), 'start', end - datetime.timedelta(days=6))
+        if start > end:
+            raise ValidationError({'start': ['must be earlier than end']})
+        # 超出保留时间的统计数据已过期
+        if start < earliest_period_start(period, now):
+            raise ValidationError({'start': ['data expired']})
+        if len(list(itertools.islice(period_starts(period, start, end), self.MAX_PERIODS + 1))) > self.MAX_PERIODS:
+            raise ValidationError({'start': ['range is too large']})
+
+        active_count, results = activity_tracker.get_rollups(period, start, end)
+        return Response({
+            'period': period,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'active_count': active_count,
+            'results': results,
+        })
+
+    @staticmethod
+    def parse_time(value, field, default):
+        '''
+        解析日期或时间，返回本地时间；日期作为结束时间时取当日最后时刻
+        '''
+        if not value:
+            return default
+        try:
+            moment = parse_datetime(value)
+        except ValueError:
+            raise ValidationError({field: ['invalid']})
+        if moment is None:
+            try:
+                date = parse_date(value)
+            except ValueError:
+                date = None
+            if date is None:
+                raise ValidationError({field: ['invalid']})
+            moment = datetime.datetime.combine(date, datetime.time.max if field == 'end' else datetime.time.min)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return timezone.localtime(moment)
@@ -12,6 +12,7 @@ from rest_framework.views import APIView
 from django.contrib.auth.models import AnonymousUser
 
 from drf_expiring_authtoken.views import ObtainExpiringAuthToken
+from oauth2_provider import application_cache
 from siteapi.v1.serializers.user import (
     UserWithPermSerializer,
     UserProfileSerializer,
@@ -96,7 +97,7 @@ class TokenPermAuthView(generics.RetrieveAPIView):
                 raise ValidationError({'app_uid': 'not exists'})
             context.update(app=app)
         if oauth_client_id:
-            oauth_app = OAuthAPP.objects.filter(client_id=oauth_client_id).first()
+            oauth_app = application_cache.get_application(OAuthAPP, oauth_client_id)
             if not oauth_app:
                 raise ValidationError({'oauth_clien_id': 'not exists'})
             if oauth_app.app:
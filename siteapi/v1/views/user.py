@@ -15,10 +15,9 @@ from rest_framework.exceptions import (
 )
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 from django.db import transaction
-from django.db.models import Q
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ObjectDoesNotExist, FieldDoesNotExist
-from oneid_meta.models import User, Group, Dept, GroupMember, UserPerm
+from oneid_meta.models import User, Group, Dept, GroupMember, UserPerm, UserSearchToken
 from oneid.permissions import (
     IsAdminUser,
     IsManagerUser,
@@ -30,6 +29,7 @@ from oneid.permissions import (
 from siteapi.v1.serializers.user import UserSerializer, EmployeeSerializer, ResetUserPasswordSerializer
 from siteapi.v1.serializers.group import GroupListSerializer, GroupSerializer
 from siteapi.v1.serializers.dept import DeptListSerializer, DeptSerializer
+from siteapi.v1.views.utils import filter_by_custom_params
 from common.django.drf.paginator import DefaultListPaginator
 from executer.core import CLI
 from executer.utils import operation
@@ -70,9 +70,7 @@ class UserListCreateAPIView(generics.ListCreateAPIView):
         queryset = User.valid_objects.all()
         keyword = self.request.query_params.get('keyword', '')
         if keyword != '':
-            queryset = queryset.filter(Q(username__icontains=keyword) | Q(email__icontains=keyword) | \
-                                       Q(private_email__icontains=keyword) | Q(mobile__icontains=keyword) | Q(
-                name__icontains=keyword)). \
+            queryset = queryset.filter(id__in=UserSearchToken.search(keyword)). \
                 exclude(is_boss=True).exclude(username='admin').order_by('id')
         else:
             queryset = queryset.exclude(is_boss=True).exclude(username='admin').order_by('id')
@@ -163,15 +161,7 @@ class UserListCreateAPIView(generics.ListCreateAPIView):
                 queryset = queryset.filter(**{param: value})
 
         # 获取 query string 中自定义字段（*__custom）
-        # 支持 *__(lte, gte, lt, gt 等)__custom 形式,需进行范围搜索的字段在存储时保证传入的为string
-        suffixes = ['__lte__custom', '__lt__custom', '__gte__custom', '__gt__custom', '__custom']
-        for key, value in self.request.query_params.items():
-            for suffix in suffixes:
-                if key.endswith(suffix):
-                    _key = 'custom_user__data__"{custom_field}"{suffix}'.format(custom_field=key[:-1 * len(suffix)],
-                                                                                suffix=suffix[:-8])
-                    queryset = queryset.filter(**{_key: value})
-                    break
+        queryset = filter_by_custom_params(queryset, self.request.query_params, 'user')
         # 支持自定义排序
         # QueryString 中格式为 '&sort=field1 ... fieldn'
         _sort = self.request.query_params.get('sort')
@@ -9,7 +9,7 @@ from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.exceptions import ValidationError
 from pypinyin import lazy_pinyin as pinyin
 
-from oneid_meta.models import Group, Dept, User
+from oneid_meta.models import Group, Dept, User, CustomDataIndex
 from executer.core import CLI
 from executer.utils import operation
 
@@ -125,3 +125,22 @@ def update_users_of_owner(owner, users, subject):
         add_func(add_users, owner)
         delete_func(delete_users, owner)
         sort_func(users, owner)
+
+
+def filter_by_custom_params(queryset, query_params, subject):
+    '''
+    按 query string 中的自定义字段（*__custom）过滤
+    支持 *__(lte, gte, lt, gt)__custom 形式的范围搜索，参数可转为数值时按数值比较
+    '''
+    for key, value in query_params.items():
+        if not key.endswith('__custom'):
+            continue
+        field, lookup = key[:-len('__custom')], None
+        for _lookup in CustomDataIndex.LOOKUPS:
+            if field.endswith(f'__{_lookup}'):
+                field, lookup = field[:-len(_lookup) - 2], _lookup
+                break
+        if len(field) > CustomDataIndex.KEY_MAX_LENGTH:
+            raise ValidationError({key: ['invalid']})
+        queryset = queryset.filter(id__in=CustomDataIndex.search(subject, field, value, lookup))
+    return queryset
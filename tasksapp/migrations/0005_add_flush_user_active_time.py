@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import migrations
+from django_celery_beat.models import PeriodicTask, IntervalSchedule
+
+
+def add_flush_user_active_time(apps, schema_editor):
+
+    interval, _ = IntervalSchedule.objects.get_or_create(
+        every=getattr(settings, 'ACTIVE_USER_FLUSH_INTERVAL', 60),
+        period=IntervalSchedule.SECONDS,
+    )
+
+    PeriodicTask.objects.get_or_create(
+        name='flush_user_active_time',
+        interval=interval,
+        task='tasksapp.tasks.flush_user_active_time',
+        queue='default',
+        routing_key='default',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasksapp', '0004_rm_ldap_task'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_flush_user_active_time),
+    ]
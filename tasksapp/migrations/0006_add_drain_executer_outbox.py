@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import migrations
+from django_celery_beat.models import PeriodicTask, IntervalSchedule
+
+
+def add_drain_executer_outbox(apps, schema_editor):
+
+    interval, _ = IntervalSchedule.objects.get_or_create(
+        every=getattr(settings, 'EXECUTER_OUTBOX_RETRY_DELAY', 10),
+        period=IntervalSchedule.SECONDS,
+    )
+
+    PeriodicTask.objects.get_or_create(
+        name='drain_executer_outbox',
+        interval=interval,
+        task='tasksapp.tasks.drain_executer_outbox',
+        queue='default',
+        routing_key='default',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasksapp', '0005_add_flush_user_active_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_drain_executer_outbox),
+    ]
@@ -6,10 +6,10 @@ import celery
 from celery import shared_task
 from celery.utils.log import get_task_logger
 from django.conf import settings
-from ldap3 import Server
 
 from scripts import flush_perm, ldap_user_perm, ldap_aggregate_user, user_manager
-from executer.LDAP.client import Connection
+from executer import outbox
+from executer.LDAP.pool import get_pool
 from infrastructure.utils.email import send_email as send_email_func
 from oneid_meta.models import User, DingConfig
 from oneid_meta.models.mixin import TreeNode as Node
@@ -63,14 +63,16 @@ def flush_user_perm_in_ldap():
     刷新LDAP中用户的权限
     必须周期性执行
     '''
-    conn = Connection(
-        Server(settings.LDAP_SERVER),
-        user=settings.LDAP_USER,
-        password=settings.LDAP_PASSWORD,
-        auto_bind=True,
-        raise_exceptions=True,
-    )
-    ldap_user_perm.flush_user_perm(conn)
+    with get_pool().connection() as conn:
+        ldap_user_perm.flush_user_perm(conn)
+
+
+def get_aggregate_pool():
+    '''
+    聚合成员时并发写入所用的连接池
+    与任务自身所持连接的连接池分开，大小与并发数相同，并发写入不会因等待空闲连接超时而中途失败
+    '''
+    return get_pool(name='aggregate', size=settings.LDAP_AGGREGATE_WORKERS)
 
 
 @shared_task
@@ -78,14 +80,11 @@ def aggregate_user_in_ldap_dept():
     '''
     从下往上聚合部门成员并逐节点保存
     '''
-    conn = Connection(
-        Server(settings.LDAP_SERVER),
-        user=settings.LDAP_USER,
-        password=settings.LDAP_PASSWORD,
-        auto_bind=True,
-        raise_exceptions=True,
-    )
-    ldap_aggregate_user.aggregate_user_in_dept(conn, settings.LDAP_DEPT_BASE)
+    with get_pool().connection() as conn:
+        ldap_aggregate_user.aggregate_user_in_dept(conn,
+                                                   settings.LDAP_DEPT_BASE,
+                                                   workers=settings.LDAP_AGGREGATE_WORKERS,
+                                                   connect=get_aggregate_pool().connection)
 
 
 @shared_task
@@ -93,14 +92,11 @@ def aggregate_user_in_ldap_group():
     '''
     从下往上聚合组成员并逐节点保存
     '''
-    conn = Connection(
-        Server(settings.LDAP_SERVER),
-        user=settings.LDAP_USER,
-        password=settings.LDAP_PASSWORD,
-        auto_bind=True,
-        raise_exceptions=True,
-    )
-    ldap_aggregate_user.aggregate_user_in_group(conn, settings.LDAP_GROUP_BASE)
+    with get_pool().connection() as conn:
+        ldap_aggregate_user.aggregate_user_in_group(conn,
+                                                    settings.LDAP_GROUP_BASE,
+                                                    workers=settings.LDAP_AGGREGATE_WORKERS,
+                                                    connect=get_aggregate_pool().connection)
 
 
 @shared_task
@@ -180,3 +176,21 @@ def update_users_cache(user_uids):
     users = User.valid_objects.filter(username__in=user_uids)
     for user in users:
         user.update_cache()
+
+
+@shared_task
+def flush_user_active_time():
+    '''
+    将 redis 中暂存的最近活跃时间批量写回数据库
+    '''
+    from oneid.activity import activity_tracker    # pylint: disable=import-outside-toplevel
+    activity_tracker.flush()
+
+
+@shared_task
+def drain_executer_outbox():
+    '''
+    执行延后执行的 executer 积压的操作
+    提交数据修改后触发，并周期性执行以完成重试
+    '''
+    outbox.drain()